@@ -1,13 +1,20 @@
-import customtkinter as ctk
-import importlib 
+from collections import OrderedDict
 import datetime  
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
-from ai import StoryGPT
-from PIL import Image 
-from tkinter import messagebox
 import pickle, os
-from classes.models import User
+from classes.startup import StartupProfiler, warmUp
+
+# Set the BOOKSMART_PROFILE_STARTUP environment variable to print how long each part of startup takes.
+# NOTE: Only what's needed to show the window is imported here. The AI, the database and the pages are imported once the 
+# window is on screen (see App.finishStartup), and modules that are only needed later are warmed up in the background.
+startupProfiler = StartupProfiler(enabled=bool(os.environ.get("BOOKSMART_PROFILE_STARTUP")))
+with startupProfiler.phase("import customtkinter"):
+	import customtkinter as ctk
+	from tkinter import messagebox
+with startupProfiler.phase("import classes.assets"):
+	from classes.assets import defaultAssetCache
+
+# Modules that are imported on a background thread after startup, so that the pages that need them open quickly
+WARM_UP_MODULES = ["openai", "httpx", "classes.export", "pages.AIChatPage", "pages.storyLibraryPage", "pages.AISettingsPage"]
 
 
 '''
@@ -38,8 +45,7 @@ class Sidebar(ctk.CTkFrame):
 		sidebarFrame = ctk.CTkFrame(self, fg_color=self.master.theme["main_clr"], corner_radius=0)
 		sidebarFrame.pack(expand=True)
 
-		sidebar_bg = ctk.CTkImage(light_image=Image.open(os.path.join(self.master.image_path, "sidebar_bg_light.jpg")),
-													 dark_image=Image.open(os.path.join(self.master.image_path, "sidebar_bg_dark.jpg")), size=((300), (850)))
+		sidebar_bg = self.master.assets.getCTkImage("sidebar_bg_light.jpg", (300, 850), darkPath="sidebar_bg_dark.jpg")
 		sidebar_bgPanel = ctk.CTkLabel(sidebarFrame, image=sidebar_bg, text=" ")
 		sidebar_bgPanel.grid(row=0, column=0, sticky="ns")
 
@@ -47,7 +53,7 @@ class Sidebar(ctk.CTkFrame):
 		navbarBGFrame.grid(row=0, column=0, sticky='nse')
 		navbarBGFrame.grid_rowconfigure(6, weight=1)
 
-		logo_image = ctk.CTkImage(Image.open(os.path.join(self.master.image_path, "BookSmartLogo.png")), size=(150, 150))
+		logo_image = self.master.assets.getCTkImage("BookSmartLogo.png", (150, 150))
 		sidebar_logo = ctk.CTkLabel(navbarBGFrame, text=" ", fg_color="transparent", image=logo_image, font=ctk.CTkFont(size=40, weight="bold"))
 		sidebar_logo.grid(row=0, column=0, padx=20, pady=20)
 
@@ -86,8 +92,7 @@ class Sidebar(ctk.CTkFrame):
 		}
 		
 		for i, (btn_name, btn_info) in enumerate(buttons.items(), start=2):
-			btn_image = ctk.CTkImage(Image.open(os.path.join(self.master.image_path, btn_info["image_name"])),
-				size=(100, 100))
+			btn_image = self.master.assets.getCTkImage(btn_info["image_name"], (100, 100))
 			
 			navBtn = ctk.CTkButton(navbarBGFrame, image=btn_image, bg_color='transparent', fg_color='transparent', 
 						  text=btn_name, hover_color=self.master.theme["hover_clr"], anchor="w", corner_radius=0, height=5, border_spacing=5,
@@ -152,6 +157,10 @@ Attributes/Variables:
 - width (int): The viewport width of the client.
 - height (int): The viewport height of the client. 
 - currentPage (CTkFrame): The page that the application is currently rendering 
+- pageCache (OrderedDict): Maps the name of a page to a page instance that's kept alive while it's hidden, least recently 
+	opened first. Only pages that have a refresh(self, state) method are kept. Opening a kept page calls refresh with 
+	getPageState(), which updates what's on the page and returns True, or returns False if the page has to be built again.
+- maxCachedPages (int): Most pages that are kept alive at the same time
 - loggedInUser (User): Represents the user that is currently logged into the application. If no user is logged in then
 	this value is None.
 - currentStory (Story): Can represent the saved story object that the user is continuing to write, or it represents the story
@@ -166,16 +175,21 @@ NOTE: If both isSavedStory and isRemixedStory are false, then the user is not re
 - unsavedStoryMessages (Array): Array of 'Message' objects that the user and AI have generated for a story, but they haven't been
 	saved and linked to a story object in the database yet. These would represent the messages in their most recent chat session.
 - engine (SqlAlchemy Engine): Sqlalchemy engine object that helps us connect to the database
-- Session (SqlAlchemy Session Maker): Customized constructor that makes session objects for our database 
-- session (SqlAlchemy Session): Session class instance that's used to interact with the database 
+- dataAccess (DataAccess): Reads and writes the database for the pages, with a short lived session for every operation
+- autosave (DraftAutosave): Writes unsavedStoryMessages to the user's draft story in the background, and turns the draft into 
+	a saved story when the user saves. None until the database is connected.
 - header (CTkFrame): Header of the application
 - footer (CTkFrame): Footer of the application
 
 Methods:
+- finishStartup(self): Does the slow part of startup once the window is on screen: connects to the database, creates the AI,
+	builds the sidebar and opens the first page. Then it warms up WARM_UP_MODULES in the background.
 - getPage(self, pageName): Searches for and returns a class/module with name pageName. This class is a tkinter frame and 
 	is an individual page in our GUI application. 
 - openPage(self, pageName, *args): Opens and loads a page in our tkinter application that has the name pageName.
 	It passes, the 'App' class and then any potential arguments that the pageName class may take as parameters
+- getPageState(self): Returns the state of the application that pages are rendered from, which is passed to refresh()
+- clearPageCache(self): Destroys every kept page other than the current one, e.g. when the user logs out
 - logoutUser(self): Logs out the currently logged in user from our application.
 '''
 
@@ -189,6 +203,9 @@ class UserSessionManager:
 		self.app.loggedInUser = userAccount
 		self.app.loggedInUser.username = Username
 
+		# If the app closed before the user saved their last chat, pick the chat back up from their draft
+		self.resumeDraft()
+
 		# Update the nav buttons now that the user is logged in
 		# so that they actually work and aren't disabled
 		self.app.sidebar.updateSidebar() 
@@ -203,6 +220,8 @@ class UserSessionManager:
 		os.remove('last_user.pkl')
 		
 		# Wipe currentStory and reset booleans for the new user. This is so the new user starts on a blank slate
+		if self.app.loggedInUser:
+			self.app.autosave.discard(self.app.loggedInUser.id)
 		self.app.unsavedStoryMessages = [] 
 		self.app.currentStory = None
 		self.app.isSavedStory = False
@@ -212,12 +231,35 @@ class UserSessionManager:
 		# NOTE: More specifically when they login and 'continue' an unsaved story, it prevents AI from having knowledge of an interaction from another user or session.
 		self.app.storyGPT.chatHistory.clear()
 
-		# Redirect the user to the login page
+		# Redirect the user to the login page, and throw away the pages that were showing the user's data
 		self.app.openPage("userLoginPage")
+		self.app.clearPageCache()
 
 		# Update nav buttons so that user can't access the pages associated with them
 		self.app.sidebar.updateSidebar()
   
+	def resumeDraft(self):
+		'''
+		- Restores the unsaved messages that were autosaved to the logged in user's draft. If the user was continuing a saved 
+			story, they continue it again with the draft's messages as its unsaved ones. Else they're restored as a new story.
+		'''
+		from classes.utilities import convertStoryObjToJSON
+		draft = self.app.dataAccess.loadDraft(self.app.loggedInUser.id)
+		if draft is None or not draft.messages:
+			return
+		self.app.unsavedStoryMessages = list(draft.messages)
+		self.app.isRemixedStory = False
+		story = self.app.dataAccess.loadStory(draft.draftOfStoryID) if draft.draftOfStoryID is not None else None
+		if story is not None:
+			# The AI gets the saved story's messages and summary too, the same as when it's continued from the library
+			self.app.currentStory = story
+			self.app.isSavedStory = True
+			self.app.storyGPT.chatHistory.populate(convertStoryObjToJSON(story) + convertStoryObjToJSON(draft), story.summary, story.summarizedCount)
+		else:
+			self.app.currentStory = None
+			self.app.isSavedStory = False
+			self.app.storyGPT.chatHistory.populate(convertStoryObjToJSON(draft))
+
 	def confirmLogout(self):
 		response = messagebox.askquestion('Log out?', f'Are you sure you want to logout {self.app.loggedInUser.username}?')
 		if response == 'yes':
@@ -232,7 +274,7 @@ class UserSessionManager:
 			if os.path.exists('last_user.pkl'):
 				with open('last_user.pkl', 'rb') as f:
 					last_username = pickle.load(f) # Now you can use `last_username` to log in
-					last_User = self.app.session.query(User).filter_by(username=last_username).first()
+					last_User = self.app.dataAccess.findUser(last_username)
 					if last_User:
 						self.saveLoginAs(last_User, last_username)
 			else:
@@ -272,9 +314,9 @@ class App(ctk.CTk):
 		self.iconbitmap(r'assets\images\BookSmartLogo.ico')
 		self.width = self.winfo_screenwidth()
 		self.geometry(f"{self.width}x{self.winfo_screenheight()}")
-		# AI model class instance that's going to be used throughout the application
 		self.image_path = os.path.join(os.path.dirname(os.path.realpath(__file__)), "assets/images")
-		self.storyGPT = StoryGPT()
+		# Images are decoded once and shared by every page, so switching pages doesn't read them from disk again
+		self.assets = defaultAssetCache
 
 		'''
 		- currentPage: Tkinter frame class representing the current page the user is on
@@ -295,17 +337,19 @@ class App(ctk.CTk):
 		self.userSessionManager = UserSessionManager(self)
 		self.loadedPages = {}
 		self.currentPage = None
+		self.pageCache = OrderedDict()
+		self.maxCachedPages = 5
 		self.loggedInUser = None  
 		self.currentStory = None
 		self.isSavedStory = False
 		self.isRemixedStory = False
 		self.unsavedStoryMessages = []
+		self.autosave = None
 		self.storyGenObj = None
 		self.remixStoryObj = None
 		#Initialize current AI mode Balanced at startup
 		self.currentMode='Balanced'
 		self.currentModeKey=0
-		self.msgboxes=[]
 		'''
 		- Map of colors for the theme. Value in left tuple 
 			is light theme color, while value in right tuple 
@@ -322,18 +366,44 @@ class App(ctk.CTk):
 			"entry_text_clr": ("#000000", "#FFFFFF"),
 		}
 		self.isDarkTheme = True
-	
-		# Engine and session constructor that we're going to use 
-		self.engine = create_engine("sqlite:///assets/PyProject.db")
-		self.Session = sessionmaker(bind=self.engine)
-		self.session = self.Session()
 
 		# Apply theme of application
 		self.themeManager.applyTheme()
 
-		self.sidebar = Sidebar(self)
+		# Show the window with a loading message straight away, and do the rest of startup once it's on screen
+		self.loadingLabel = ctk.CTkLabel(self, text="Loading BookSmart...", font=("Helvetica", 24), text_color=self.theme["label_clr"])
+		self.loadingLabel.pack(expand=True)
+		self.update()
+		self.after_idle(self.finishStartup)
 
-		self.userSessionManager.checkForPrevUser()
+	def finishStartup(self):
+		# AI model class instance that's going to be used throughout the application
+		with startupProfiler.phase("import ai"):
+			from ai import StoryGPT
+		with startupProfiler.phase("create StoryGPT"):
+			self.storyGPT = StoryGPT()
+
+		# Engine and the data access layer that the pages use to read and write the database
+		with startupProfiler.phase("import sqlalchemy"):
+			from classes.Database import createEngine
+			from classes.migrations import upgradeSchema
+			from classes.dataAccess import DataAccess
+			from classes.autosave import DraftAutosave
+		with startupProfiler.phase("connect to database"):
+			self.engine = createEngine("sqlite:///assets/PyProject.db")
+			upgradeSchema(self.engine)
+			self.dataAccess = DataAccess(self.engine)
+			self.autosave = DraftAutosave(self.dataAccess).start()
+
+		self.loadingLabel.destroy()
+		with startupProfiler.phase("build sidebar"):
+			self.sidebar = Sidebar(self)
+		with startupProfiler.phase("open first page"):
+			self.userSessionManager.checkForPrevUser()
+			self.update_idletasks()
+
+		# The report is printed once the modules that are warmed up in the background are loaded too
+		warmUp(WARM_UP_MODULES, startupProfiler, onFinished=startupProfiler.printReport)
 	
 	def enableSidebar(self):
 		self.sidebar.pack(side="left", fill="y")
@@ -348,8 +418,8 @@ class App(ctk.CTk):
 	'''
 	def getPage(self, pageName):
 		try:
-			# import the module using the path.
-			module = importlib.import_module(f"pages.{pageName}")
+			# import the module using the path. Its import time shows up in the startup profile.
+			module = startupProfiler.importModule(f"pages.{pageName}")
 			# get the page class from the module
 			pageClass = getattr(module, pageName)
 			return pageClass
@@ -373,16 +443,52 @@ class App(ctk.CTk):
 		if not pageClass:
 			return
 		
-		# If there is a currentPage already, destroy it, then reassign it to the new page class
-		# We pageClass to create the tkinter frame, and pass in self (App class), and any potential arguments
+		# If there is a currentPage already, hide it. It's only destroyed if it isn't kept in the page cache.
 		if self.currentPage:
-			self.currentPage.destroy()
-		self.currentPage = pageClass(self, *args)
+			self.currentPage.pack_forget()
+			if self.currentPage not in self.pageCache.values():
+				self.currentPage.destroy()
+
+		# Reuse the kept instance of the page if it can be brought up to date. Pages opened with arguments are always 
+		# built again, since the kept one may have been built for different arguments.
+		page = self.pageCache.pop(pageName, None)
+		if page is not None and (args or not page.refresh(self.getPageState())):
+			page.destroy()
+			page = None
+
+		# Else use pageClass to create the tkinter frame, and pass in self (App class), and any potential arguments
+		if page is None:
+			page = pageClass(self, *args)
+
+		# Keep the page for next time, and destroy the least recently opened pages if too many are kept
+		if hasattr(page, "refresh"):
+			self.pageCache[pageName] = page
+			while len(self.pageCache) > self.maxCachedPages:
+				_, evictedPage = self.pageCache.popitem(last=False)
+				evictedPage.destroy()
+		self.currentPage = page
   
 		# Pack the new page on the screen
 		self.currentPage.pack(fill="both", expand=True)
+
+	def getPageState(self):
+		return {
+			"loggedInUser": self.loggedInUser,
+			"currentStory": self.currentStory,
+			"isSavedStory": self.isSavedStory,
+			"isRemixedStory": self.isRemixedStory,
+		}
+
+	def clearPageCache(self):
+		for pageName, page in list(self.pageCache.items()):
+			if page is not self.currentPage:
+				del self.pageCache[pageName]
+				page.destroy()
 		
 # Make it so application can only be run from this file; 'python Main.py'
 if __name__ == "__main__":
 	app = App()
-	app.mainloop()
\ No newline at end of file
+	app.mainloop()
+	# Write the messages that are still waiting to be autosaved
+	if app.autosave:
+		app.autosave.stop()
\ No newline at end of file
@@ -0,0 +1,61 @@
+import unittest
+import sys
+import os
+import tempfile
+from unittest import mock
+sys.path.append("..")
+from PIL import Image
+from classes.assets import AssetCache
+
+class TestAssetCache(unittest.TestCase):
+
+	def setUp(self):
+		folder = tempfile.TemporaryDirectory()
+		self.addCleanup(folder.cleanup)
+		for name, color in [("light.png", "white"), ("dark.png", "black"), ("other.png", "red")]:
+			Image.new("RGBA", (400, 400), color).save(os.path.join(folder.name, name))
+		self.folder = folder.name
+		self.assets = AssetCache(self.folder)
+
+	def testImagesAreDecodedOnce(self):
+		with mock.patch("classes.assets.Image.open", wraps=Image.open) as openImage:
+			first = self.assets.getCTkImage("light.png", (50, 50))
+			second = self.assets.getCTkImage("light.png", (50, 50))
+			self.assets.getCTkImage("light.png", (100, 100))
+		self.assertIs(first, second)
+		self.assertEqual(openImage.call_count, 1)
+
+	def testVariantsArePreScaled(self):
+		image = self.assets.getCTkImage("light.png", (50, 50), darkPath="dark.png")
+		self.assertEqual(image.cget("size"), (50, 50))
+		self.assertEqual(image.cget("light_image").size, (100, 100))
+		self.assertEqual(image.cget("dark_image").getpixel((0, 0)), (0, 0, 0, 255))
+		# Not scaled up past the source
+		self.assertEqual(self.assets.getCTkImage("light.png", (300, 300)).cget("light_image").size, (400, 400))
+
+	def testThemeVariantsAreSeparateEntries(self):
+		lightOnly = self.assets.getCTkImage("light.png", (50, 50))
+		withDark = self.assets.getCTkImage("light.png", (50, 50), darkPath="dark.png")
+		self.assertIsNot(lightOnly, withDark)
+
+	def testAbsolutePathsAreUsedAsTheyAre(self):
+		source = self.assets.getSource(os.path.join(self.folder, "other.png"))
+		self.assertEqual(source.getpixel((0, 0)), (255, 0, 0, 255))
+
+	def testEvictsLeastRecentlyUsed(self):
+		# Each source is 400 * 400 * 4 bytes, so only two fit
+		assets = AssetCache(self.folder, memoryBudget=2 * 400 * 400 * 4)
+		light = assets.getSource("light.png")
+		assets.getSource("dark.png")
+		assets.getSource("light.png")
+		assets.getSource("other.png")
+		self.assertEqual(assets.usedMemory, 2 * 400 * 400 * 4)
+		self.assertIs(assets.getSource("light.png"), light)
+		self.assertNotIn(("source", assets.resolvePath("dark.png")), assets.entries)
+
+	def testMissingFilesRaise(self):
+		with self.assertRaises(FileNotFoundError):
+			self.assets.getSource("missing.png")
+
+if __name__ == "__main__":
+	unittest.main()
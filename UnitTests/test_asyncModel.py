@@ -0,0 +1,96 @@
+import unittest
+import asyncio
+import httpx
+import sys
+from types import SimpleNamespace
+sys.path.append("..")
+import openai
+from ai import AsyncStoryGPT, GenerationLimiter, collectResponse
+from classes.resilience import GenerationError, RetryPolicy
+from tools.fakeOpenAIServer import startTestModel, prepareTestModel, FakeServerConfig
+
+class CountingClient:
+	'''
+	- Stand-in for openai.AsyncOpenAI that records how many requests are in flight at the same time
+	'''
+	def __init__(self):
+		self.inFlight = 0
+		self.mostInFlight = 0
+		self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+	async def create(self, **request):
+		self.inFlight += 1
+		self.mostInFlight = max(self.mostInFlight, self.inFlight)
+		try:
+			await asyncio.sleep(0.01)
+		finally:
+			self.inFlight -= 1
+		return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content="Once upon a time."))])
+
+class FlakyClient(CountingClient):
+	'''
+	- Stand-in for openai.AsyncOpenAI whose first request fails with a connection error, which is retried
+	'''
+	def __init__(self):
+		super().__init__()
+		self.requestCount = 0
+
+	async def create(self, **request):
+		self.requestCount += 1
+		if self.requestCount == 1:
+			raise openai.APIConnectionError(request=httpx.Request("POST", "http://127.0.0.1/v1/chat/completions"))
+		return await super().create(**request)
+
+class TestAsyncStoryGPT(unittest.TestCase):
+
+	def makeStoryGPT(self, client, **kwargs):
+		storyGPT = prepareTestModel(AsyncStoryGPT(client=client, **kwargs))
+		storyGPT.candidate_count = 1
+		return storyGPT
+
+	def startStoryGPT(self, config):
+		storyGPT = startTestModel(self, AsyncStoryGPT, config, openai.AsyncClient)
+		storyGPT.candidate_count = 1
+		return storyGPT
+
+	def testCompleteStreamsTheResponse(self):
+		storyGPT = self.startStoryGPT(FakeServerConfig(ttft=0, tokenDelay=0, responseTokens=10))
+		text = asyncio.run(collectResponse(storyGPT.sendStoryPrompt("a dragon")))
+		self.assertTrue(text)
+		self.assertEqual(storyGPT.chatHistory.chat[-1], {"role": "assistant", "content": text})
+
+	def testErrorsAreRaisedInsteadOfBecomingStoryText(self):
+		storyGPT = self.startStoryGPT(FakeServerConfig(ttft=0, errorRate=1, errorStatus=400))
+		storyGPT.retryPolicy = RetryPolicy(maxAttempts=1)
+		with self.assertRaises(GenerationError):
+			asyncio.run(collectResponse(storyGPT.sendStoryPrompt("a dragon")))
+		self.assertEqual(storyGPT.chatHistory.chat[-1], {"role": "assistant", "content": ""})
+
+	def testLimiterCapsRequestsInFlight(self):
+		client = CountingClient()
+		limiter = GenerationLimiter(2)
+		storyGPTs = [self.makeStoryGPT(client, limiter=limiter) for _ in range(6)]
+		for storyGPT in storyGPTs:
+			storyGPT.is_stream = False
+
+		async def generateAll():
+			return await asyncio.gather(*(collectResponse(storyGPT.sendStoryPrompt("a dragon")) for storyGPT in storyGPTs))
+
+		texts = asyncio.run(generateAll())
+		self.assertEqual(texts, ["Once upon a time."] * 6)
+		self.assertEqual(client.mostInFlight, 2)
+
+	def testAbortOnlyCancelsTheCurrentRequest(self):
+		client = FlakyClient()
+		storyGPT = self.makeStoryGPT(client)
+		storyGPT.is_stream = False
+		storyGPT.retryPolicy = RetryPolicy(baseDelay=0)
+		storyGPT.abort()
+		text = asyncio.run(collectResponse(storyGPT.sendStoryPrompt("a dragon")))
+		# The failed first attempt was retried instead of counting as cancelled
+		self.assertEqual(text, "Once upon a time.")
+		self.assertEqual(client.requestCount, 2)
+		self.assertEqual(storyGPT.lastMetrics.status, "finished")
+
+if __name__ == "__main__":
+	unittest.main()
@@ -0,0 +1,211 @@
+import contextlib
+import unittest
+import os
+import queue
+import sys
+import tempfile
+import threading
+import time
+from types import SimpleNamespace
+sys.path.append("..")
+import sqlite3
+from sqlalchemy import event
+from sqlalchemy.exc import OperationalError
+from classes.Database import createEngine
+from classes.models import Base, User, Story, Message
+from classes.dataAccess import DataAccess
+from classes.autosave import DraftAutosave
+from classes.storyPager import StoryPager
+from Main import UserSessionManager
+
+class TestDraftAutosave(unittest.TestCase):
+
+	def setUp(self):
+		# A database file rather than an in-memory one, which shares a single connection between threads, so the autosave 
+		# thread and the test read and write through connections of their own, like they do in the app
+		folder = tempfile.TemporaryDirectory()
+		self.addCleanup(folder.cleanup)
+		self.engine = createEngine(f"sqlite:///{os.path.join(folder.name, 'test.db')}")
+		self.addCleanup(self.engine.dispose)
+		Base.metadata.create_all(self.engine)
+		self.dataAccess = DataAccess(self.engine)
+		self.userID = self.dataAccess.addUser(User(username="knguyen", email="k@gmail.com", firstName="K", lastName="Nguyen", passwordHash="hash", avatar="default_user.jpg")).id
+		self.commitCount = 0
+		event.listen(self.engine, "commit", self.countCommit)
+
+	def countCommit(self, connection):
+		self.commitCount += 1
+
+	def startAutosave(self, interval):
+		autosave = DraftAutosave(self.dataAccess, interval).start()
+		self.addCleanup(autosave.stop)
+		return autosave
+
+	def addMessages(self, autosave, texts):
+		for index, text in enumerate(texts):
+			autosave.addMessage(self.userID, Message(isAISender=index % 2 == 1, text=text))
+
+	def waitForSave(self, save, *args, **columns):
+		# Saves report back on the background thread, the way saveStoryPage gets them
+		outcomes = queue.Queue()
+		save(self.userID, *args, lambda storyID, error: outcomes.put((storyID, error, threading.current_thread())), **columns)
+		return outcomes.get(timeout=5)
+
+	def draftTexts(self):
+		draft = self.dataAccess.loadDraft(self.userID)
+		return None if draft is None else [message.text for message in draft.messages]
+
+	def testMessagesAreWrittenInOneTransaction(self):
+		autosave = self.startAutosave(interval=60)
+		self.addMessages(autosave, ["Once ", "upon ", "a time"])
+		self.assertIsNone(self.draftTexts())
+		autosave.flush()
+		self.assertEqual(self.draftTexts(), ["Once ", "upon ", "a time"])
+		self.assertEqual(self.commitCount, 1)
+
+	def testMessagesAreWrittenAfterTheInterval(self):
+		autosave = self.startAutosave(interval=0.05)
+		self.addMessages(autosave, ["Once ", "upon a time"])
+		deadline = time.monotonic() + 5
+		while self.draftTexts() is None and time.monotonic() < deadline:
+			time.sleep(0.01)
+		self.assertEqual(self.draftTexts(), ["Once ", "upon a time"])
+
+	def testSavingTheDraftAsAStory(self):
+		autosave = self.startAutosave(interval=60)
+		self.addMessages(autosave, ["Once ", "upon a time"])
+		pager = StoryPager(self.dataAccess.readSession, self.userID)
+		autosave.flush()
+		self.assertEqual(pager.countStories(), 0)
+		storyID, error, thread = self.waitForSave(autosave.saveAsStory, "Dragons", summary="A story about dragons", summarizedCount=2)
+		self.assertIsNone(error)
+		self.assertIs(thread, autosave.thread)
+		story = self.dataAccess.loadStory(storyID)
+		self.assertEqual((story.storyTitle, story.isDraft, story.summary), ("Dragons", False, "A story about dragons"))
+		self.assertEqual(self.dataAccess.loadStoryText(storyID), "Once upon a time")
+		pager.refresh()
+		self.assertEqual(pager.countStories(), 1)
+		# The next message starts a new draft
+		self.addMessages(autosave, ["The end"])
+		autosave.flush()
+		self.assertEqual(self.draftTexts(), ["The end"])
+
+	def testSavingTheDraftIntoAStory(self):
+		autosave = self.startAutosave(interval=60)
+		story = self.dataAccess.saveStory(Story(userID=self.userID, storyTitle="Dragons", messages=[Message(isAISender=False, text="Once "), Message(isAISender=True, text="upon ")]))
+		self.addMessages(autosave, ["a ", "time"])
+		self.assertEqual(self.waitForSave(autosave.saveIntoStory, story.id, summary="A story about dragons")[:2], (story.id, None))
+		story = self.dataAccess.loadStory(story.id)
+		self.assertEqual([(message.position, message.text) for message in story.messages], [(0, "Once "), (1, "upon "), (2, "a "), (3, "time")])
+		self.assertEqual(story.summary, "A story about dragons")
+		self.assertIsNone(self.draftTexts())
+
+	def testSavingDoesNotWaitForTheWrite(self):
+		autosave = self.startAutosave(interval=60)
+		outcomes = queue.Queue()
+		# Holds up the background thread, so the save can only be written after saveAsStory has returned
+		release = threading.Event()
+		autosave.queueOperation("flush", (), lambda result, error: release.wait(timeout=5))
+		autosave.saveAsStory(self.userID, "Dragons", lambda storyID, error: outcomes.put((storyID, error)))
+		self.assertTrue(outcomes.empty())
+		release.set()
+		storyID, error = outcomes.get(timeout=5)
+		self.assertIsNone(error)
+		self.assertEqual(self.dataAccess.loadStory(storyID).storyTitle, "Dragons")
+
+	def testFailedSavesReportTheError(self):
+		autosave = self.startAutosave(interval=60)
+		self.addMessages(autosave, ["Once ", "upon a time"])
+		autosave.flush()
+		storyID, error, thread = self.waitForSave(autosave.saveAsStory, "Dragons", notAColumn=1)
+		self.assertIsNone(storyID)
+		self.assertIsNotNone(error)
+		# The draft is left as it was, so it can be saved again
+		self.assertEqual(self.draftTexts(), ["Once ", "upon a time"])
+
+	def testBatchesAreRetriedWhileTheDatabaseIsLocked(self):
+		writeSession = self.dataAccess.writeSession
+		failures = []
+		@contextlib.contextmanager
+		def lockedOnce():
+			if not failures:
+				failures.append(True)
+				raise OperationalError("INSERT INTO messages", {}, sqlite3.OperationalError("database is locked"))
+			with writeSession() as session:
+				yield session
+		self.dataAccess.writeSession = lockedOnce
+		autosave = self.startAutosave(interval=60)
+		self.addMessages(autosave, ["Once ", "upon a time"])
+		autosave.flush()
+		self.assertEqual(failures, [True])
+		self.assertEqual(self.draftTexts(), ["Once ", "upon a time"])
+
+	def testOtherErrorsOnlyFailTheirOwnOperation(self):
+		autosave = self.startAutosave(interval=60)
+		outcomes = queue.Queue()
+		# Holds up the background thread, so the messages and the bad save end up in the same batch
+		release = threading.Event()
+		autosave.queueOperation("flush", (), lambda result, error: release.wait(timeout=5))
+		self.addMessages(autosave, ["Once ", "upon a time"])
+		autosave.saveAsStory(self.userID, "Dragons", lambda storyID, error: outcomes.put((storyID, error)), notAColumn=1)
+		release.set()
+		storyID, error = outcomes.get(timeout=5)
+		self.assertIsNone(storyID)
+		self.assertNotIsInstance(error, OperationalError)
+		self.assertEqual(self.draftTexts(), ["Once ", "upon a time"])
+
+	def testDiscardingAndResumingTheDraft(self):
+		autosave = self.startAutosave(interval=60)
+		self.addMessages(autosave, ["Once ", "upon a time"])
+		autosave.discard(self.userID)
+		self.addMessages(autosave, ["The "])
+		autosave.flush()
+		self.assertEqual(self.draftTexts(), ["The "])
+		# A new autosave (e.g. after the app was restarted) keeps adding to the same draft
+		restarted = self.startAutosave(interval=60)
+		self.addMessages(restarted, ["end"])
+		restarted.flush()
+		draft = self.dataAccess.loadDraft(self.userID)
+		self.assertEqual([(message.position, message.text) for message in draft.messages], [(0, "The "), (1, "end")])
+
+	def resumeDraft(self):
+		populated = []
+		chatHistory = SimpleNamespace(populate=lambda *args: populated.append(args))
+		app = SimpleNamespace(dataAccess=self.dataAccess, loggedInUser=SimpleNamespace(id=self.userID), storyGPT=SimpleNamespace(chatHistory=chatHistory), isRemixedStory=True)
+		UserSessionManager(app).resumeDraft()
+		return app, populated[0]
+
+	def testResumingTheDraftOfASavedStory(self):
+		story = self.dataAccess.saveStory(Story(userID=self.userID, storyTitle="Dragons", summary="A story about dragons", summarizedCount=1, messages=[Message(isAISender=False, text="Once ")]))
+		autosave = self.startAutosave(interval=60)
+		for index, text in enumerate(["upon ", "a time"]):
+			autosave.addMessage(self.userID, Message(isAISender=index % 2 == 0, text=text), story.id)
+		autosave.flush()
+		app, (chat, summary, summarizedCount) = self.resumeDraft()
+		self.assertEqual((app.currentStory.id, app.isSavedStory, app.isRemixedStory), (story.id, True, False))
+		self.assertEqual([message.text for message in app.unsavedStoryMessages], ["upon ", "a time"])
+		self.assertEqual([message["content"] for message in chat], ["Once ", "upon ", "a time"])
+		self.assertEqual((summary, summarizedCount), ("A story about dragons", 1))
+
+	def testResumingTheDraftOfANewStory(self):
+		autosave = self.startAutosave(interval=60)
+		self.addMessages(autosave, ["Once ", "upon a time"])
+		autosave.flush()
+		app, (chat,) = self.resumeDraft()
+		self.assertEqual((app.currentStory, app.isSavedStory), (None, False))
+		self.assertEqual([message["content"] for message in chat], ["Once ", "upon a time"])
+
+	def testStoppingWritesWhatIsQueued(self):
+		autosave = DraftAutosave(self.dataAccess, interval=60).start()
+		self.addMessages(autosave, ["Once ", "upon a time"])
+		autosave.stop()
+		self.assertFalse(autosave.thread.is_alive())
+		self.assertEqual(self.draftTexts(), ["Once ", "upon a time"])
+
+	def testOperationsRunStraightAwayBeforeStarting(self):
+		autosave = DraftAutosave(self.dataAccess)
+		self.addMessages(autosave, ["Once ", "upon a time"])
+		self.assertEqual(self.draftTexts(), ["Once ", "upon a time"])
+
+if __name__ == "__main__":
+	unittest.main()
@@ -0,0 +1,70 @@
+import unittest
+import asyncio
+import sys
+sys.path.append("..")
+import openai
+from ai import StoryGPT, AsyncStoryGPT, GenerationLimiter
+from classes.resilience import GenerationError, RetryPolicy
+from tools.fakeOpenAIServer import startTestModel, FakeServerConfig
+
+class TestCandidates(unittest.TestCase):
+
+	def makeStoryGPT(self, config, storyGPTClass=StoryGPT, clientClass=openai.Client, **kwargs):
+		storyGPT = startTestModel(self, storyGPTClass, config, clientClass, **kwargs)
+		storyGPT.candidate_count = 3
+		return storyGPT
+
+	def testDraftsAreStreamedTogether(self):
+		storyGPT = self.makeStoryGPT(FakeServerConfig(ttft=0, tokenDelay=0, responseTokens=10))
+		texts = ["", "", ""]
+		for index, chunk in storyGPT.sendStoryPrompt("a dragon"):
+			texts[index] += chunk
+		self.assertEqual(storyGPT.candidates, texts)
+		self.assertTrue(all(texts))
+		# Nothing is added to the chat history until a draft is chosen
+		self.assertEqual(storyGPT.chatHistory.chat[-1]["role"], "user")
+		self.assertEqual(storyGPT.chooseCandidate(1), texts[1])
+		self.assertEqual(storyGPT.chatHistory.chat[-1], {"role": "assistant", "content": texts[1]})
+		self.assertIsNone(storyGPT.candidates)
+
+	def testUnchosenDraftsKeepTheFirst(self):
+		storyGPT = self.makeStoryGPT(FakeServerConfig(ttft=0, tokenDelay=0, responseTokens=5))
+		for _ in storyGPT.sendStoryPrompt("a dragon"):
+			pass
+		firstDraft = storyGPT.candidates[0]
+		storyGPT.candidate_count = 1
+		for _ in storyGPT.sendStoryPrompt("a knight"):
+			pass
+		self.assertEqual(storyGPT.chatHistory.chat[-3], {"role": "assistant", "content": firstDraft})
+
+	def testClosingStopsEveryDraft(self):
+		storyGPT = self.makeStoryGPT(FakeServerConfig(ttft=0, tokenDelay=0.01, responseTokens=500))
+		response = storyGPT.sendStoryPrompt("a dragon")
+		next(response)
+		response.close()
+		self.assertEqual(len(storyGPT.candidates), 3)
+		self.assertFalse(storyGPT.activeResponses)
+
+	def testErrorIsRaisedWhenEveryDraftFails(self):
+		storyGPT = self.makeStoryGPT(FakeServerConfig(ttft=0, errorRate=1, errorStatus=400))
+		storyGPT.retryPolicy = RetryPolicy(maxAttempts=1)
+		with self.assertRaises(GenerationError):
+			for _ in storyGPT.sendStoryPrompt("a dragon"):
+				pass
+		self.assertEqual(storyGPT.candidates, ["", "", ""])
+
+	def testAsyncDrafts(self):
+		storyGPT = self.makeStoryGPT(FakeServerConfig(ttft=0, tokenDelay=0, responseTokens=10), AsyncStoryGPT, openai.AsyncClient, limiter=GenerationLimiter(2))
+
+		async def collectDrafts():
+			texts = ["", "", ""]
+			async for index, chunk in storyGPT.sendStoryPrompt("a dragon"):
+				texts[index] += chunk
+			return texts
+
+		texts = asyncio.run(collectDrafts())
+		self.assertEqual(storyGPT.candidates, texts)
+		self.assertTrue(all(texts))
+
+if __name__ == "__main__":
+	unittest.main()
@@ -0,0 +1,50 @@
+import unittest
+import sys
+sys.path.append("..")
+from classes.chunkRenderer import ChunkRenderer
+from classes.models import Message
+
+class FakeMsgbox:
+	def __init__(self):
+		self.text = ""
+		self.insertCount = 0
+		self.heights = []
+
+	def insert(self, index, text):
+		self.text += text
+		self.insertCount += 1
+
+	def configure(self, height):
+		self.heights.append(height)
+
+class TestChunkRenderer(unittest.TestCase):
+
+	def setUp(self):
+		self.msgbox = FakeMsgbox()
+		self.messageObj = Message(text="", isAISender=True)
+		self.renderer = ChunkRenderer(self.msgbox, self.messageObj, prefix="Story Bot: ", maxHeight=90)
+
+	def testChunksAreInsertedOncePerFlush(self):
+		for chunk in ["Once", " upon", " a time."]:
+			self.renderer.add(chunk)
+		self.assertEqual(self.renderer.flush(), 3)
+		self.assertEqual(self.renderer.flush(), 0)
+		self.assertEqual(self.msgbox.text, "Once upon a time.")
+		self.assertEqual(self.msgbox.insertCount, 1)
+		self.assertEqual(self.messageObj.text, "Once upon a time.")
+
+	def testPunctuationIsKept(self):
+		for chunk in [" The dragon slept.", " Why?", " Nobody knew!"]:
+			self.renderer.add(chunk)
+			self.renderer.flush()
+		self.assertEqual(self.messageObj.text, " The dragon slept. Why? Nobody knew!")
+
+	def testOnlyResizedWhenTheLineCountChanges(self):
+		for _ in range(30):
+			self.renderer.add("x" * 10)
+			self.renderer.flush()
+		# 10 + 300 characters is 4 lines, but the height is capped at 3 lines
+		self.assertEqual(self.msgbox.heights, [30, 60, 90])
+
+if __name__ == "__main__":
+	unittest.main()
@@ -0,0 +1,43 @@
+import unittest
+import asyncio
+import sys
+sys.path.append("..")
+from classes.clients import ClientFactory
+
+class TestClientFactory(unittest.TestCase):
+
+	def setUp(self):
+		self.factory = ClientFactory(apiKey="test-key", baseUrl="http://127.0.0.1:9/v1", maxConnections=5, readTimeout=30)
+
+	def tearDown(self):
+		self.factory.close()
+
+	def testClientIsCreatedLazilyAndShared(self):
+		self.assertIsNone(self.factory.client)
+		client = self.factory.getClient()
+		self.assertIs(self.factory.getClient(), client)
+		self.assertEqual(client.max_retries, 0)
+		self.assertEqual(client.timeout.read, 30)
+
+	def testCloseDropsTheClient(self):
+		client = self.factory.getClient()
+		self.factory.close()
+		self.assertIsNone(self.factory.client)
+		self.assertIsNot(self.factory.getClient(), client)
+
+	def testKeyIsOptionalWithABaseUrl(self):
+		factory = ClientFactory(baseUrl="http://127.0.0.1:9/v1")
+		apiKey, baseUrl = factory.getCredentials()
+		self.assertEqual(baseUrl, "http://127.0.0.1:9/v1")
+		self.assertIsNotNone(apiKey)
+
+	def testEveryEventLoopGetsItsOwnAsyncClient(self):
+		async def getClients():
+			return self.factory.getAsyncClient(), self.factory.getAsyncClient()
+		firstClient, sameClient = asyncio.run(getClients())
+		secondClient, _ = asyncio.run(getClients())
+		self.assertIs(firstClient, sameClient)
+		self.assertIsNot(firstClient, secondClient)
+
+if __name__ == "__main__":
+	unittest.main()
@@ -0,0 +1,24 @@
+import unittest
+import sys
+sys.path.append("..")
+from classes.tokens import countTextTokens, countMessageTokens, MESSAGE_OVERHEAD_TOKENS
+
+class TestCountTokens(unittest.TestCase):
+
+	def testEmptyText(self):
+		self.assertEqual(countTextTokens(""), 0)
+
+	def testLongerTextCostsMore(self):
+		shortText = "In a distant land"
+		longText = shortText * 20
+		self.assertGreater(countTextTokens(longText), countTextTokens(shortText))
+
+	def testMessageIncludesOverhead(self):
+		message = {"role": "user", "content": "Lived a young adventurer named Alex"}
+		self.assertEqual(countMessageTokens(message), countTextTokens(message["content"]) + MESSAGE_OVERHEAD_TOKENS)
+
+	def testMessageWithoutContent(self):
+		self.assertEqual(countMessageTokens({"role": "assistant", "content": None}), MESSAGE_OVERHEAD_TOKENS)
+
+if __name__ == "__main__":
+	unittest.main()
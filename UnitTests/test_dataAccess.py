@@ -0,0 +1,69 @@
+import unittest
+import sys
+import threading
+sys.path.append("..")
+from sqlalchemy import inspect
+from classes.Database import createEngine
+from classes.models import Base, User, Story, Message
+from classes.dataAccess import DataAccess
+
+class TestDataAccess(unittest.TestCase):
+
+	def setUp(self):
+		engine = createEngine("sqlite://")
+		Base.metadata.create_all(engine)
+		self.dataAccess = DataAccess(engine)
+		self.user = self.dataAccess.addUser(User(username="knguyen", email="k@gmail.com", firstName="K", lastName="Nguyen", passwordHash="hash", avatar="default_user.jpg"))
+
+	def saveNewStory(self, title, texts):
+		story = Story(userID=self.user.id, storyTitle=title, messages=[Message(isAISender=i % 2 == 1, text=text) for i, text in enumerate(texts)])
+		return self.dataAccess.saveStory(story)
+
+	def testReturnedObjectsAreDetached(self):
+		user = self.dataAccess.findUser("knguyen", "hash")
+		self.assertEqual(user.id, self.user.id)
+		self.assertTrue(inspect(user).detached)
+		self.assertIsNone(self.dataAccess.findUser("knguyen", "wrong"))
+
+	def testUpdateUser(self):
+		user = self.dataAccess.updateUser(self.user.id, avatar="profile.png", firstName="Kevin")
+		self.assertEqual((user.avatar, user.firstName), ("profile.png", "Kevin"))
+		self.assertEqual(self.dataAccess.findUser("knguyen").avatar, "profile.png")
+
+	def testContinuingAStoryAddsMessagesAfterTheSavedOnes(self):
+		story = self.saveNewStory("Dragons", ["Once ", "upon "])
+		story = self.dataAccess.loadStory(story.id)
+		story.messages.append(Message(isAISender=False, text="a time"))
+		story.summary = "A story about dragons"
+		savedStory = self.dataAccess.saveStory(story)
+		self.assertEqual([message.position for message in savedStory.messages], [0, 1, 2])
+		self.assertEqual(self.dataAccess.loadStoryText(story.id), "Once upon a time")
+		self.assertEqual(self.dataAccess.loadStory(story.id).summary, "A story about dragons")
+		self.assertEqual([message.text for message in self.dataAccess.loadMessagesBefore(story.id, 2, 1)], ["upon "])
+
+	def testDeleting(self):
+		story = self.saveNewStory("Dragons", ["Once ", "upon a time"])
+		self.saveNewStory("Knights", ["The end"])
+		self.dataAccess.deleteStory(story.id)
+		self.assertEqual([story.storyTitle for story in self.dataAccess.loadStoriesWithMessages(self.user.id)], ["Knights"])
+		self.dataAccess.deleteUser(self.user.id)
+		with self.dataAccess.readSession() as session:
+			self.assertEqual((session.query(Story).count(), session.query(Message).count()), (0, 0))
+
+	def testFailedWritesAreRolledBack(self):
+		with self.assertRaises(RuntimeError):
+			with self.dataAccess.writeSession() as session:
+				session.get(User, self.user.id).avatar = "profile.png"
+				raise RuntimeError()
+		self.assertEqual(self.dataAccess.findUser("knguyen").avatar, "default_user.jpg")
+
+	def testOperationsWorkFromOtherThreads(self):
+		story = self.saveNewStory("Dragons", ["Once ", "upon a time"])
+		texts = []
+		thread = threading.Thread(target=lambda: texts.append(self.dataAccess.loadStoryText(story.id)))
+		thread.start()
+		thread.join()
+		self.assertEqual(texts, ["Once upon a time"])
+
+if __name__ == "__main__":
+	unittest.main()
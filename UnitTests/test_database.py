@@ -0,0 +1,56 @@
+import unittest
+import sys
+import os
+import tempfile
+import threading
+sys.path.append("..")
+from sqlalchemy import text
+from classes.Database import createEngine
+
+class TestCreateEngine(unittest.TestCase):
+
+	def testFileDatabasesAreTuned(self):
+		folder = tempfile.TemporaryDirectory()
+		self.addCleanup(folder.cleanup)
+		engine = createEngine(f"sqlite:///{os.path.join(folder.name, 'test.db')}", busyTimeout=2.5)
+		self.addCleanup(engine.dispose)
+		with engine.connect() as connection:
+			pragmas = {name: connection.exec_driver_sql(f"PRAGMA {name}").scalar() for name in ["journal_mode", "synchronous", "busy_timeout", "cache_size", "mmap_size"]}
+		self.assertEqual(pragmas["journal_mode"], "wal")
+		# 1 is NORMAL
+		self.assertEqual(pragmas["synchronous"], 1)
+		self.assertEqual(pragmas["busy_timeout"], 2500)
+		self.assertEqual(pragmas["cache_size"], -16 * 1024)
+		self.assertEqual(pragmas["mmap_size"], 256 * 1024 * 1024)
+
+	def testConnectionsCanBeUsedFromOtherThreads(self):
+		folder = tempfile.TemporaryDirectory()
+		self.addCleanup(folder.cleanup)
+		engine = createEngine(f"sqlite:///{os.path.join(folder.name, 'test.db')}")
+		self.addCleanup(engine.dispose)
+		with engine.begin() as connection:
+			connection.execute(text("CREATE TABLE stories (id INTEGER PRIMARY KEY)"))
+			connection.execute(text("INSERT INTO stories VALUES (1)"))
+		counts = []
+		def countStories():
+			with engine.connect() as connection:
+				counts.append(connection.execute(text("SELECT COUNT(*) FROM stories")).scalar())
+		threads = [threading.Thread(target=countStories) for _ in range(4)]
+		for thread in threads:
+			thread.start()
+		for thread in threads:
+			thread.join()
+		self.assertEqual(counts, [1, 1, 1, 1])
+
+	def testInMemoryDatabasesAreShared(self):
+		engine = createEngine("sqlite://")
+		with engine.begin() as connection:
+			connection.execute(text("CREATE TABLE stories (id INTEGER PRIMARY KEY)"))
+		tables = []
+		thread = threading.Thread(target=lambda: tables.append(engine.connect().execute(text("SELECT name FROM sqlite_master")).scalar()))
+		thread.start()
+		thread.join()
+		self.assertEqual(tables, ["stories"])
+
+if __name__ == "__main__":
+	unittest.main()
@@ -0,0 +1,41 @@
+import unittest
+import sys
+sys.path.append("..")
+import openai
+from tools.fakeOpenAIServer import startServer, FakeServerConfig
+
+class TestFakeOpenAIServer(unittest.TestCase):
+
+	def startClient(self, config):
+		server = startServer(config)
+		self.addCleanup(server.shutdown)
+		return openai.Client(api_key="local", base_url=f"http://127.0.0.1:{server.server_port}/v1", max_retries=0)
+
+	def testStreamingResponse(self):
+		client = self.startClient(FakeServerConfig(ttft=0, tokenDelay=0, responseTokens=50))
+		response = client.chat.completions.create(model="gpt-3.5-turbo", messages=[{"role": "user", "content": "Write a story"}], max_tokens=10, stream=True)
+		chunks = [chunk.choices[0].delta.content for chunk in response if chunk.choices[0].delta.content]
+		# max_tokens caps the response
+		self.assertEqual(len(chunks), 10)
+
+	def testNonStreamingResponse(self):
+		client = self.startClient(FakeServerConfig(ttft=0, tokenDelay=0, responseTokens=5))
+		response = client.chat.completions.create(model="gpt-3.5-turbo", messages=[{"role": "user", "content": "Write a story"}])
+		self.assertEqual(len(response.choices[0].message.content.split()), 5)
+		self.assertEqual(response.usage.completion_tokens, 5)
+
+	def testSimulatedErrors(self):
+		client = self.startClient(FakeServerConfig(ttft=0, errorRate=1, errorStatus=429, retryAfter=1))
+		with self.assertRaises(openai.RateLimitError) as context:
+			client.chat.completions.create(model="gpt-3.5-turbo", messages=[{"role": "user", "content": "Write a story"}])
+		self.assertEqual(context.exception.response.headers["Retry-After"], "1")
+
+	def testStreamCutOff(self):
+		client = self.startClient(FakeServerConfig(ttft=0, tokenDelay=0, streamErrorRate=1, responseTokens=20, seed=1))
+		response = client.chat.completions.create(model="gpt-3.5-turbo", messages=[{"role": "user", "content": "Write a story"}], stream=True)
+		with self.assertRaises(openai.APIError):
+			for chunk in response:
+				pass
+
+if __name__ == "__main__":
+	unittest.main()
@@ -0,0 +1,98 @@
+import unittest
+import threading
+import sys
+sys.path.append("..")
+from ai import StoryGPT
+from classes.generationWorker import GenerationWorker
+from classes.resilience import GenerationError
+from tools.fakeOpenAIServer import startTestModel, FakeServerConfig
+
+def collectEvents(worker):
+	worker.thread.join(timeout=5)
+	return worker.drain()
+
+class TestGenerationWorker(unittest.TestCase):
+
+	def testChunksThenDone(self):
+		chunks = ["Once upon", " a time", " there was a dragon."]
+		worker = GenerationWorker(iter(chunks)).start()
+		events = collectEvents(worker)
+		self.assertEqual(events, [(GenerationWorker.CHUNK, chunk) for chunk in chunks] + [(GenerationWorker.DONE, None)])
+
+	def testErrorIsReported(self):
+		def failingGenerator():
+			yield "Once upon"
+			raise RuntimeError("connection dropped")
+		worker = GenerationWorker(failingGenerator()).start()
+		events = collectEvents(worker)
+		self.assertEqual(events[0], (GenerationWorker.CHUNK, "Once upon"))
+		self.assertEqual(events[-1][0], GenerationWorker.ERROR)
+		self.assertIsInstance(events[-1][1], RuntimeError)
+
+	def testCancelStopsAndClosesGenerator(self):
+		release = threading.Event()
+		closed = threading.Event()
+		def slowGenerator():
+			try:
+				yield "first"
+				release.wait(timeout=5)
+				yield "second"
+				yield "third"
+			finally:
+				closed.set()
+		abortCalls = []
+		worker = GenerationWorker(slowGenerator(), onCancel=lambda: abortCalls.append(True)).start()
+		worker.cancel()
+		release.set()
+		events = collectEvents(worker)
+		self.assertTrue(closed.is_set())
+		self.assertEqual(abortCalls, [True])
+		self.assertEqual(events[-1], (GenerationWorker.CANCELLED, None))
+		self.assertNotIn((GenerationWorker.CHUNK, "third"), events)
+
+	def makeStoryGPT(self, tokenDelay):
+		return startTestModel(self, StoryGPT, FakeServerConfig(ttft=0, tokenDelay=tokenDelay, responseTokens=200))
+
+	def testHistoryOnlyKeepsTheChunksThatWereShown(self):
+		storyGPT = self.makeStoryGPT(tokenDelay=0.01)
+		worker = GenerationWorker(storyGPT.sendStoryPrompt("a dragon"), onCancel=storyGPT.abort).start()
+		# Cancel once a few chunks have been shown, like the Stop button would
+		events = []
+		while len(events) < 5:
+			events.append(worker.events.get(timeout=5))
+		worker.cancel()
+		events += collectEvents(worker)
+		# AIChatPage renders every chunk that was queued before the final event
+		shownChunks = [chunk for kind, chunk in events if kind == GenerationWorker.CHUNK]
+		self.assertEqual(events[-1], (GenerationWorker.CANCELLED, None))
+		self.assertGreaterEqual(len(shownChunks), 5)
+		self.assertLess(len(shownChunks), 200)
+		self.assertEqual(storyGPT.chatHistory.chat[-1], {"role": "assistant", "content": "".join(shownChunks)})
+
+	def testCancellingBeforeStartingSendsNoRequest(self):
+		storyGPT = self.makeStoryGPT(tokenDelay=0)
+		chat = list(storyGPT.chatHistory.chat)
+		worker = GenerationWorker(storyGPT.sendStoryPrompt("a dragon"), onCancel=storyGPT.abort)
+		worker.cancel()
+		worker.start()
+		self.assertEqual(collectEvents(worker), [(GenerationWorker.CANCELLED, None)])
+		self.assertIsNone(storyGPT.lastMetrics)
+		self.assertEqual(storyGPT.chatHistory.chat, chat)
+
+	def testStopBeforeTheFirstChunkCancelsTheRequest(self):
+		storyGPT = self.makeStoryGPT(tokenDelay=0)
+		generator = storyGPT.sendStoryPrompt("a dragon")
+		# Pressed after the response was asked for, but before the worker's thread started running the generator
+		storyGPT.abort()
+		with self.assertRaises(GenerationError):
+			next(generator)
+		self.assertEqual(storyGPT.lastMetrics.status, "cancelled")
+
+	def testDrainRespectsMaxEvents(self):
+		worker = GenerationWorker(iter(["a", "b", "c"])).start()
+		worker.thread.join(timeout=5)
+		self.assertEqual(len(worker.drain(maxEvents=2)), 2)
+		self.assertEqual(len(worker.drain()), 2)
+
+if __name__ == "__main__":
+	unittest.main()
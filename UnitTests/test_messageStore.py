@@ -0,0 +1,91 @@
+import unittest
+import sys
+sys.path.append("..")
+from classes.messageStore import MessageStore
+from ai import ChatHistoryManager
+
+def makeStore(count):
+	store = MessageStore()
+	store.extend(("user" if i % 2 == 0 else "assistant", f"Message {i}", 10) for i in range(count))
+	return store
+
+class TestMessageStore(unittest.TestCase):
+
+	def testAppendAndToMessages(self):
+		store = makeStore(2)
+		messageId = store.append("user", "Message 2", 5)
+		self.assertEqual(store.toMessages()[-1], {"role": "user", "content": "Message 2"})
+		self.assertEqual(store.positionOf(messageId), 2)
+		self.assertEqual(len(store), 3)
+		self.assertEqual(store.totalTokens, 25)
+
+	def testIdsAreStable(self):
+		store = makeStore(5)
+		messageId = store.idAt(3)
+		store.removeAt(1)
+		store.insert(0, "user", "Inserted", 1)
+		self.assertEqual(store.get(messageId).content, "Message 3")
+		self.assertEqual(store.positionOf(messageId), 3)
+
+	def testRemoveById(self):
+		store = makeStore(5)
+		removedId = store.idAt(2)
+		record = store.removeById(removedId)
+		self.assertEqual(record.content, "Message 2")
+		self.assertEqual([message["content"] for message in store.toMessages()], ["Message 0", "Message 1", "Message 3", "Message 4"])
+		self.assertEqual(store.totalTokens, 40)
+		self.assertIsNone(store.findId("assistant", "Message 2"))
+		with self.assertRaises(KeyError):
+			store.removeById(removedId)
+
+	def testFindIdReturnsFirstInChat(self):
+		store = makeStore(2)
+		laterId = store.append("user", "Repeated", 1)
+		earlierId = store.insert(0, "user", "Repeated", 1)
+		self.assertEqual(store.findId("user", "Repeated"), earlierId)
+		store.removeById(earlierId)
+		self.assertEqual(store.findId("user", "Repeated"), laterId)
+
+	def testCachedMessagesFollowChanges(self):
+		store = makeStore(3)
+		messages = store.toMessages()
+		store.append("user", "Message 3", 1)
+		self.assertEqual(len(store.toMessages()), 4)
+		store.removeAt(-1)
+		store.removeAt(0)
+		store.insert(1, "user", "Inserted", 1)
+		self.assertEqual([message["content"] for message in store.toMessages()], ["Message 1", "Inserted", "Message 2"])
+
+	def testTombstonesAreCompacted(self):
+		store = makeStore(200)
+		for position in range(0, 200, 2):
+			store.removeById(store.findId("user", f"Message {position}"))
+		self.assertLess(store.tombstoneCount, MessageStore.MIN_TOMBSTONES_TO_COMPACT)
+		self.assertEqual(len(store), 100)
+		self.assertEqual(store.records(0, 2)[1].content, "Message 3")
+
+class TestSummarizedMessages(unittest.TestCase):
+
+	def setUp(self):
+		self.chatHistory = ChatHistoryManager("Write a story", "You write stories")
+		self.chatHistory.populate([{"role": "user" if i % 2 == 0 else "assistant", "content": f"Message {i}"} for i in range(10)], "The story so far", 4)
+		self.ids = [self.chatHistory.messages.idAt(len(self.chatHistory.startingChat) + i) for i in range(10)]
+
+	def testRemovingDoesNotCompact(self):
+		self.chatHistory.removeMessageById(self.ids[5])
+		self.chatHistory.removeMessageById(self.ids[1])
+		self.assertEqual(self.chatHistory.messages.tombstoneCount, 2)
+		self.assertEqual(self.chatHistory.summarizedCount, 3)
+
+	def testRemovingAfterAnInsert(self):
+		self.chatHistory.addMessageAt("Inserted", len(self.chatHistory.startingChat) + 1)
+		# The summary covered Messages 0-3, and now covers Message 0, Inserted and Messages 1-2
+		self.chatHistory.removeMessageById(self.ids[3])
+		self.assertEqual(self.chatHistory.summarizedCount, 4)
+		self.chatHistory.removeMessageById(self.ids[2])
+		self.assertEqual(self.chatHistory.summarizedCount, 3)
+		self.assertEqual(self.chatHistory.popMessage(len(self.chatHistory.startingChat) + 1)["content"], "Inserted")
+		self.assertEqual(self.chatHistory.summarizedCount, 2)
+
+if __name__ == "__main__":
+	unittest.main()
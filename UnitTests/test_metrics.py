@@ -0,0 +1,81 @@
+import unittest
+import json
+import os
+import tempfile
+import sys
+sys.path.append("..")
+from classes.metrics import RequestMetrics, RenderMetrics, RingBufferSink, JSONLFileSink, PrometheusSink, MultiSink, makeSink
+
+def makeFinishedMetrics(status="finished"):
+	metrics = RequestMetrics("gpt-3.5-turbo")
+	metrics.recordBuild(promptMessages=4, promptTokens=120)
+	for chunk in ["Once", " upon", " a", " time"]:
+		metrics.recordChunk(chunk)
+	metrics.finish(status)
+	return metrics
+
+class TestMetrics(unittest.TestCase):
+
+	def testRequestTimings(self):
+		record = makeFinishedMetrics().toDict()
+		self.assertEqual(record["kind"], "request")
+		self.assertEqual(record["status"], "finished")
+		self.assertEqual(record["chunkCount"], 4)
+		self.assertEqual(record["characterCount"], len("Once upon a time"))
+		self.assertEqual(record["promptTokens"], 120)
+		self.assertGreaterEqual(record["timeToFirstChunk"], 0)
+		self.assertGreaterEqual(record["totalSeconds"], record["timeToFirstChunk"])
+		self.assertGreaterEqual(record["maxChunkGap"], record["meanChunkGap"])
+
+	def testRequestWithoutChunks(self):
+		metrics = RequestMetrics("gpt-3.5-turbo")
+		metrics.finish("cancelled")
+		record = metrics.toDict()
+		self.assertIsNone(record["timeToFirstChunk"])
+		self.assertIsNone(record["chunksPerSecond"])
+		self.assertIsNone(record["maxChunkGap"])
+
+	def testRingBufferKeepsLatest(self):
+		sink = RingBufferSink(capacity=2)
+		for status in ["finished", "error", "cancelled"]:
+			sink.record(makeFinishedMetrics(status))
+		renderMetrics = RenderMetrics()
+		renderMetrics.recordRender(3, 0.01)
+		renderMetrics.finish("done")
+		sink.record(renderMetrics)
+		self.assertEqual([record["status"] for record in sink.getRecords("request")], ["cancelled"])
+		self.assertEqual(sink.getRecords("render")[0]["chunkCount"], 3)
+
+	def testJSONLFileSink(self):
+		with tempfile.TemporaryDirectory() as directory:
+			path = os.path.join(directory, "metrics.jsonl")
+			sink = JSONLFileSink(path)
+			sink.record(makeFinishedMetrics())
+			sink.record(makeFinishedMetrics("error"))
+			with open(path, "r") as f:
+				records = [json.loads(line) for line in f]
+		self.assertEqual([record["status"] for record in records], ["finished", "error"])
+
+	def testPrometheusSink(self):
+		with tempfile.TemporaryDirectory() as directory:
+			path = os.path.join(directory, "metrics.prom")
+			sink = PrometheusSink(path)
+			sink.record(makeFinishedMetrics())
+			sink.record(makeFinishedMetrics())
+			sink.record(makeFinishedMetrics("error"))
+			with open(path, "r") as f:
+				text = f.read()
+		self.assertEqual(text, sink.render())
+		self.assertIn('booksmart_requests_total{status="finished"} 2', text)
+		self.assertIn('booksmart_requests_total{status="error"} 1', text)
+		self.assertIn('booksmart_time_to_first_chunk_seconds_bucket{le="+Inf"} 3', text)
+
+	def testMakeSink(self):
+		self.assertIsNone(makeSink(""))
+		self.assertIsInstance(makeSink("memory"), RingBufferSink)
+		self.assertIsInstance(makeSink("metrics.prom"), PrometheusSink)
+		self.assertIsInstance(makeSink("metrics.jsonl"), JSONLFileSink)
+		self.assertIsInstance(makeSink("memory,metrics.jsonl"), MultiSink)
+
+if __name__ == "__main__":
+	unittest.main()
@@ -0,0 +1,113 @@
+import unittest
+import sys
+from collections import OrderedDict
+sys.path.append("..")
+from Main import App
+
+class FakePage:
+	'''
+	- Stand-in for a page frame that records how it was shown
+	'''
+	builtCount = 0
+
+	def __init__(self, master):
+		type(self).builtCount += 1
+		self.isPacked = False
+		self.isDestroyed = False
+
+	def pack(self, **kwargs):
+		self.isPacked = True
+
+	def pack_forget(self):
+		self.isPacked = False
+
+	def destroy(self):
+		self.isDestroyed = True
+
+class KeptPage(FakePage):
+	isUpToDate = True
+
+	def refresh(self, state):
+		self.lastState = state
+		return self.isUpToDate
+
+class FakeApp:
+	'''
+	- Has just what App.openPage needs, so the page lifecycle can be tested without a window
+	'''
+	openPage = App.openPage
+	getPageState = App.getPageState
+	clearPageCache = App.clearPageCache
+
+	def __init__(self, pageClasses):
+		self.pageClasses = pageClasses
+		self.pageCache = OrderedDict()
+		self.maxCachedPages = 2
+		self.currentPage = None
+		self.loggedInUser = "knguyen"
+		self.currentStory = None
+		self.isSavedStory = False
+		self.isRemixedStory = False
+
+	def getPageLazy(self, pageName):
+		return self.pageClasses.get(pageName)
+
+class TestPageCache(unittest.TestCase):
+
+	def setUp(self):
+		self.pageClasses = {name: type(name, (KeptPage,), {"builtCount": 0}) for name in ["homePage", "storyLibraryPage", "userAccountPage"]}
+		self.pageClasses["userLoginPage"] = type("userLoginPage", (FakePage,), {"builtCount": 0})
+		self.app = FakeApp(self.pageClasses)
+
+	def testKeptPagesAreShownAgain(self):
+		self.app.openPage("homePage")
+		homePage = self.app.currentPage
+		self.app.openPage("storyLibraryPage")
+		self.assertFalse(homePage.isPacked)
+		self.assertFalse(homePage.isDestroyed)
+		self.app.openPage("homePage")
+		self.assertIs(self.app.currentPage, homePage)
+		self.assertTrue(homePage.isPacked)
+		self.assertEqual(self.pageClasses["homePage"].builtCount, 1)
+		self.assertEqual(homePage.lastState["loggedInUser"], "knguyen")
+
+	def testPagesWithoutRefreshAreDestroyed(self):
+		self.app.openPage("userLoginPage")
+		loginPage = self.app.currentPage
+		self.app.openPage("homePage")
+		self.assertTrue(loginPage.isDestroyed)
+		self.app.openPage("userLoginPage")
+		self.assertEqual(self.pageClasses["userLoginPage"].builtCount, 2)
+
+	def testOutOfDatePagesAreBuiltAgain(self):
+		self.app.openPage("storyLibraryPage")
+		libraryPage = self.app.currentPage
+		libraryPage.isUpToDate = False
+		self.app.openPage("storyLibraryPage")
+		self.assertTrue(libraryPage.isDestroyed)
+		self.assertIsNot(self.app.currentPage, libraryPage)
+		self.assertTrue(self.app.currentPage.isPacked)
+
+	def testLeastRecentlyOpenedPageIsEvicted(self):
+		self.app.openPage("homePage")
+		homePage = self.app.currentPage
+		self.app.openPage("storyLibraryPage")
+		self.app.openPage("homePage")
+		self.app.openPage("userAccountPage")
+		self.assertEqual(list(self.app.pageCache), ["homePage", "userAccountPage"])
+		self.assertFalse(homePage.isDestroyed)
+		self.assertEqual(self.pageClasses["storyLibraryPage"].builtCount, 1)
+		self.app.openPage("storyLibraryPage")
+		self.assertEqual(self.pageClasses["storyLibraryPage"].builtCount, 2)
+
+	def testClearingKeepsTheCurrentPage(self):
+		self.app.openPage("homePage")
+		homePage = self.app.currentPage
+		self.app.openPage("userAccountPage")
+		self.app.clearPageCache()
+		self.assertTrue(homePage.isDestroyed)
+		self.assertFalse(self.app.currentPage.isDestroyed)
+		self.assertEqual(list(self.app.pageCache), ["userAccountPage"])
+
+if __name__ == "__main__":
+	unittest.main()
@@ -0,0 +1,75 @@
+import unittest
+import sys
+sys.path.append("..")
+from sqlalchemy import event, inspect
+from sqlalchemy.exc import InvalidRequestError
+from sqlalchemy.orm import Session
+from classes.Database import createEngine
+from classes.models import Base, User, Story, Message
+from classes.queries import libraryPageQuery, loadStoriesWithMessages, loadStoryText
+
+class TestQueries(unittest.TestCase):
+
+	def setUp(self):
+		self.engine = createEngine("sqlite://")
+		Base.metadata.create_all(self.engine)
+		self.statements = []
+		event.listen(self.engine, "before_cursor_execute", lambda connection, cursor, statement, *args: self.statements.append(statement))
+
+	def addUser(self, username, storyCount):
+		with Session(self.engine) as session:
+			user = User(username=username, email=f"{username}@gmail.com", firstName="K", lastName="Nguyen", passwordHash="hash", avatar="default_user.jpg")
+			user.stories = [Story(storyTitle=f"Story {i}", messages=[Message(isAISender=False, text="Once "), Message(isAISender=True, text="upon a time")]) for i in range(storyCount)]
+			session.add(user)
+			session.commit()
+			return user.id
+
+	def countSelects(self, function):
+		'''
+		- Calls function with a new session, and returns how many SELECTs it sent along with what it returned
+		'''
+		with Session(self.engine) as session:
+			self.statements.clear()
+			result = function(session)
+			return sum(statement.lstrip().upper().startswith("SELECT") for statement in self.statements), result
+
+	def testLoadingStoriesWithMessagesSendsTheSameQueriesForAnyNumberOfStories(self):
+		def exportStories(userID):
+			def loadAll(session):
+				stories = loadStoriesWithMessages(session, userID)
+				return [[message.text for message in story.messages] for story in stories]
+			return loadAll
+		fewQueries, fewTexts = self.countSelects(exportStories(self.addUser("few", 3)))
+		manyQueries, manyTexts = self.countSelects(exportStories(self.addUser("many", 40)))
+		self.assertEqual(fewQueries, 2)
+		self.assertEqual(manyQueries, 2)
+		self.assertEqual(manyTexts, [["Once ", "upon a time"]] * 40)
+
+	def testUserStoriesLoadTheirMessagesInOneQuery(self):
+		userID = self.addUser("knguyen", 25)
+		queryCount, messageCount = self.countSelects(lambda session: sum(len(story.messages) for story in session.get(User, userID).stories))
+		self.assertEqual(queryCount, 3)
+		self.assertEqual(messageCount, 50)
+
+	def testLibraryPagesOnlyLoadTheirColumns(self):
+		userID = self.addUser("knguyen", 15)
+		queryCount, stories = self.countSelects(lambda session: list(session.scalars(libraryPageQuery(userID, 12))))
+		self.assertEqual(queryCount, 1)
+		self.assertEqual([story.storyTitle for story in stories], [f"Story {i}" for i in range(12)])
+		self.assertEqual(inspect(stories[0]).unloaded, {"summary", "summarizedCount", "isDraft", "draftOfStoryID", "messages", "user"})
+
+	def testLoadStoryText(self):
+		userID = self.addUser("knguyen", 1)
+		with Session(self.engine) as session:
+			story = session.scalars(libraryPageQuery(userID, 1)).one()
+			self.assertEqual(loadStoryText(session, story.id), "Once upon a time")
+
+	def testMessagesNeverQueryTheirStory(self):
+		userID = self.addUser("knguyen", 1)
+		with Session(self.engine) as session:
+			message = session.get(Message, 1)
+			with self.assertRaises(InvalidRequestError):
+				message.story
+
+if __name__ == "__main__":
+	unittest.main()
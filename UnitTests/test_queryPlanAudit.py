@@ -0,0 +1,27 @@
+import unittest
+import sys
+sys.path.append("..")
+from classes.Database import createEngine
+from tools.queryPlanAudit import buildDatabase, auditQueries
+
+class TestQueryPlanAudit(unittest.TestCase):
+
+	def setUp(self):
+		self.engine = createEngine("sqlite://")
+		buildDatabase(self.engine, userCount=20, storiesPerUser=3, messagesPerStory=10)
+
+	def testNoQueryScansAWholeTable(self):
+		results = auditQueries(self.engine)
+		self.assertEqual({result["query"] for result in results if not result["passed"]}, set())
+		self.assertIn("load Story.messages", {result["query"] for result in results})
+
+	def testMissingIndexesAreCaught(self):
+		with self.engine.begin() as connection:
+			connection.exec_driver_sql('DROP INDEX "ix_messages_storyID_position"')
+		failedQueries = {result["query"] for result in auditQueries(self.engine) if not result["passed"]}
+		self.assertIn("load Story.messages", failedQueries)
+		self.assertIn("load older messages of a story", failedQueries)
+		self.assertNotIn("find user by username", failedQueries)
+
+if __name__ == "__main__":
+	unittest.main()
@@ -0,0 +1,108 @@
+import unittest
+import sys
+sys.path.append("..")
+import httpx
+import openai
+from classes.resilience import RetryPolicy, CircuitBreaker, CircuitOpenError, StreamResumer
+
+def makeStatusError(errorClass, status, headers=None):
+	request = httpx.Request("POST", "http://127.0.0.1/v1/chat/completions")
+	response = httpx.Response(status, headers=headers or {}, request=request)
+	return errorClass("Simulated failure", response=response, body=None)
+
+class FakeClock:
+	def __init__(self):
+		self.now = 0.0
+
+	def __call__(self):
+		return self.now
+
+class TestRetryPolicy(unittest.TestCase):
+
+	def testTransientErrorsAreRetried(self):
+		policy = RetryPolicy()
+		self.assertTrue(policy.isRetryable(makeStatusError(openai.RateLimitError, 429)))
+		self.assertTrue(policy.isRetryable(makeStatusError(openai.InternalServerError, 503)))
+		self.assertTrue(policy.isRetryable(httpx.ReadError("Connection dropped")))
+		self.assertFalse(policy.isRetryable(makeStatusError(openai.BadRequestError, 400)))
+		self.assertFalse(policy.isRetryable(ValueError("Not from the API")))
+
+	def testBackoffIsJitteredAndCapped(self):
+		policy = RetryPolicy(maxAttempts=10, baseDelay=1, maxDelay=5, seed=1)
+		error = makeStatusError(openai.InternalServerError, 500)
+		for attempt in range(1, 10):
+			delay = policy.getDelay(attempt, error)
+			self.assertGreaterEqual(delay, 0)
+			self.assertLessEqual(delay, min(5, 2 ** (attempt - 1)))
+		self.assertIsNone(policy.getDelay(10, error))
+
+	def testRetryAfterIsHonoured(self):
+		policy = RetryPolicy(maxRetryAfter=10)
+		self.assertEqual(policy.getDelay(1, makeStatusError(openai.RateLimitError, 429, {"retry-after": "3"})), 3)
+		self.assertEqual(policy.getDelay(1, makeStatusError(openai.RateLimitError, 429, {"retry-after-ms": "250"})), 0.25)
+		# Waiting longer than maxRetryAfter isn't worth it
+		self.assertIsNone(policy.getDelay(1, makeStatusError(openai.RateLimitError, 429, {"retry-after": "60"})))
+
+	def testNonRetryableErrorsAreNotRetried(self):
+		self.assertIsNone(RetryPolicy().getDelay(1, makeStatusError(openai.AuthenticationError, 401)))
+
+class TestCircuitBreaker(unittest.TestCase):
+
+	def testOpensAfterConsecutiveFailures(self):
+		clock = FakeClock()
+		breaker = CircuitBreaker(failureThreshold=3, resetTimeout=30, clock=clock)
+		breaker.recordFailure()
+		breaker.recordFailure()
+		breaker.recordSuccess()
+		breaker.recordFailure()
+		breaker.recordFailure()
+		self.assertTrue(breaker.allowRequest())
+		breaker.recordFailure()
+		self.assertFalse(breaker.allowRequest())
+		clock.now = 20
+		with self.assertRaises(CircuitOpenError) as context:
+			breaker.checkRequest()
+		self.assertAlmostEqual(context.exception.retryAfter, 10)
+
+	def testHalfOpenAllowsOneTrial(self):
+		clock = FakeClock()
+		breaker = CircuitBreaker(failureThreshold=1, resetTimeout=30, clock=clock)
+		breaker.recordFailure()
+		clock.now = 30
+		self.assertTrue(breaker.allowRequest())
+		self.assertFalse(breaker.allowRequest())
+		breaker.recordFailure()
+		self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+		clock.now = 60
+		self.assertTrue(breaker.allowRequest())
+		breaker.recordSuccess()
+		self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+		self.assertTrue(breaker.allowRequest())
+
+class TestStreamResumer(unittest.TestCase):
+	request = {"model": "gpt-3.5-turbo", "messages": [{"role": "user", "content": "Write a story"}], "stream": True}
+
+	def resume(self, firstChunks, secondChunks):
+		resumer = StreamResumer(self.request, minOverlap=5, overlapWindow=40)
+		self.assertIs(resumer.nextRequest(), self.request)
+		shown = [resumer.accept(chunk) for chunk in firstChunks]
+		resumeRequest = resumer.nextRequest()
+		self.assertEqual(resumeRequest["messages"][-2], {"role": "assistant", "content": "".join(firstChunks)})
+		shown += [resumer.accept(chunk) for chunk in secondChunks]
+		shown.append(resumer.flush())
+		self.assertEqual("".join(shown), resumer.text)
+		return resumer.text
+
+	def testContinuation(self):
+		self.assertEqual(self.resume(["Once", " upon"], [" a time", " there was a dragon."]), "Once upon a time there was a dragon.")
+
+	def testRepeatedEndIsDropped(self):
+		text = self.resume(["Once upon a time", " there was"], [" there was a dragon", " who found a pendant in the forest."])
+		self.assertEqual(text, "Once upon a time there was a dragon who found a pendant in the forest.")
+
+	def testStartingOverIsDropped(self):
+		text = self.resume(["Once upon", " a time"], ["Once upon a", " time there", " was a dragon."])
+		self.assertEqual(text, "Once upon a time there was a dragon.")
+
+if __name__ == "__main__":
+	unittest.main()
@@ -0,0 +1,61 @@
+import unittest
+import os
+import tempfile
+import sys
+sys.path.append("..")
+from classes.responseCache import ResponseCache
+
+def makeRequest(content, temperature=0.8):
+	return {
+		"model": "gpt-3.5-turbo",
+		"messages": [{"role": "user", "content": content}],
+		"temperature": temperature,
+		"top_p": 1,
+		"stream": True,
+	}
+
+class TestResponseCache(unittest.TestCase):
+
+	def testKeyIgnoresStreamButNotSamplingParameters(self):
+		request = makeRequest("Write a story about a pendant")
+		nonStreamingRequest = dict(request, stream=False)
+		self.assertEqual(ResponseCache.makeKey(request), ResponseCache.makeKey(nonStreamingRequest))
+		self.assertNotEqual(ResponseCache.makeKey(request), ResponseCache.makeKey(makeRequest("Write a story about a pendant", temperature=1)))
+		self.assertNotEqual(ResponseCache.makeKey(request), ResponseCache.makeKey(makeRequest("Write a story about a dragon")))
+
+	def testLeastRecentlyUsedIsEvicted(self):
+		cache = ResponseCache(maxEntries=2)
+		cache.put("a", "first")
+		cache.put("b", "second")
+		cache.get("a")
+		cache.put("c", "third")
+		self.assertEqual(cache.get("a"), "first")
+		self.assertIsNone(cache.get("b"))
+		self.assertEqual(cache.get("c"), "third")
+
+	def testPersistentTierSurvivesNewInstance(self):
+		with tempfile.TemporaryDirectory() as directory:
+			databasePath = os.path.join(directory, "cache.db")
+			cache = ResponseCache(databasePath=databasePath)
+			cache.put("key", "In a distant land")
+			cache.connection.close()
+
+			reopenedCache = ResponseCache(databasePath=databasePath)
+			self.assertEqual(reopenedCache.get("key"), "In a distant land")
+			reopenedCache.connection.close()
+
+	def testPersistentTierIsBounded(self):
+		cache = ResponseCache(maxEntries=1, databasePath=":memory:", maxPersistentEntries=2)
+		for key in ("a", "b", "c"):
+			cache.put(key, key)
+		rowCount = cache.connection.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+		self.assertEqual(rowCount, 2)
+
+	def testReplayRebuildsResponse(self):
+		response = "Once upon a time,\n\nthere was a dragon.  The End. "
+		chunks = list(ResponseCache.replay(response))
+		self.assertGreater(len(chunks), 1)
+		self.assertEqual("".join(chunks), response)
+
+if __name__ == "__main__":
+	unittest.main()
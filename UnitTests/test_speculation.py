@@ -0,0 +1,58 @@
+import unittest
+import sys
+sys.path.append("..")
+from ai import StoryGPT
+from tools.fakeOpenAIServer import startTestModel, FakeServerConfig
+
+class TestSpeculativePrefetch(unittest.TestCase):
+
+	def setUp(self):
+		self.storyGPT = startTestModel(self, StoryGPT, FakeServerConfig(ttft=0, tokenDelay=0, responseTokens=20))
+		self.storyGPT.speculative_prefetch = True
+		self.addCleanup(self.storyGPT.cancelSpeculation)
+
+	def sendStoryPrompt(self, topic):
+		return "".join(self.storyGPT.sendStoryPrompt(topic))
+
+	def testContinuationIsServedFromSpeculation(self):
+		self.sendStoryPrompt("a dragon")
+		speculation = self.storyGPT.speculateContinuation()
+		speculation.thread.join()
+		text = self.sendStoryPrompt("Keep going!")
+		self.assertTrue(self.storyGPT.lastMetrics.speculative)
+		self.assertEqual(text, "".join(speculation.chunks))
+		self.assertEqual(self.storyGPT.chatHistory.chat[-1], {"role": "assistant", "content": text})
+		self.assertIsNone(self.storyGPT.speculation)
+
+	def testOtherMessagesCancelTheSpeculation(self):
+		self.sendStoryPrompt("a dragon")
+		speculation = self.storyGPT.speculateContinuation()
+		self.sendStoryPrompt("make the dragon friendly")
+		self.assertTrue(speculation.isCancelled)
+		self.assertFalse(self.storyGPT.lastMetrics.speculative)
+
+	def testChangedSettingsAreNotServed(self):
+		self.sendStoryPrompt("a dragon")
+		self.storyGPT.speculateContinuation()
+		self.storyGPT.temperature = 0.2
+		self.sendStoryPrompt("continue")
+		self.assertFalse(self.storyGPT.lastMetrics.speculative)
+
+	def testHistoryIsUnchanged(self):
+		self.sendStoryPrompt("a dragon")
+		chat = self.storyGPT.chatHistory.chat
+		self.storyGPT.speculateContinuation()
+		self.assertEqual(self.storyGPT.chatHistory.chat, chat)
+
+	def testOffByDefault(self):
+		self.storyGPT.speculative_prefetch = False
+		self.assertIsNone(self.storyGPT.speculateContinuation())
+
+	def testContinuationIsSentAsTypedWithoutPrefetch(self):
+		self.storyGPT.speculative_prefetch = False
+		self.sendStoryPrompt("Keep going!")
+		self.assertIn("Keep going!", self.storyGPT.prompt)
+		self.assertNotIn(StoryGPT.CONTINUATION_TOPIC, self.storyGPT.prompt)
+
+if __name__ == "__main__":
+	unittest.main()
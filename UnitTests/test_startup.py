@@ -0,0 +1,51 @@
+import unittest
+import sys
+import io
+import time
+sys.path.append("..")
+from classes.startup import StartupProfiler, warmUp
+
+class TestStartupProfiler(unittest.TestCase):
+
+	def testRecordsPhases(self):
+		output = io.StringIO()
+		profiler = StartupProfiler(enabled=True, output=output)
+		with profiler.phase("connect to database"):
+			time.sleep(0.01)
+		module = profiler.importModule("json")
+		self.assertEqual(module.__name__, "json")
+		self.assertEqual([phase[0] for phase in profiler.phases], ["connect to database", "import json"])
+		self.assertGreaterEqual(profiler.phases[0][2], 0.01)
+		profiler.printReport()
+		self.assertIn("connect to database", output.getvalue())
+		self.assertIn("import json", output.getvalue())
+
+	def testDisabledProfilerRecordsNothing(self):
+		output = io.StringIO()
+		profiler = StartupProfiler(output=output)
+		with profiler.phase("build sidebar"):
+			pass
+		profiler.printReport()
+		self.assertEqual(profiler.phases, [])
+		self.assertEqual(output.getvalue(), "")
+
+	def testFailedPhasesAreStillRecorded(self):
+		profiler = StartupProfiler(enabled=True)
+		with self.assertRaises(ValueError):
+			with profiler.phase("open first page"):
+				raise ValueError()
+		self.assertEqual(profiler.phases[0][0], "open first page")
+
+	def testWarmUpImportsInTheBackground(self):
+		profiler = StartupProfiler(enabled=True)
+		finished = []
+		thread = warmUp(["csv", "not_a_real_module", "decimal"], profiler, onFinished=lambda: finished.append(True))
+		thread.join(5)
+		self.assertIn("csv", sys.modules)
+		self.assertIn("decimal", sys.modules)
+		self.assertEqual(finished, [True])
+		self.assertTrue(all(phase[3] == "warmUp" for phase in profiler.phases))
+		self.assertIn("[warmUp]", profiler.report())
+
+if __name__ == "__main__":
+	unittest.main()
@@ -0,0 +1,52 @@
+import unittest
+import sys
+sys.path.append("..")
+from classes.Database import createEngine
+from sqlalchemy.orm import Session
+from classes.models import Base, User, Story
+from classes.storyPager import StoryPager
+
+class TestStoryPager(unittest.TestCase):
+
+	def setUp(self):
+		engine = createEngine("sqlite://")
+		self.readSession = lambda: Session(engine)
+		Base.metadata.create_all(engine)
+		self.session = Session(engine)
+		self.addCleanup(self.session.close)
+		self.user = User(username="knguyen", email="k@gmail.com", firstName="K", lastName="Nguyen", passwordHash="hash", avatar="default_user.jpg")
+		otherUser = User(username="other", email="o@gmail.com", firstName="O", lastName="Ther", passwordHash="hash", avatar="default_user.jpg")
+		self.user.stories = [Story(storyTitle=f"Story {i}") for i in range(25)]
+		otherUser.stories = [Story(storyTitle="Someone else's story")]
+		self.session.add_all([self.user, otherUser])
+		self.session.commit()
+		self.pager = StoryPager(self.readSession, self.user.id, pageSize=10)
+
+	def testPages(self):
+		self.assertEqual(self.pager.countStories(), 25)
+		self.assertEqual(self.pager.pageCount(), 3)
+		self.assertEqual([story.storyTitle for story in self.pager.getPage(0)], [f"Story {i}" for i in range(10)])
+		self.assertEqual([story.storyTitle for story in self.pager.getPage(2)], [f"Story {i}" for i in range(20, 25)])
+
+	def testOutOfRangePagesAreClamped(self):
+		pageIDs = lambda pageIndex: [story.id for story in self.pager.getPage(pageIndex)]
+		self.assertEqual(pageIDs(5), pageIDs(2))
+		self.assertEqual(pageIDs(-1), pageIDs(0))
+
+	def testRefreshAfterDeleting(self):
+		self.pager.countStories()
+		for story in self.pager.getPage(2):
+			self.session.delete(self.session.get(Story, story.id))
+		self.session.commit()
+		self.assertEqual(self.pager.pageCount(), 3)
+		self.pager.refresh()
+		self.assertEqual(self.pager.pageCount(), 2)
+
+	def testEmptyLibraryHasOnePage(self):
+		pager = StoryPager(self.readSession, 999, pageSize=10)
+		self.assertEqual(pager.countStories(), 0)
+		self.assertEqual(pager.pageCount(), 1)
+		self.assertEqual(pager.getPage(0), [])
+
+if __name__ == "__main__":
+	unittest.main()
@@ -0,0 +1,60 @@
+import unittest
+import sys
+sys.path.append("..")
+from classes.transcript import TranscriptWindow
+
+class PagedStory:
+	'''
+	- Stand-in for the database: messages 0 to count - 1, loaded a page at a time
+	'''
+	def __init__(self, count):
+		self.messages = list(range(count))
+		self.loadCount = 0
+
+	def loadOlder(self, oldestMessage, count):
+		self.loadCount += 1
+		end = len(self.messages) if oldestMessage is None else oldestMessage
+		return self.messages[max(0, end - count):end]
+
+class TestTranscriptWindow(unittest.TestCase):
+
+	def testShowsTheNewestMessages(self):
+		transcript = TranscriptWindow(range(100), windowSize=10, pageSize=5)
+		self.assertEqual(transcript.visibleMessages(), list(range(90, 100)))
+		self.assertTrue(transcript.hasOlder())
+		self.assertFalse(transcript.hasNewer())
+
+	def testScrolling(self):
+		transcript = TranscriptWindow(range(100), windowSize=10, pageSize=5)
+		self.assertTrue(transcript.scrollUp())
+		self.assertEqual(transcript.visibleMessages(), list(range(85, 95)))
+		self.assertTrue(transcript.scrollDown())
+		self.assertFalse(transcript.scrollDown())
+		self.assertEqual(transcript.visibleMessages(), list(range(90, 100)))
+
+	def testOlderMessagesAreLoadedLazily(self):
+		story = PagedStory(23)
+		firstPage = story.loadOlder(None, 10)
+		transcript = TranscriptWindow(firstPage, story.loadOlder, windowSize=10, pageSize=5)
+		self.assertEqual(story.loadCount, 1)
+		while transcript.scrollUp():
+			pass
+		self.assertEqual(transcript.visibleMessages(), list(range(0, 10)))
+		self.assertEqual(transcript.messages, story.messages)
+		self.assertFalse(transcript.hasOlder())
+		# Every page was only loaded once
+		self.assertEqual(story.loadCount, 4)
+
+	def testAppendFollowsTheNewestMessage(self):
+		transcript = TranscriptWindow(range(10), windowSize=10, pageSize=5)
+		transcript.append(10)
+		self.assertEqual(transcript.visibleMessages(), list(range(1, 11)))
+		# Not while the user is reading older messages
+		transcript.scrollUp()
+		transcript.append(11)
+		self.assertEqual(transcript.visibleMessages(), list(range(0, 10)))
+		transcript.showNewest()
+		self.assertEqual(transcript.visibleMessages(), list(range(2, 12)))
+
+if __name__ == "__main__":
+	unittest.main()
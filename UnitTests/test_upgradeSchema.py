@@ -0,0 +1,76 @@
+import unittest
+import sys
+from unittest import mock
+sys.path.append("..")
+from sqlalchemy import inspect, text
+from classes.Database import createEngine
+from classes.migrations import upgradeSchema
+
+class TestUpgradeSchema(unittest.TestCase):
+
+	def testAddsMissingColumns(self):
+		engine = createEngine("sqlite://")
+		# Database created before stories had a summary
+		with engine.begin() as connection:
+			connection.execute(text("CREATE TABLE users (id INTEGER PRIMARY KEY, username VARCHAR NOT NULL, email VARCHAR NOT NULL, firstName VARCHAR NOT NULL, lastName VARCHAR NOT NULL, passwordHash TEXT NOT NULL, avatar VARCHAR NOT NULL)"))
+			connection.execute(text("CREATE TABLE stories (id INTEGER PRIMARY KEY, userID INTEGER NOT NULL REFERENCES users(id), storyTitle VARCHAR NOT NULL)"))
+			connection.execute(text("INSERT INTO users VALUES (1, 'knguyen', 'k@gmail.com', 'K', 'Nguyen', 'hash', 'default_user.jpg')"))
+			connection.execute(text("INSERT INTO stories VALUES (1, 1, 'The Mysterious Pendant')"))
+
+		upgradeSchema(engine)
+
+		columnNames = {column["name"] for column in inspect(engine).get_columns("stories")}
+		self.assertIn("summary", columnNames)
+		self.assertIn("summarizedCount", columnNames)
+		self.assertIn("messages", inspect(engine).get_table_names())
+		with engine.connect() as connection:
+			row = connection.execute(text("SELECT summary, summarizedCount FROM stories")).one()
+		self.assertEqual(tuple(row), (None, 0))
+
+	def makeDatabaseWithoutPositions(self):
+		engine = createEngine("sqlite://")
+		# Database created before messages had a position, and before any indexes
+		with engine.begin() as connection:
+			connection.execute(text("CREATE TABLE users (id INTEGER PRIMARY KEY, username VARCHAR NOT NULL, email VARCHAR NOT NULL, firstName VARCHAR NOT NULL, lastName VARCHAR NOT NULL, passwordHash TEXT NOT NULL, avatar VARCHAR NOT NULL)"))
+			connection.execute(text("CREATE TABLE messages (id INTEGER PRIMARY KEY, storyID INTEGER NOT NULL, isAISender BOOLEAN NOT NULL, text TEXT NOT NULL)"))
+			connection.execute(text("INSERT INTO messages VALUES (1, 1, 0, 'a'), (2, 2, 0, 'b'), (3, 1, 1, 'c'), (4, 1, 0, 'd')"))
+		return engine
+
+	def testNumbersMessagesOnSQLiteWithoutUpdateFrom(self):
+		engine = self.makeDatabaseWithoutPositions()
+		with mock.patch("classes.migrations.sqlite3.sqlite_version_info", (3, 31, 1)):
+			upgradeSchema(engine)
+		with engine.connect() as connection:
+			rows = connection.execute(text("SELECT id, position FROM messages ORDER BY id")).all()
+		self.assertEqual([tuple(row) for row in rows], [(1, 0), (2, 0), (3, 1), (4, 2)])
+		self.assertNotIn("ix_messages_storyID_upgrade", {index["name"] for index in inspect(engine).get_indexes("messages")})
+
+	def testNumbersExistingMessagesAndAddsIndexes(self):
+		engine = self.makeDatabaseWithoutPositions()
+
+		upgradeSchema(engine)
+
+		with engine.connect() as connection:
+			rows = connection.execute(text("SELECT id, position FROM messages ORDER BY id")).all()
+		self.assertEqual([tuple(row) for row in rows], [(1, 0), (2, 0), (3, 1), (4, 2)])
+		indexes = {index["name"]: index["unique"] for table in ("users", "stories", "messages") for index in inspect(engine).get_indexes(table)}
+		self.assertEqual(indexes, {"ix_users_username": 1, "ix_stories_userID": 0, "ix_messages_storyID_position": 0})
+
+	def testDuplicateUsernamesGetAPlainIndex(self):
+		engine = createEngine("sqlite://")
+		with engine.begin() as connection:
+			connection.execute(text("CREATE TABLE users (id INTEGER PRIMARY KEY, username VARCHAR NOT NULL, email VARCHAR NOT NULL, firstName VARCHAR NOT NULL, lastName VARCHAR NOT NULL, passwordHash TEXT NOT NULL, avatar VARCHAR NOT NULL)"))
+			connection.execute(text("INSERT INTO users VALUES (1, 'knguyen', 'k@gmail.com', 'K', 'Nguyen', 'hash', 'default_user.jpg'), (2, 'knguyen', 'k@gmail.com', 'K', 'Nguyen', 'hash', 'default_user.jpg')"))
+
+		upgradeSchema(engine)
+
+		self.assertEqual([(index["name"], index["unique"]) for index in inspect(engine).get_indexes("users")], [("ix_users_username", 0)])
+
+	def testRunningTwiceIsHarmless(self):
+		engine = createEngine("sqlite://")
+		upgradeSchema(engine)
+		upgradeSchema(engine)
+		self.assertIn("stories", inspect(engine).get_table_names())
+
+if __name__ == "__main__":
+	unittest.main()
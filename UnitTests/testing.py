@@ -4,12 +4,12 @@ sys.path.append("..")
 
 
 from classes.models import *
-from sqlalchemy import create_engine
+from classes.Database import createEngine
 from sqlalchemy.orm import sessionmaker
 import copy
 
 # Let's add some stories to my user
-engine = create_engine("sqlite:///../assets/PyProject.db")
+engine = createEngine("sqlite:///../assets/PyProject.db")
 Session = sessionmaker(bind=engine)
 session = Session()
 
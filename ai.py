@@ -1,13 +1,34 @@
-import openai
+import asyncio
+import contextlib
+import os
+import queue
+import threading
+import time
 from multipledispatch import dispatch
-from typing import Dict
+from typing import Dict, TYPE_CHECKING
 from classes.utilities import add_testing_functions
+from classes.tokens import countMessageTokens
+from classes.responseCache import ResponseCache
+from classes.messageStore import MessageStore
+from classes.metrics import RequestMetrics, makeSink
+from classes.resilience import GenerationError, RetryPolicy, CircuitBreaker, StreamResumer, describeError
+from classes.clients import ClientFactory
+from classes.speculation import SpeculativeResponse
 
-# get the current API key from a file so OpenAI doesn't delete it
-with open('./assets/api_key.txt', 'r') as f:
-    api_key = f.read()
-    
-gptClient = openai.Client(api_key=api_key)
+if TYPE_CHECKING:
+    # NOTE: openai is only imported for type hints here. It's imported for real by ClientFactory when the first request is sent.
+    import openai
+
+# Creates the OpenAI clients when they're first needed, and shares them (and their connection pool) between every model
+defaultClientFactory = ClientFactory()
+
+# Retry policy and circuit breaker shared by every model, so that an outage trips the breaker for the whole process
+defaultRetryPolicy = RetryPolicy()
+defaultCircuitBreaker = CircuitBreaker()
+
+# Where request timings are recorded, set with the BOOKSMART_METRICS environment variable (see classes/metrics.py makeSink). 
+# It's shared by every StoryGPT so all of the process' requests end up in the same place.
+defaultMetricsSink = makeSink(os.environ.get("BOOKSMART_METRICS", ""))
 
 class ChatHistoryManager:
     def __init__(self, prompt: str, systemPrompt: str):
@@ -17,76 +38,107 @@ class ChatHistoryManager:
             {"role": "assistant", "content": "Ok, I will be sure to carefully follow all your instructions as listed"},
             {"role": "user", "content": prompt},
         ]
+        self.startingTokenCounts = [countMessageTokens(message) for message in self.startingChat]
 
         # Chat History
-        # NOTE: Using slicing notation to copy startingChat to chat in a way so that the lists are independent of each other. Modifying one shouldn't affect the other
-        self.chat = self.startingChat[:]
-    
-    @dispatch(dict, int)
-    def addMessageAt(self, message: Dict[str, str], position: int):
+        # NOTE: Messages are kept in a MessageStore (starting chat included, so positions are the same as in self.chat). 
+        # Every message has a stable id and its token count, so appending and removing by id are O(1) even on very long 
+        # chats, and the OpenAI formatted list (self.chat) is only built when it's needed.
+        self.messages = MessageStore()
+        self.addStartingChat()
+
+        # Rolling summary of the oldest story messages. The first `summarizedCount` messages after the starting chat 
+        # are replaced by the summary when the chat is sent to the AI.
+        self.summary = None
+        self.summarizedCount = 0
+        self.summaryTokens = 0
+        # Ids of the messages that the summary covers, so removing a message can tell whether it was summarized without
+        # looking up its position, which would mean compacting the store
+        self.summarizedIds = set()
+
+    @property
+    def chat(self):
         '''
-        Adds a message at the specified position in the chat using a OpenAI formatted chat dictionary.
-        You can use counting numbers to refer to the chat indexes since index 0 will always be `systemPrompt`.
-        Message should be formatted like this: `{"role": "user" | "assistant", "content": content}`
+        The chat history as a list of OpenAI formatted chat dictionaries. Treat it as read only and use the methods below to change the chat.
         '''
-        self.chat.insert(position, message)
+        return self.messages.toMessages()
+
+    @chat.setter
+    def chat(self, chatHistory: list[Dict[str, str]]):
+        self.messages.clear()
+        self.messages.extend((message["role"], message["content"], countMessageTokens(message)) for message in chatHistory)
+        # The summary still covers the same number of messages, which now have new ids
+        self.setSummary(self.summary, self.summarizedCount)
 
-    @dispatch(str, int, str)
-    def addMessageAt(self, message: str, position: int, role="user"):
+    @property
+    def totalTokens(self):
+        return self.messages.totalTokens
+
+    def addStartingChat(self):
+        self.messages.extend((message["role"], message["content"], tokenCount) for message, tokenCount in zip(self.startingChat, self.startingTokenCounts))
+
+    def addMessageAt(self, message, position: int, role="user"):
         '''
-        Constructs an OpenAI formatted chat dictionary from the role and message strings.
+        Adds a message at the specified position in the chat. Returns the id of the new message.
         You can use counting numbers to refer to the chat indexes since index 0 will always be `systemPrompt`.
-        No specfic input format is necessary except that `role` can only be one of two options: "user" and "assistant".
+        - message: Either an OpenAI formatted chat dictionary like `{"role": "user" | "assistant", "content": content}`, 
+            or the content of the message as a string, in which case the message is constructed from `role`.
+        - role: Only used when message is a string, and can only be one of two options: "user" and "assistant".
         '''
+        if isinstance(message, dict):
+            return self.insertMessage(position, message)
         if role in ("user", "assistant"):
             formattedMessage = {"role": role, "content": message}
-            self.chat.insert(position, formattedMessage)
+            return self.insertMessage(position, formattedMessage)
         else:
             print('Only use "user" and "assistant" when working with roles')
 
-    @dispatch(dict)
-    def removeMessageAt(self, message: Dict[str, str]):
+    def removeMessageAt(self, message, role="user"):
         '''
-        Removes a message at the specified position in the chat using a OpenAI formatted chat dictionary.
-        No positional information such as an index is needed since the specific message is precise enough to pinpoint the location of it in the list.
-        Message should be formatted like this: `{"role": "user" | "assistant", "content": content}`
+        Removes a message from the chat and returns it.
+        - message: One of the following
+            - The index of the message. You can use counting numbers to refer to the chat indexes since index 0 will always be `systemPrompt`.
+            - An OpenAI formatted chat dictionary like `{"role": "user" | "assistant", "content": content}`. No positional information 
+                is needed since the specific message is precise enough to pinpoint its location. It's found through an index, not a scan.
+            - The content of the message as a string, in which case the message is matched using `role` as well. 
+                `role` can only be one of two options: "user" and "assistant".
         '''
-        self.chat.remove(message)
+        if isinstance(message, int):
+            if message != 0:
+                return self.popMessage(message)
+            else:
+                print("You are not allowed to remove the system prompt")
+            return None
 
-    @dispatch(str, str)
-    def removeMessageAt(self, message: str, role="user"):
-        '''
-        Constructs an OpenAI formatted chat dictionary from the role and message strings. 
-        Then it uses that to delete that entry through matching.
-        No positional information such as an index is needed since the specific message is precise enough to pinpoint the location of it in the list.
-        No specfic input format is necessary except that `role` can only be one of two options: "user" and "assistant".
-        '''
-        if role in ("user", "assistant"):
-            formattedMessage = {"role": role, "content": message}
-
-            self.chat.remove(formattedMessage)
+        if isinstance(message, dict):
+            messageId = self.messages.findId(message["role"], message["content"])
+        elif role in ("user", "assistant"):
+            messageId = self.messages.findId(role, message)
         else:
             print('Only use "user" and "assistant" when working with roles')
+            return None
+        if messageId is None:
+            raise ValueError(f"{message!r} is not in the chat")
+        return self.removeMessageById(messageId)
 
-    @dispatch(int)
-    def removeMessageAt(self, position: int):
+    def removeMessageById(self, messageId: int):
         '''
-        Removes a specific message from the chat history by finding it through its index.
-        You can use counting numbers to refer to the chat indexes since index 0 will always be `systemPrompt`.
+        Removes the message with the id that was returned when it was added, and returns it
         '''
-        if position != 0:
-            self.chat.pop(position)
+        # Removing a summarized message means one less message is covered by the summary
+        if messageId in self.summarizedIds:
+            self.summarizedIds.remove(messageId)
+            self.summarizedCount -= 1
+        return self.messages.removeById(messageId).toDict()
 
-        else:
-            print("You are not allowed to remove the system prompt")
-
-    def populate(self, chatHistory: list[Dict[str, str]]):
+    def populate(self, chatHistory: list[Dict[str, str]], summary: str = None, summarizedCount: int = 0):
         '''
         Populates an entire chat history with a list of predefined messages
         `chatHistory` only takes in a list of OpenAI dictionary formats. EX: 
         >>> {"role": "user", "content": "this is content"}
 
         - chatHistory: An array of dictionaries, as this will represent the messages associated to a story object in JSON notation. 
+        - summary: Cached summary of the first `summarizedCount` messages of chatHistory, if the story has one.
         - NOTE: chatHistory is just the messages of a story in JSON, and it's not going to have the starting messages in 'self.startingChat' because 
                 those aren't related to the user's story but more so the developer side. As a result, whenever we load in the story content in JSON, we make sure 
                 to make it so self.chat also contains messages in the self.startingChat.
@@ -94,7 +146,13 @@ class ChatHistoryManager:
         if isinstance(chatHistory, list):
             try:
                 if isinstance(chatHistory[0], dict):
-                    self.chat = self.startingChat + chatHistory
+                    self.messages.clear()
+                    self.addStartingChat()
+                    self.messages.extend((message["role"], message["content"], countMessageTokens(message)) for message in chatHistory)
+                    if summary and summarizedCount <= len(chatHistory):
+                        self.setSummary(summary, summarizedCount)
+                    else:
+                        self.setSummary(None, 0)
                 else:
                     print(
                         'you have a list created and it\'s populated, but you don\'t have elements of the dictionary type inside')
@@ -108,12 +166,100 @@ class ChatHistoryManager:
         '''
         Wipes the entire chat history, and resets it to the startingChat so that the AI is ready to write stories properly
         '''
-        self.chat = self.startingChat[:]
+        self.messages.clear()
+        self.addStartingChat()
+        self.setSummary(None, 0)
+
+    def insertMessage(self, position: int, message: Dict[str, str]):
+        '''
+        Inserts an OpenAI formatted chat dictionary at position and returns its id
+        '''
+        # Where the message ends up, the same way list.insert treats the position
+        messageCount = len(self.messages)
+        index = max(0, position + messageCount) if position < 0 else min(position, messageCount)
+        messageId = self.messages.insert(position, message["role"], message["content"], countMessageTokens(message))
+        # The summary covers the first summarizedCount messages, so a message inserted among them pushes the last one out
+        start = len(self.startingChat)
+        if self.summarizedIds and start <= index < start + self.summarizedCount:
+            self.summarizedIds.add(messageId)
+            self.summarizedIds.discard(self.messages.idAt(start + self.summarizedCount))
+        return messageId
+
+    def appendMessage(self, message: Dict[str, str]):
+        '''
+        Adds an OpenAI formatted chat dictionary to the end of the chat and returns its id
+        '''
+        return self.messages.append(message["role"], message["content"], countMessageTokens(message))
+
+    def popMessage(self, position: int):
+        '''
+        Removes and returns the message at position
+        '''
+        return self.removeMessageById(self.messages.idAt(position))
+
+    def setSummary(self, summary: str, summarizedCount: int):
+        '''
+        Replaces the first `summarizedCount` messages after the starting chat with `summary` whenever the chat is sent to the AI.
+        The messages themselves are kept in self.chat.
+        '''
+        self.summary = summary
+        self.summarizedCount = summarizedCount if summary else 0
+        start = len(self.startingChat)
+        self.summarizedIds = {record.id for record in self.messages.records(start, start + self.summarizedCount)}
+        self.summaryTokens = countMessageTokens(self.getSummaryMessage()) if summary else 0
+
+    def getSummaryMessage(self):
+        return {"role": "system", "content": f"Summary of the story so far: {self.summary}"}
+
+    def getUnsummarizedCount(self):
+        '''
+        Returns the number of story messages that aren't covered by the summary
+        '''
+        return len(self.messages) - len(self.startingChat) - self.summarizedCount
+
+    def compact(self, summarize, keepRecent: int):
+        '''
+        Folds every message except the newest `keepRecent` into the rolling summary.
+        - summarize: Function that takes the previous summary (or None) and a list of OpenAI formatted messages, and returns the new summary.
+        '''
+        start = len(self.startingChat) + self.summarizedCount
+        end = len(self.messages) - keepRecent
+        if end <= start:
+            return
+        newSummary = summarize(self.summary, self.chat[start:end])
+        self.setSummary(newSummary, end - len(self.startingChat))
+
+    def getContextWindow(self, tokenBudget: int = None):
+        '''
+        Returns the messages to send to the AI when the request can only use `tokenBudget` tokens of history.
+        The starting chat (system prompt and instructions) and the summary, if any, are always kept, followed by as many of the newest messages as fit.
+        The newest message is always included, even if it doesn't fit on its own, since it's the one the AI has to answer.
+        If tokenBudget is None, every message that isn't covered by the summary is kept.
+        '''
+        if not self.summary and (tokenBudget is None or self.totalTokens <= tokenBudget):
+            return self.chat
+
+        pinned = self.startingChat + [self.getSummaryMessage()] if self.summary else self.startingChat
+        firstStoryMessage = len(self.startingChat) + self.summarizedCount
+        storyMessageCount = len(self.messages) - firstStoryMessage
+        if tokenBudget is None or storyMessageCount <= 0:
+            return pinned + self.chat[firstStoryMessage:]
+
+        # Walk back from the newest message, so only the messages that are kept are looked at
+        remainingBudget = tokenBudget - sum(self.startingTokenCounts) - self.summaryTokens
+        keptMessages = []
+        for record in self.messages.reversedRecords():
+            if keptMessages and (len(keptMessages) == storyMessageCount or record.tokenCount > remainingBudget):
+                break
+            keptMessages.append(record.toDict())
+            remainingBudget -= record.tokenCount
+        keptMessages.reverse()
+        return pinned + keptMessages
 
     def printChat(self):
         for message in self.chat:
             print(f"{message['role']}: {message['content']}")
-            
+
 class InstructionsManager:
     '''
     A class for managing rules for the AI to follow. Supports adding, removing, and injecting rules
@@ -159,11 +305,13 @@ class ModelBase():
     The base class for generating content. Supports full chat history management from creating and deleting chat entries to clearing and replacing the entire chat.
     '''
 
-    def __init__(self, client: openai.OpenAI, model: str, prompt: str, systemPrompt: str):
+    def __init__(self, client: "openai.OpenAI", model: str, prompt: str, systemPrompt: str):
         self.systemPrompt = systemPrompt
         self.prompt = prompt
         self.engine = model
+        # If no client is given, the shared client of clientFactory is used
         self.client = client
+        self.clientFactory = defaultClientFactory
 
         self.chatHistory = ChatHistoryManager(prompt, systemPrompt)
 
@@ -174,6 +322,285 @@ class ModelBase():
         self.frequency_penalty = 0
         self.max_tokens = 512
         self.is_stream = True
+        # Drafts generated at the same time for every prompt. With more than one, the user picks the draft that's kept.
+        self.candidate_count = 1
+
+        # Size of the model's context window in tokens. When set, only the newest messages that fit next to the 
+        # response (max_tokens) are sent, instead of the entire chat history. None sends the entire history.
+        self.max_context_tokens = None
+
+        # Rolling summary compaction. Once more than `compaction_threshold` messages aren't covered by the summary, 
+        # everything but the newest `compaction_keep_recent` messages is folded into it. None turns compaction off.
+        self.compaction_threshold = None
+        self.compaction_keep_recent = 8
+        self.summary_max_tokens = 384
+
+        # Opt-in ResponseCache. When set, identical requests are replayed from the cache instead of hitting the network.
+        self.responseCache = None
+
+        # Optional metrics sink (see classes/metrics.py) that the timings of every request are recorded to. 
+        # The timings of the latest request are kept in lastMetrics either way.
+        self.metricsSink = None
+        self.lastMetrics = None
+
+        # How failed requests are retried (see classes/resilience.py)
+        self.retryPolicy = defaultRetryPolicy
+        self.circuitBreaker = defaultCircuitBreaker
+
+        # Streaming responses that are currently being read (one per draft), so that they can be aborted from another thread
+        self.activeResponses = set()
+        # Set by abort(), so that a cancelled response is neither retried nor waited on
+        self.abortEvent = threading.Event()
+
+        # Texts of the drafts from the latest `completeCandidates()` while they're waiting for `chooseCandidate()`
+        self.candidates = None
+
+        # Speculative prefetch. When on, `speculate()` starts generating a likely next response in the background, 
+        # which the next `complete()` serves if it sends the exact same request.
+        self.speculative_prefetch = False
+        self.speculation = None
+
+    def abort(self):
+        '''
+        Closes the streaming responses that are currently being read, if any. This is safe to call from another thread, 
+        and makes the generator returned by `complete()` stop waiting on the network.
+        '''
+        self.abortEvent.set()
+        self.cancelSpeculation()
+        for response in list(self.activeResponses):
+            try:
+                response.response.close()
+            except Exception:
+                pass
+
+    def getClient(self):
+        return self.client or self.clientFactory.getClient()
+
+    def getContextMessages(self):
+        '''
+        Returns the chat history messages that fit in the model's context window
+        '''
+        if self.max_context_tokens is None:
+            return self.chatHistory.getContextWindow()
+        return self.chatHistory.getContextWindow(self.max_context_tokens - self.max_tokens)
+
+    def enableResponseCache(self, maxEntries: int = 256, databasePath: str = None):
+        '''
+        Turns on the response cache. If databasePath is given, cached responses are also persisted in that SQLite file.
+        '''
+        self.responseCache = ResponseCache(maxEntries=maxEntries, databasePath=databasePath)
+
+    def needsCompaction(self):
+        return self.compaction_threshold is not None and self.chatHistory.getUnsummarizedCount() > self.compaction_threshold
+
+    def buildSummaryRequest(self, previousSummary: str, messages: list[Dict[str, str]]):
+        '''
+        Builds the keyword arguments for the request that folds `messages` into `previousSummary`
+        '''
+        transcript = "\n\n".join(f"{message['role']}: {message['content']}" for message in messages)
+        instructions = "Summarize the story written so far. Keep every character, place, plot point and the writing style, so the story can be continued from the summary alone. Reply with the summary only."
+        if previousSummary:
+            instructions += f"\n\nSummary of the earlier parts of the story:\n{previousSummary}"
+        return {
+            "model": self.engine,
+            "messages": [
+                {"role": "system", "content": instructions},
+                {"role": "user", "content": transcript},
+            ],
+            "temperature": 0.2,
+            "max_tokens": self.summary_max_tokens,
+            "stream": False,
+        }
+
+    def summarize(self, previousSummary: str, messages: list[Dict[str, str]]):
+        '''
+        Returns a summary of `messages`, continuing `previousSummary`. This is a separate request, so the chat history isn't touched.
+        '''
+        response = self.createWithRetry(self.buildSummaryRequest(previousSummary, messages))
+        return response.choices[0].message.content
+
+    def compactHistory(self):
+        '''
+        Folds older messages into the rolling summary once enough new messages have piled up. 
+        Returns True if the summary changed. If the summary can't be generated, the full history is kept and sent instead.
+        '''
+        if not self.needsCompaction():
+            return False
+        try:
+            self.chatHistory.compact(self.summarize, self.compaction_keep_recent)
+        except Exception as e:
+            print(f"Couldn't summarize the story: {e}")
+            return False
+        return True
+
+    def recordRequestBuilt(self, metrics: RequestMetrics, request: dict, cachedResponse: str):
+        metrics.cached = cachedResponse is not None
+        metrics.recordBuild(len(request["messages"]), sum(countMessageTokens(message) for message in request["messages"]))
+
+    def finishMetrics(self, metrics: RequestMetrics, status: str, error: str = None):
+        '''
+        Ends the request's timings and records them to the metrics sink. A broken sink never breaks the response.
+        '''
+        metrics.finish(status, error)
+        self.lastMetrics = metrics
+        if self.metricsSink:
+            try:
+                self.metricsSink.record(metrics)
+            except Exception as e:
+                print(f"Couldn't record metrics: {e}")
+
+    def handleFailure(self, error: Exception, attempt: int, metrics: RequestMetrics = None):
+        '''
+        Records a failed attempt and returns the seconds to wait before the next one. 
+        Raises GenerationError instead if the request shouldn't be retried.
+        '''
+        if self.abortEvent.is_set():
+            raise GenerationError("The response was cancelled") from error
+        retryable = self.retryPolicy.isRetryable(error)
+        if retryable:
+            self.circuitBreaker.recordFailure()
+        else:
+            # The API answered, it just didn't like the request, so it isn't down
+            self.circuitBreaker.recordSuccess()
+        delay = self.retryPolicy.getDelay(attempt, error)
+        if delay is None:
+            raise GenerationError(describeError(error), retryable=retryable, retryAfter=self.retryPolicy.getRetryAfter(error)) from error
+        if metrics:
+            metrics.recordRetry(delay)
+        return delay
+
+    def createWithRetry(self, request: dict, metrics: RequestMetrics = None):
+        '''
+        Sends a non-streaming request, retrying transient failures. Raises GenerationError if it can't be completed.
+        '''
+        attempt = 0
+        while True:
+            self.circuitBreaker.checkRequest()
+            attempt += 1
+            try:
+                response = self.getClient().chat.completions.create(**request)
+            except Exception as e:
+                if self.abortEvent.wait(self.handleFailure(e, attempt, metrics)):
+                    raise GenerationError("The response was cancelled")
+                continue
+            self.circuitBreaker.recordSuccess()
+            return response
+
+    def streamWithRetry(self, resumer: StreamResumer, metrics: RequestMetrics):
+        '''
+        Generator that yields the chunks of a streaming request, retrying transient failures. If the stream breaks part way, 
+        the retry asks the model to continue the text it already sent, and only the new text is yielded.
+        '''
+        attempt = 0
+        while True:
+            if self.abortEvent.is_set():
+                raise GenerationError("The response was cancelled")
+            self.circuitBreaker.checkRequest()
+            attempt += 1
+            try:
+                response = self.getClient().chat.completions.create(**resumer.nextRequest())
+                self.activeResponses.add(response)
+                self.circuitBreaker.recordSuccess()
+                try:
+                    for chunk in response:
+                        content = chunk.choices[0].delta.content
+                        content = resumer.accept(content) if content else None
+                        if content:
+                            metrics.recordChunk(content)
+                            yield content
+                finally:
+                    # Hand the connection back to the pool right away, even if the response is abandoned part way
+                    self.activeResponses.discard(response)
+                    httpResponse = getattr(response, "response", None)
+                    if httpResponse is not None:
+                        httpResponse.close()
+                content = resumer.flush()
+                if content:
+                    metrics.recordChunk(content)
+                    yield content
+                return
+            except Exception as e:
+                if self.abortEvent.wait(self.handleFailure(e, attempt, metrics)):
+                    raise GenerationError("The response was cancelled")
+
+    def speculate(self, prompt: str):
+        '''
+        Starts generating the response to `prompt` in the background, as if it was sent next. The chat history isn't changed. 
+        Returns the SpeculativeResponse, or None if there's no point speculating right now.
+        NOTE: Only streaming responses are speculated, and never while the API is failing, drafts are waiting to be 
+            chosen, or the prompt would trigger a compaction (which would change the request).
+        '''
+        self.cancelSpeculation()
+        if not self.speculative_prefetch or not self.is_stream or self.candidates is not None or self.circuitBreaker.state != CircuitBreaker.CLOSED:
+            return None
+        messageId = self.chatHistory.appendMessage({"role": "user", "content": prompt})
+        try:
+            if self.needsCompaction():
+                return None
+            request = self.buildRequest(stream=True)
+        finally:
+            self.chatHistory.removeMessageById(messageId)
+        if self.responseCache and self.responseCache.get(self.responseCache.makeKey(request)) is not None:
+            return None
+        self.speculation = SpeculativeResponse(request, self.getClient().chat.completions.create).start()
+        return self.speculation
+
+    def cancelSpeculation(self):
+        speculation, self.speculation = self.speculation, None
+        if speculation is not None:
+            speculation.cancel()
+
+    def takeSpeculation(self, request: dict):
+        '''
+        Returns the speculative response if it was generated for exactly `request`, or else cancels it and returns None
+        '''
+        speculation = self.speculation
+        if speculation is None:
+            return None
+        if speculation.request != request or speculation.isCancelled or (speculation.isDone and not speculation.chunks):
+            self.cancelSpeculation()
+            return None
+        return speculation
+
+    def replayCachedResponse(self, cachedResponse: str, resumer: StreamResumer, metrics: RequestMetrics):
+        '''
+        Generator that yields the chunks of a cached response as if it was being streamed
+        '''
+        for chunk in ResponseCache.replay(cachedResponse):
+            resumer.accept(chunk)
+            metrics.recordChunk(chunk)
+            yield chunk
+
+    def serveSpeculation(self, speculation: SpeculativeResponse, resumer: StreamResumer, metrics: RequestMetrics):
+        '''
+        Generator that yields the chunks of a speculative response, instantly for the ones that already arrived. If the 
+        response failed part way, the rest is generated by streamWithRetry, which continues the text.
+        '''
+        for chunk in speculation.replay():
+            chunk = resumer.accept(chunk)
+            metrics.recordChunk(chunk)
+            yield chunk
+        if speculation.isCancelled:
+            raise GenerationError("The response was cancelled")
+        if speculation.error is not None:
+            yield from self.streamWithRetry(resumer, metrics)
+
+    def buildRequest(self, stream: bool):
+        '''
+        Builds the keyword arguments for `client.chat.completions.create` from the current chat history and AI settings
+        '''
+        return {
+            "model": self.engine,
+            # NOTE: Copied, since the chat history may hand out the list it keeps up to date, and a request 
+            # (e.g. a speculative one) can outlive the next change to the chat
+            "messages": list(self.getContextMessages()),
+            "temperature": self.temperature,
+            "top_p": self.top_p,
+            "frequency_penalty": self.frequency_penalty,
+            "presence_penalty": self.presence_penalty,
+            "max_tokens": self.max_tokens,
+            "stream": stream,
+        }
 
     def complete(self):
         '''
@@ -190,44 +617,429 @@ class ModelBase():
 
                 `stream` - `bool` | If set, partial message deltas will be sent, like in ChatGPT. Tokens will be sent as data-only server-sent events as they become available, with the stream terminated by a data: [DONE] message.
         '''
-        self.chatHistory.chat.append({"role": "user", "content": self.prompt})
+        metrics = RequestMetrics(self.engine, self.is_stream)
+        self.settleCandidates()
+        self.chatHistory.appendMessage({"role": "user", "content": self.prompt})
+        compactionStart = time.perf_counter()
+        self.compactHistory()
+        metrics.recordCompaction(time.perf_counter() - compactionStart)
+
+        request = self.buildRequest(stream=self.is_stream)
+        cacheKey = self.responseCache.makeKey(request) if self.responseCache else None
+        cachedResponse = self.responseCache.get(cacheKey) if self.responseCache else None
+        self.recordRequestBuilt(metrics, request, cachedResponse)
+        speculation = self.takeSpeculation(request)
+        metrics.speculative = speculation is not None
 
         if self.is_stream:
-            fullMessage = []
+            resumer = StreamResumer(request)
+            # The chunks that the consumer has taken. A chunk only counts once the consumer asks for the next one, since
+            # a consumer that stops early (e.g. the generation worker after a cancel) drops the chunk it was holding.
+            shownParts = []
+            chunks = None
+            isFinished = False
+            # Stays "cancelled" if the generator is closed before the response is finished
+            status, error = "cancelled", None
 
             try:
-                response = self.client.chat.completions.create(
-                    model=self.engine, 
-                    messages=self.chatHistory.chat, 
-                    temperature=self.temperature, 
-                    top_p=self.top_p,
-                    frequency_penalty=self.frequency_penalty, 
-                    presence_penalty=self.presence_penalty, 
-                    max_tokens=self.max_tokens,
-                    stream=True
-                )
-
-                for chunk in response:
-                    fullMessage.append(chunk.choices[0].delta.content)
-                    if chunk.choices[0].delta.content:
-                        yield chunk.choices[0].delta.content
+                if cachedResponse is not None:
+                    chunks = self.replayCachedResponse(cachedResponse, resumer, metrics)
+                elif speculation is not None:
+                    chunks = self.serveSpeculation(speculation, resumer, metrics)
+                else:
+                    chunks = self.streamWithRetry(resumer, metrics)
+                for chunk in chunks:
+                    yield chunk
+                    shownParts.append(chunk)
+                isFinished = True
+                status = "finished"
 
             except KeyError:  # The AI has stopped generating
+                status = "finished"
                 yield "\n\n The End."
-            except openai.error.OpenAIError as e:
-                yield f"\n\n An error occurred with OpenAI: {e}"
+            except GenerationError as e:
+                status, error = "cancelled" if self.abortEvent.is_set() else "error", str(e)
+                raise
             except Exception as e:
-                yield f"\n\n Unexpected error: {e}"
-
-            self.chatHistory.chat.append({"role": "assistant", "content": ''.join(filter(None, fullMessage)) if fullMessage else ""})
+                status, error = "error", str(e)
+                raise GenerationError(describeError(e)) from e
+            finally:
+                # NOTE: Runs even when the generator is closed early (e.g. the user cancelled) or the response failed, 
+                # so the history always keeps whatever text was actually shown to the user
+                if chunks is not None:
+                    chunks.close()
+                if speculation is not None:
+                    self.cancelSpeculation()
+                fullText = "".join(shownParts)
+                self.chatHistory.appendMessage({"role": "assistant", "content": fullText})
+                # Only cache complete responses, never ones that were cancelled or failed part way
+                if isFinished and cachedResponse is None and self.responseCache:
+                    self.responseCache.put(cacheKey, fullText)
+                self.finishMetrics(metrics, status, error)
         else:
-            response = self.client.chat.completions.create(model=self.engine, messages=self.chatHistory.chat, temperature=self.temperature, top_p=self.top_p,
-                                                    frequency_penalty=self.frequency_penalty, presence_penalty=self.presence_penalty, max_tokens=self.max_tokens, stream=False)
+            try:
+                if cachedResponse is not None:
+                    content = cachedResponse
+                else:
+                    response = self.createWithRetry(request, metrics)
+                    content = response.choices[0].message.content
+                    if self.responseCache:
+                        self.responseCache.put(cacheKey, content)
+            except Exception as e:
+                self.finishMetrics(metrics, "error", str(e))
+                raise
+            metrics.recordChunk(content or "")
+            self.finishMetrics(metrics, "finished")
+
+            self.chatHistory.appendMessage(
+                {"role": "assistant", "content": content})
+
+            return content
+
+    def buildCandidates(self, count: int, compactionSeconds: float):
+        '''
+        Builds the request for the current chat history, and returns a StreamResumer and RequestMetrics for each of the `count` drafts
+        '''
+        # NOTE: The response cache is skipped, since replaying one cached response would make every draft the same
+        request = self.buildRequest(stream=True)
+        resumers, metricsList = [], []
+        for _ in range(count):
+            metrics = RequestMetrics(self.engine, stream=True)
+            metrics.recordCompaction(compactionSeconds)
+            self.recordRequestBuilt(metrics, request, None)
+            resumers.append(StreamResumer(request))
+            metricsList.append(metrics)
+        return resumers, metricsList
+
+    def completeCandidates(self, count: int):
+        '''
+        Generates `count` drafts of the response at the same time, so the user can pick one draft out of several in the 
+        time that a single response takes, instead of regenerating the response again and again. Yields (index, chunk) 
+        tuples as the chunks of the drafts arrive.
+
+        NOTE: Every draft is its own streaming request on its own thread (rather than one request with `n`), so every draft 
+        is retried and resumed on its own. Unlike `complete()`, no draft is added to the chat history until `chooseCandidate()` 
+        is called. Only if every draft fails is the error raised; a draft that failed on its own is just left short or empty.
+        '''
+        self.cancelSpeculation()
+        self.settleCandidates()
+        self.chatHistory.appendMessage({"role": "user", "content": self.prompt})
+        compactionStart = time.perf_counter()
+        self.compactHistory()
+        resumers, metricsList = self.buildCandidates(count, time.perf_counter() - compactionStart)
+
+        events = queue.Queue()
+        stopEvent = threading.Event()
+
+        def generateCandidate(index: int):
+            status, error = "cancelled", None
+            stream = self.streamWithRetry(resumers[index], metricsList[index])
+            try:
+                for chunk in stream:
+                    if stopEvent.is_set():
+                        break
+                    events.put((index, chunk, None))
+                else:
+                    status = "finished"
+            except GenerationError as e:
+                status, error = "cancelled" if self.abortEvent.is_set() else "error", e
+            except Exception as e:
+                status, error = "error", GenerationError(describeError(e))
+            finally:
+                stream.close()
+                self.finishMetrics(metricsList[index], status, str(error) if error else None)
+                # Always tell the consumer that this draft is over, with chunk None
+                events.put((index, None, error))
+
+        threads = [threading.Thread(target=generateCandidate, args=(index,), name=f"CandidateWorker-{index}", daemon=True) for index in range(count)]
+        errors = []
+        try:
+            for thread in threads:
+                thread.start()
+            remaining = count
+            while remaining:
+                index, chunk, error = events.get()
+                if chunk is not None:
+                    yield index, chunk
+                    continue
+                remaining -= 1
+                if error is not None:
+                    errors.append(error)
+            if len(errors) == count:
+                raise errors[0]
+        finally:
+            # NOTE: Runs when the generator is closed early too. The other threads are stopped and waited on, 
+            # so the drafts are complete (as far as they got) before they can be chosen.
+            stopEvent.set()
+            if any(thread.is_alive() for thread in threads):
+                self.abort()
+            for thread in threads:
+                thread.join()
+            self.candidates = [resumer.text for resumer in resumers]
+
+    def chooseCandidate(self, index: int):
+        '''
+        Adds draft `index` of the latest `completeCandidates()` to the chat history as the AI's response, and returns its text
+        '''
+        if self.candidates is None:
+            raise ValueError("There are no drafts to choose from")
+        text = self.candidates[index]
+        self.candidates = None
+        self.chatHistory.appendMessage({"role": "assistant", "content": text})
+        return text
+
+    def settleCandidates(self):
+        '''
+        Keeps the first draft if none of the previous drafts were chosen, so every prompt in the chat history is followed by its response
+        '''
+        if self.candidates is not None:
+            self.chooseCandidate(0)
+
+    def respond(self):
+        '''
+        Returns the response to the current prompt: the generator of `complete()`, or of `completeCandidates()` if more than one draft is asked for
+        '''
+        # NOTE: The generators only start running on their first next(), which usually happens on the generation worker's
+        # thread. Clearing the abort here instead means a Stop that's pressed before then still cancels the response.
+        self.abortEvent.clear()
+        if self.candidate_count > 1:
+            return self.completeCandidates(self.candidate_count)
+        return self.complete()
+
+class GenerationLimiter:
+    '''
+    Caps how many AI requests can be in flight at the same time on an event loop. One limiter is usually shared by every 
+    `AsyncModelBase` in the process, so that many users' story sessions can be served concurrently without flooding the API.
+    '''
+
+    def __init__(self, limit: int = 8):
+        self.limit = limit
+        self.semaphore = None
+
+    def setLimit(self, limit: int):
+        '''
+        Changes the concurrency limit. Requests that are already running aren't affected.
+        '''
+        self.limit = limit
+        self.semaphore = None
+
+    @contextlib.asynccontextmanager
+    async def slot(self):
+        '''
+        Waits for a free slot and holds it until the `async with` block exits
+        '''
+        # NOTE: The semaphore is created lazily so that it's bound to the event loop that actually runs the requests.
+        # We keep a local reference so the slot is released on the same semaphore even if the limit changes meanwhile.
+        if self.semaphore is None:
+            self.semaphore = asyncio.Semaphore(self.limit)
+        semaphore = self.semaphore
+        async with semaphore:
+            yield
+
+# Limiter shared by every async model unless one is given explicitly
+defaultLimiter = GenerationLimiter()
 
-            self.chatHistory.chat.append(
-                {"role": "assistant", "content": response.choices[0].message.content})
+class AsyncModelBase(ModelBase):
+    '''
+    The asyncio version of `ModelBase`. `complete()` is an async generator built on `openai.AsyncOpenAI`, so many 
+    completions can run concurrently on one event loop. The number of requests in flight is capped by `limiter`.
+    '''
+    limiter = defaultLimiter
 
-            return response.choices[0].message.content
+    def getClient(self):
+        return self.client or self.clientFactory.getAsyncClient()
+
+    def speculate(self, prompt: str):
+        '''
+        Speculative prefetch isn't supported by async models, since a server can already run other sessions' requests meanwhile
+        '''
+        return None
+
+    async def summarize(self, previousSummary: str, messages: list[Dict[str, str]]):
+        response = await self.createWithRetry(self.buildSummaryRequest(previousSummary, messages))
+        return response.choices[0].message.content
+
+    async def createWithRetry(self, request: dict, metrics: RequestMetrics = None):
+        '''
+        Same as `ModelBase.createWithRetry`. The limiter slot is only held while a request is in flight, not during the backoff.
+        '''
+        attempt = 0
+        while True:
+            self.circuitBreaker.checkRequest()
+            attempt += 1
+            try:
+                async with self.limiter.slot():
+                    response = await self.getClient().chat.completions.create(**request)
+            except Exception as e:
+                await asyncio.sleep(self.handleFailure(e, attempt, metrics))
+                continue
+            self.circuitBreaker.recordSuccess()
+            return response
+
+    async def streamWithRetry(self, resumer: StreamResumer, metrics: RequestMetrics):
+        '''
+        Same as `ModelBase.streamWithRetry`, as an async generator
+        '''
+        attempt = 0
+        while True:
+            if self.abortEvent.is_set():
+                raise GenerationError("The response was cancelled")
+            self.circuitBreaker.checkRequest()
+            attempt += 1
+            try:
+                async with self.limiter.slot():
+                    response = await self.getClient().chat.completions.create(**resumer.nextRequest())
+                    self.circuitBreaker.recordSuccess()
+                    try:
+                        async for chunk in response:
+                            content = chunk.choices[0].delta.content
+                            content = resumer.accept(content) if content else None
+                            if content:
+                                metrics.recordChunk(content)
+                                yield content
+                    finally:
+                        httpResponse = getattr(response, "response", None)
+                        if httpResponse is not None:
+                            await httpResponse.aclose()
+                content = resumer.flush()
+                if content:
+                    metrics.recordChunk(content)
+                    yield content
+                return
+            except Exception as e:
+                delay = self.handleFailure(e, attempt, metrics)
+            await asyncio.sleep(delay)
+
+    async def compactHistory(self):
+        '''
+        Same as `ModelBase.compactHistory`, but the summary is generated without blocking the event loop
+        '''
+        if not self.needsCompaction():
+            return False
+        chatHistory = self.chatHistory
+        start = len(chatHistory.startingChat) + chatHistory.summarizedCount
+        end = len(chatHistory.messages) - self.compaction_keep_recent
+        try:
+            newSummary = await self.summarize(chatHistory.summary, chatHistory.chat[start:end])
+        except Exception as e:
+            print(f"Couldn't summarize the story: {e}")
+            return False
+        chatHistory.setSummary(newSummary, end - len(chatHistory.startingChat))
+        return True
+
+    async def complete(self):
+        '''
+        Same as `ModelBase.complete`, but yields the chunks of the response asynchronously:
+        >>> async for chunk in model.complete(): ...
+
+        NOTE: To stop a completion early, cancel the task that's iterating it. The limiter slot is released and the 
+        text generated so far is kept in the chat history. Like the sync version, the abort flag is cleared by `respond()`, 
+        so an earlier `abort()` doesn't cancel the requests that come after it.
+        '''
+        metrics = RequestMetrics(self.engine, self.is_stream)
+        self.settleCandidates()
+        self.chatHistory.appendMessage({"role": "user", "content": self.prompt})
+        compactionStart = time.perf_counter()
+        await self.compactHistory()
+        metrics.recordCompaction(time.perf_counter() - compactionStart)
+        isFinished = False
+        status, error = "cancelled", None
+
+        request = self.buildRequest(stream=self.is_stream)
+        cacheKey = self.responseCache.makeKey(request) if self.responseCache else None
+        cachedResponse = self.responseCache.get(cacheKey) if self.responseCache else None
+        self.recordRequestBuilt(metrics, request, cachedResponse)
+        resumer = StreamResumer(request)
+
+        try:
+            if cachedResponse is not None:
+                for chunk in ResponseCache.replay(cachedResponse):
+                    resumer.accept(chunk)
+                    metrics.recordChunk(chunk)
+                    yield chunk
+            elif self.is_stream:
+                async for chunk in self.streamWithRetry(resumer, metrics):
+                    yield chunk
+            else:
+                response = await self.createWithRetry(request, metrics)
+                content = response.choices[0].message.content or ""
+                resumer.accept(content)
+                metrics.recordChunk(content)
+                yield content
+            isFinished = True
+            status = "finished"
+
+        except KeyError:  # The AI has stopped generating
+            status = "finished"
+            yield "\n\n The End."
+        except GenerationError as e:
+            status, error = "error", str(e)
+            raise
+        except Exception as e:
+            status, error = "error", str(e)
+            raise GenerationError(describeError(e)) from e
+        finally:
+            fullText = resumer.text
+            self.chatHistory.appendMessage({"role": "assistant", "content": fullText})
+            if isFinished and cachedResponse is None and self.responseCache:
+                self.responseCache.put(cacheKey, fullText)
+            self.finishMetrics(metrics, status, error)
+
+    async def completeCandidates(self, count: int):
+        '''
+        Same as `ModelBase.completeCandidates`, but every draft is a task on the event loop instead of a thread:
+        >>> async for index, chunk in model.completeCandidates(3): ...
+        '''
+        self.settleCandidates()
+        self.chatHistory.appendMessage({"role": "user", "content": self.prompt})
+        compactionStart = time.perf_counter()
+        await self.compactHistory()
+        resumers, metricsList = self.buildCandidates(count, time.perf_counter() - compactionStart)
+        events = asyncio.Queue()
+
+        async def generateCandidate(index: int):
+            status, error = "cancelled", None
+            stream = self.streamWithRetry(resumers[index], metricsList[index])
+            try:
+                async for chunk in stream:
+                    events.put_nowait((index, chunk, None))
+                status = "finished"
+            except GenerationError as e:
+                status, error = "error", e
+            except Exception as e:
+                status, error = "error", GenerationError(describeError(e))
+            finally:
+                await stream.aclose()
+                self.finishMetrics(metricsList[index], status, str(error) if error else None)
+                events.put_nowait((index, None, error))
+
+        tasks = [asyncio.create_task(generateCandidate(index)) for index in range(count)]
+        errors = []
+        try:
+            remaining = count
+            while remaining:
+                index, chunk, error = await events.get()
+                if chunk is not None:
+                    yield index, chunk
+                    continue
+                remaining -= 1
+                if error is not None:
+                    errors.append(error)
+            if len(errors) == count:
+                raise errors[0]
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            self.candidates = [resumer.text for resumer in resumers]
+
+async def collectResponse(response):
+    '''
+    Consumes an async response generator, such as the one returned by `AsyncStoryGPT.sendStoryPrompt`, and returns the full text. 
+    Useful for running many prompts at once:
+    >>> await asyncio.gather(*(collectResponse(gpt.sendStoryPrompt(topic)) for gpt, topic in sessions))
+    '''
+    return ''.join([chunk async for chunk in response])
 
 # allow outside modification of class methods without cluttering up the class here (used for testing only)
 @add_testing_functions
@@ -235,10 +1047,27 @@ class StoryGPT(ModelBase):
     '''
     The main class for story generation and remixing. This class inherits from the `ModelBase` class.
     '''
-    def __init__(self):
+    # Messages that only ask the AI to keep writing. With speculative_prefetch on, they're all sent as CONTINUATION_TOPIC,
+    # so that the continuation can be generated before the user asks for it (see speculateContinuation)
+    CONTINUATION_REQUESTS = {"continue", "continue the story", "keep going", "keep writing", "go on", "more", "next", "what happens next", "and then"}
+    CONTINUATION_TOPIC = "Continue the story"
+
+    def __init__(self, client: "openai.OpenAI" = None):
         systemPrompt = "You are a professional author who can write any story upon request. Your stories are always rich and full of descriptive content. You are able to carry out all user requests but only those that follow the rules, precisely and professionally."
         prompt = "I am an avid reader looking to read some fantastic stories! I am going to give you some specifications on a story I'd like to read."
-        super().__init__(gptClient, 'gpt-3.5-turbo', prompt, systemPrompt)
+        super().__init__(client, 'gpt-3.5-turbo', prompt, systemPrompt)
+
+        # gpt-3.5-turbo's context window, so long stories never grow past what the API accepts
+        self.max_context_tokens = 4096
+        # Summarize long stories instead of resending every message verbatim
+        self.compaction_threshold = 24
+
+        # Test and demo environments can turn on the response cache without code changes. The setting is either 
+        # "memory" for an in-memory cache, or the path of a SQLite file that keeps the cache between runs.
+        responseCacheSetting = os.environ.get("BOOKSMART_RESPONSE_CACHE")
+        if responseCacheSetting:
+            self.enableResponseCache(databasePath=None if responseCacheSetting == "memory" else responseCacheSetting)
+        self.metricsSink = defaultMetricsSink
 
         self.manager = InstructionsManager(
             "You will work with all styles, regardless of understanding. Even seemingly nonsensical styles can and will be accepted. Every single possible style will be accepted, regardless of its content",
@@ -260,9 +1089,21 @@ class StoryGPT(ModelBase):
                 "Rather, only tell them when their request is not valid.\n\n")
         return prompt
 
+    def isContinuationRequest(self, message: str):
+        return message.strip().strip(".!?").strip().lower() in self.CONTINUATION_REQUESTS
+
+    def speculateContinuation(self):
+        '''
+        Starts generating the next part of the story while the user is still reading, if speculative_prefetch is on. 
+        It's served instantly if the user's next message is a continuation request, and cancelled otherwise.
+        '''
+        return self.speculate(self.buildPrompt(self.CONTINUATION_TOPIC))
+
     def sendStoryPrompt(self, topic: str):
+        if self.speculative_prefetch and self.isContinuationRequest(topic):
+            topic = self.CONTINUATION_TOPIC
         self.prompt = self.buildPrompt(topic)
-        response = self.complete()
+        response = self.respond()
         return response
 
     def sendRemixPrompt(self, story: str, twist: str):
@@ -272,5 +1113,17 @@ class StoryGPT(ModelBase):
         self.prompt = f'Remix this story: "{story}".\nThe twist for this remix: {twist}\nWrite the remix in this style: {self.response_style}.'
         self.prompt += self.manager.inject()
         self.prompt += "Does the User's request violate any of the rules? If yes, say this to the user: \"This rule was broken and specify the rule broken\" If not, continue with the story and do not I repeat, Do not explain that you're following the rules. Do not confirm with the user that their request is valid. Rather, only tell them when their request is not valid.\n\n"
-        response = self.complete()
-        return response
\ No newline at end of file
+        response = self.respond()
+        return response
+
+class AsyncStoryGPT(AsyncModelBase, StoryGPT):
+    '''
+    Story generation and remixing on top of `AsyncModelBase`. Works exactly like `StoryGPT`, except `sendStoryPrompt` and 
+    `sendRemixPrompt` return async generators. Every instance keeps its own chat history, so use one instance per story session.
+    - client: Async OpenAI client. Defaults to the client that clientFactory shares with every model on the same event loop.
+    - limiter: GenerationLimiter to use instead of the process-wide `defaultLimiter`.
+    '''
+    def __init__(self, client: "openai.AsyncOpenAI" = None, limiter: GenerationLimiter = None):
+        super().__init__(client)
+        if limiter:
+            self.limiter = limiter
\ No newline at end of file
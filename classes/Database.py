@@ -1,7 +1,46 @@
-# File that we'll import engine and session from
+# File that every engine is created from
 
-from sqlalchemy import create_engine
-from sqlalchemy.orm import Session
-# Create an engine that'll setup a database in the assets folder
-engine = create_engine("sqlite:///../assets/PyProject.db", echo=True)
-session = Session(bind=engine)
+from sqlalchemy import create_engine, event
+from sqlalchemy.pool import StaticPool
+
+'''
++ createEngine(url, echo, mmapSize, cacheSize, busyTimeout): Creates the SQLAlchemy engine for a SQLite database. Every
+	part of the app (Main.py, createDatabase.py, the tools and the tests) creates its engine here, so they all get the same tuning.
+	Every new connection is set up with these pragmas:
+	- journal_mode=WAL: Readers don't block the writer and the writer doesn't block readers, and a commit only appends to
+		the write-ahead log instead of rewriting the database file.
+	- synchronous=NORMAL: In WAL mode, commits no longer wait for an fsync; the log is only synced at checkpoints. A commit
+		can be lost if the computer loses power, but the database can't be corrupted.
+	- mmap_size: Reads go through memory mapped I/O instead of a read() call per page
+	- cache_size: Pages kept in memory per connection, in KiB
+	- busy_timeout: How long a connection waits for another one's write lock before failing with "database is locked"
+
+	File databases use a pool of connections that can be used from any thread, e.g. by the AI's background workers.
+	In-memory databases share a single connection, since every new connection would get an empty database of its own.
+
+- url (string): SQLAlchemy database URL, e.g. "sqlite:///assets/PyProject.db", or "sqlite://" for an in-memory database
+- echo (bool): Log every statement. Only useful for debugging, since it slows every query down.
+- mmapSize (int): Bytes of the database file that are memory mapped
+- cacheSize (int): KiB of pages cached per connection
+- busyTimeout (float): Seconds to wait for a lock
+'''
+
+def createEngine(url: str = "sqlite:///assets/PyProject.db", echo: bool = False, mmapSize: int = 256 * 1024 * 1024, cacheSize: int = 16 * 1024,
+                 busyTimeout: float = 5.0):
+    if url in ("sqlite://", "sqlite:///:memory:"):
+        engine = create_engine(url, echo=echo, poolclass=StaticPool, connect_args={"check_same_thread": False})
+    else:
+        engine = create_engine(url, echo=echo, pool_size=5, max_overflow=10, connect_args={"check_same_thread": False, "timeout": busyTimeout})
+
+    @event.listens_for(engine, "connect")
+    def applyPragmas(dbapiConnection, connectionRecord):
+        cursor = dbapiConnection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute(f"PRAGMA mmap_size={int(mmapSize)}")
+        # A negative cache_size is in KiB rather than in pages
+        cursor.execute(f"PRAGMA cache_size=-{int(cacheSize)}")
+        cursor.execute(f"PRAGMA busy_timeout={int(busyTimeout * 1000)}")
+        cursor.close()
+
+    return engine
@@ -0,0 +1,112 @@
+from collections import OrderedDict
+import threading
+import os
+import customtkinter as ctk
+from PIL import Image, ImageTk
+
+'''
++ AssetCache: Process-wide cache of the images that the pages show. Each image file is decoded once, and the
+	CTkImage/PhotoImage objects that are built from it are kept, already resized, so opening a page doesn't read or
+	decode anything from disk. Entries are evicted least recently used first once they take up more memory than the budget.
+
+Constructor:
+- baseFolder (string): Folder that relative image paths are looked up in. Absolute paths (e.g. an avatar the user
+	chose from their own files) are used as they are.
+- memoryBudget (int): Roughly how many bytes of pixels the cache keeps
+- maxScaling (float): CTkImages are kept at up to this multiple of their size, so they stay sharp on scaled (HiDPI)
+	windows without keeping the full size source around
+
+Methods:
+- getSource(self, path): Returns the decoded PIL image of a file
+- getCTkImage(self, path, size, darkPath=None): Returns a CTkImage of a file, with darkPath as the image for the dark theme
+- getPhotoImage(self, path, size): Returns a tkinter PhotoImage of a file resized to size, e.g. a 300x300 avatar. Needs the
+	App to exist.
+- clear(self): Removes every entry
+'''
+class AssetCache:
+    def __init__(self, baseFolder: str, memoryBudget: int = 32 * 1024 * 1024, maxScaling: float = 2.0):
+        self.baseFolder = baseFolder
+        self.memoryBudget = memoryBudget
+        self.maxScaling = maxScaling
+        # Maps a key to (value, bytes), least recently used first
+        self.entries = OrderedDict()
+        self.usedMemory = 0
+        # Pages are built on the main thread, but warming up the cache may happen on another one
+        self.lock = threading.RLock()
+
+    def resolvePath(self, path: str):
+        return os.path.join(self.baseFolder, path)
+
+    @staticmethod
+    def imageBytes(image):
+        return image.width * image.height * len(image.getbands())
+
+    def lookup(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            self.entries.move_to_end(key)
+            return entry[0]
+
+    def store(self, key, value, cost: int):
+        '''
+        - Adds an entry and evicts the least recently used ones until the cache is within its budget again. The new entry
+            itself is never evicted, even if it's bigger than the whole budget.
+        '''
+        with self.lock:
+            if key in self.entries:
+                self.usedMemory -= self.entries.pop(key)[1]
+            self.entries[key] = (value, cost)
+            self.usedMemory += cost
+            while self.usedMemory > self.memoryBudget and len(self.entries) > 1:
+                _, (_, evictedCost) = self.entries.popitem(last=False)
+                self.usedMemory -= evictedCost
+        return value
+
+    def getSource(self, path: str):
+        key = ("source", self.resolvePath(path))
+        image = self.lookup(key)
+        if image is None:
+            with Image.open(key[1]) as file:
+                image = file.copy()
+            image = self.store(key, image, self.imageBytes(image))
+        return image
+
+    def getScaledSource(self, path: str, size):
+        '''
+        - Returns the image of a file shrunk to maxScaling times size, or the full image if that's smaller
+        '''
+        source = self.getSource(path)
+        scaledSize = (min(source.width, round(size[0] * self.maxScaling)), min(source.height, round(size[1] * self.maxScaling)))
+        if scaledSize == source.size:
+            return source
+        return source.resize(scaledSize, Image.LANCZOS)
+
+    def getCTkImage(self, path: str, size, darkPath: str = None):
+        size = tuple(size)
+        key = ("ctk", self.resolvePath(path), darkPath and self.resolvePath(darkPath), size)
+        image = self.lookup(key)
+        if image is None:
+            lightImage = self.getScaledSource(path, size)
+            darkImage = self.getScaledSource(darkPath, size) if darkPath else None
+            cost = self.imageBytes(lightImage) + (self.imageBytes(darkImage) if darkImage else 0)
+            image = self.store(key, ctk.CTkImage(light_image=lightImage, dark_image=darkImage, size=size), cost)
+        return image
+
+    def getPhotoImage(self, path: str, size):
+        size = tuple(size)
+        key = ("photo", self.resolvePath(path), size)
+        image = self.lookup(key)
+        if image is None:
+            resized = self.getSource(path).resize(size)
+            image = self.store(key, ImageTk.PhotoImage(resized), self.imageBytes(resized))
+        return image
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.usedMemory = 0
+
+# Cache that the whole application shares
+defaultAssetCache = AssetCache(os.path.join(os.path.dirname(os.path.dirname(os.path.realpath(__file__))), "assets", "images"))
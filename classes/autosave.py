@@ -0,0 +1,226 @@
+import math
+import queue
+import threading
+import time
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.exc import OperationalError
+from classes.models import Story, Message
+from classes.resilience import RetryPolicy
+
+'''
++ DraftAutosave: Writes the messages of the chat that the user hasn't saved yet to a draft story in the background, so they
+	aren't lost if the app crashes. The UI thread only queues operations; a background thread carries them out in order.
+	Queued messages are collected for up to `interval` seconds and then written in a single transaction, so the UI never
+	waits for a commit while the user is chatting, and a crash loses at most the last `interval` seconds of messages.
+	Since the messages are already in the database by the time the user saves, saving only turns the draft into a story
+	(or moves its messages into the story that's being continued), which takes a couple of UPDATEs. Saves are queued like
+	everything else and report back through a callback, so the UI doesn't wait for them either. A save is written as soon
+	as it's queued, along with the operations queued before it.
+	A batch that fails because the database is busy or locked is tried again with backoff (see DatabaseRetryPolicy) before
+	anything queued after it, so a transient error doesn't lose messages. If it fails for any other reason, its operations
+	are tried one at a time, so one bad operation doesn't take the rest of the batch with it.
+
++ DatabaseRetryPolicy(RetryPolicy): Retries the SQLite errors that are transient, i.e. a busy or locked database or a
+	failed disk write. By default, it keeps retrying for as long as the error lasts.
+
+Constructor:
+- dataAccess (DataAccess): Opens the sessions that drafts are written with
+- interval (float): Most seconds that a queued message waits before it's written
+- retryPolicy (RetryPolicy): Decides which failed batches are tried again and how long to wait in between
+- stoppingAttempts (int): Most attempts at the last batch when the app is closing, so a database that stays locked can't
+	keep the app from closing
+
+Methods:
+- start(self): Starts the background thread. Until then, operations are carried out straight away on the calling thread.
+- addMessage(self, userID, message, storyID=None): Queues adding a finished message (user or AI) to the end of the user's
+	draft. The draft is created by its first message, and remembers storyID as the saved story that it continues, so the
+	chat can be restored into that story.
+- discard(self, userID): Queues deleting the user's draft, e.g. when they start a new chat
+- saveAsStory(self, userID, storyTitle, onFinished, **columns): Queues turning the user's draft into a saved story with
+	the title and columns. Once it's written, onFinished(storyID, error) is called on the background thread, with error
+	set to the exception instead if it couldn't be written.
+- saveIntoStory(self, userID, storyID, onFinished, **columns): Queues moving the draft's messages to the end of a saved
+	story, setting the story's columns and deleting the draft. Calls onFinished(storyID, error) like saveAsStory.
+- flush(self): Waits until everything that was queued is written
+- stop(self): Writes everything that was queued and stops the background thread
+'''
+class DatabaseRetryPolicy(RetryPolicy):
+    def __init__(self, maxAttempts: float = math.inf, baseDelay: float = 0.05, maxDelay: float = 5.0, seed: int = None):
+        super().__init__(maxAttempts=maxAttempts, baseDelay=baseDelay, maxDelay=maxDelay, seed=seed)
+
+    def isRetryable(self, error: Exception):
+        return isinstance(error, OperationalError)
+
+class DraftAutosave:
+    def __init__(self, dataAccess, interval: float = 2.0, retryPolicy: RetryPolicy = None, stoppingAttempts: int = 4):
+        self.dataAccess = dataAccess
+        self.interval = interval
+        self.retryPolicy = retryPolicy or DatabaseRetryPolicy()
+        self.stoppingAttempts = stoppingAttempts
+        self.operations = queue.Queue()
+        self.thread = threading.Thread(target=self.run, name="DraftAutosave", daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def addMessage(self, userID: int, message, storyID: int = None):
+        # Only the message's values are queued, since the UI keeps using the message object while it's being written
+        self.queueOperation("add", (userID, storyID, message.isAISender, message.text))
+
+    def discard(self, userID: int):
+        self.queueOperation("discard", (userID,))
+
+    def saveAsStory(self, userID: int, storyTitle: str, onFinished, **columns):
+        self.queueOperation("saveAs", (userID, storyTitle, columns), onFinished)
+
+    def saveIntoStory(self, userID: int, storyID: int, onFinished, **columns):
+        self.queueOperation("saveInto", (userID, storyID, columns), onFinished)
+
+    def flush(self):
+        self.waitFor("flush", ())
+
+    def stop(self):
+        if self.thread.is_alive():
+            self.waitFor("stop", ())
+            self.thread.join()
+
+    def queueOperation(self, kind: str, args: tuple, onFinished=None):
+        '''
+        - Queues an operation for the background thread. onFinished(result, error) is called once it's written.
+        '''
+        if not self.thread.is_alive():
+            self.writeBatch([(kind, args, onFinished)])
+        else:
+            self.operations.put((kind, args, onFinished))
+
+    def waitFor(self, kind: str, args: tuple):
+        '''
+        - Queues an operation and blocks until it's written. Only used when the app is closing, or by the tests.
+        '''
+        finished = threading.Event()
+        self.queueOperation(kind, args, lambda result, error: finished.set())
+        finished.wait()
+
+    def run(self):
+        '''
+        - Takes operations off the queue in batches and writes every batch in one transaction. A batch ends once `interval`
+            seconds have passed since its first operation, or as soon as one of its operations has an onFinished callback.
+        '''
+        isStopping = False
+        while not isStopping:
+            batch = [self.operations.get()]
+            deadline = time.monotonic() + self.interval
+            while batch[-1][2] is None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self.operations.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            isStopping = any(kind == "stop" for kind, args, onFinished in batch)
+            self.writeBatch(batch, isStopping)
+
+    def writeBatch(self, batch, isStopping: bool = False):
+        '''
+        - Writes a batch of operations and passes the results to their onFinished callbacks. Retries the batch while its
+            error is transient, and otherwise writes its operations one at a time. onFinished(None, error) is only called 
+            for an operation that couldn't be written on its own.
+        '''
+        attempt = 0
+        while True:
+            try:
+                results = self.carryOut(batch)
+                break
+            except Exception as e:
+                attempt += 1
+                delay = self.retryPolicy.getDelay(attempt, e)
+                if delay is not None and not (isStopping and attempt >= self.stoppingAttempts):
+                    print(f"Couldn't autosave the draft, trying again in {delay:.2f}s: {e}")
+                    time.sleep(delay)
+                    continue
+                if len(batch) > 1:
+                    for operation in batch:
+                        self.writeBatch([operation], isStopping)
+                    return
+                print(f"Couldn't autosave the draft: {e}")
+                kind, args, onFinished = batch[0]
+                if onFinished is not None:
+                    onFinished(None, e)
+                return
+
+        for (kind, args, onFinished), result in zip(batch, results):
+            if onFinished is not None:
+                onFinished(result, None)
+
+    def carryOut(self, batch):
+        '''
+        - Writes a batch of operations in one transaction and returns their results. If the transaction fails, none of the 
+            batch is written and the error is raised.
+        '''
+        results = []
+        with self.dataAccess.writeSession() as session:
+            # userID -> [draft's id, position of the draft's next message], for the drafts this batch has used
+            drafts = {}
+            for kind, args, onFinished in batch:
+                if kind == "add":
+                    results.append(self.addDraftMessage(session, drafts, *args))
+                elif kind == "discard":
+                    results.append(self.deleteDraft(session, drafts, *args))
+                elif kind == "saveAs":
+                    results.append(self.saveDraftAsStory(session, drafts, *args))
+                elif kind == "saveInto":
+                    results.append(self.saveDraftIntoStory(session, drafts, *args))
+                else:
+                    results.append(None)
+        return results
+
+    def getDraft(self, session, drafts, userID: int, create: bool, storyID: int = None):
+        '''
+        - Returns [id, next position] of the user's draft, creating the draft if there isn't one and create is True.
+            Else returns None if there isn't one. A draft that's created continues the saved story storyID, if it's set.
+        '''
+        if userID not in drafts:
+            draftID = session.scalar(select(Story.id).where(Story.userID == userID, Story.isDraft.is_(True)).limit(1))
+            if draftID is None:
+                if not create:
+                    return None
+                draft = Story(userID=userID, storyTitle="Draft", isDraft=True, draftOfStoryID=storyID)
+                session.add(draft)
+                session.flush()
+                drafts[userID] = [draft.id, 0]
+            else:
+                nextPosition = session.scalar(select(func.coalesce(func.max(Message.position) + 1, 0)).where(Message.storyID == draftID))
+                drafts[userID] = [draftID, nextPosition]
+        return drafts[userID]
+
+    def addDraftMessage(self, session, drafts, userID: int, storyID: int, isAISender: bool, text: str):
+        draft = self.getDraft(session, drafts, userID, create=True, storyID=storyID)
+        session.add(Message(storyID=draft[0], position=draft[1], isAISender=isAISender, text=text))
+        draft[1] += 1
+
+    def deleteDraft(self, session, drafts, userID: int):
+        draft = self.getDraft(session, drafts, userID, create=False)
+        if draft is not None:
+            session.execute(delete(Message).where(Message.storyID == draft[0]))
+            session.execute(delete(Story).where(Story.id == draft[0]))
+            del drafts[userID]
+
+    def saveDraftAsStory(self, session, drafts, userID: int, storyTitle: str, columns: dict):
+        # A story can be saved before it has any messages, so the draft is created if there isn't one
+        draft = self.getDraft(session, drafts, userID, create=True)
+        session.execute(update(Story).where(Story.id == draft[0]).values(isDraft=False, draftOfStoryID=None, storyTitle=storyTitle, **columns))
+        del drafts[userID]
+        return draft[0]
+
+    def saveDraftIntoStory(self, session, drafts, userID: int, storyID: int, columns: dict):
+        draft = self.getDraft(session, drafts, userID, create=False)
+        if draft is not None:
+            offset = session.scalar(select(func.coalesce(func.max(Message.position) + 1, 0)).where(Message.storyID == storyID))
+            session.execute(update(Message).where(Message.storyID == draft[0]).values(storyID=storyID, position=Message.position + offset))
+            session.execute(delete(Story).where(Story.id == draft[0]))
+            del drafts[userID]
+        if columns:
+            session.execute(update(Story).where(Story.id == storyID).values(**columns))
+        return storyID
@@ -0,0 +1,51 @@
+'''
++ ChunkRenderer: Renders a streamed AI response into a message box one frame at a time. Chunks are buffered as they arrive
+	and flushed with a single insert per frame, and the length of the message is tracked as it grows, so the message box is
+	never read back and is only resized when the text wraps onto a new line.
+
+Constructor:
+- msgbox (CTkTextbox): Message box that the response is rendered into. Anything with insert() and configure(height=) works.
+- messageObj (Message): Message object that keeps the text of the response
+- prefix (string): Text that's already in the message box before the response, e.g. "Story Bot: "
+- maxHeight (int): The message box never grows past this height
+
+Methods:
+- add(self, chunk): Buffers a chunk until the next flush
+- flush(self): Inserts every buffered chunk at once, resizes the message box if needed, and returns how many chunks were flushed
+'''
+class ChunkRenderer:
+    # Same measurements as AIChatPage.expandEntryBox: 100 characters per line and 30 units of height per line
+    CHARACTERS_PER_LINE = 100
+    LINE_HEIGHT = 30
+
+    def __init__(self, msgbox, messageObj, prefix: str = "", maxHeight: int = 1200):
+        self.msgbox = msgbox
+        self.messageObj = messageObj
+        self.maxHeight = maxHeight
+        self.pendingChunks = []
+        self.length = len(prefix)
+        self.lineCount = 0
+        self.height = None
+
+    def add(self, chunk: str):
+        self.pendingChunks.append(chunk)
+
+    def flush(self):
+        if not self.pendingChunks:
+            return 0
+        chunkCount = len(self.pendingChunks)
+        text = "".join(self.pendingChunks)
+        self.pendingChunks = []
+
+        self.msgbox.insert('end', text)
+        self.messageObj.text += text
+        self.length += len(text)
+
+        lineCount = -(-self.length // self.CHARACTERS_PER_LINE)
+        if lineCount != self.lineCount:
+            self.lineCount = lineCount
+            height = min(lineCount * self.LINE_HEIGHT, self.maxHeight)
+            if height != self.height:
+                self.height = height
+                self.msgbox.configure(height=height)
+        return chunkCount
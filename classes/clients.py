@@ -0,0 +1,113 @@
+import asyncio
+import importlib.util
+import os
+import threading
+import weakref
+
+'''
++ ClientFactory: Creates the OpenAI clients the first time a request needs one, instead of when the app starts, and
+	shares them between every StoryGPT in the process. The clients use one tuned httpx connection pool, so connections
+	(and their TLS handshakes) are kept alive and reused between requests.
+	NOTE: openai and httpx are only imported once the first client is created, since importing them is slow.
+
+Constructor (every setting is optional):
+- apiKey, baseUrl (string): Defaults to the OPENAI_API_KEY / BOOKSMART_API_BASE_URL environment variables, or else the
+	api_key.txt / api_base_url.txt files in the assets folder
+- maxConnections (int): Connections open at the same time. Requests past that wait up to poolTimeout for a free one.
+- maxKeepaliveConnections (int): Idle connections kept open for reuse, for keepaliveExpiry seconds
+- connectTimeout, readTimeout, writeTimeout, poolTimeout (float): Seconds before the request fails. readTimeout is the
+	longest wait for the next chunk of a streamed response, not for the whole response.
+- http2 (bool): Use HTTP/2. Defaults to whether the optional 'h2' package is installed.
+
+Methods:
+- getClient(self): Returns the shared openai.OpenAI client
+- getAsyncClient(self): Returns the openai.AsyncOpenAI client of the running event loop. Every event loop gets its own,
+	because an async connection pool can't be shared between event loops.
+- close(self): Closes the sync client and its connections. A new client is created if one is needed again.
+'''
+
+def readSetting(fileName: str, environmentVariable: str):
+    '''
+    Returns a setting from the environment variable if it's set, or else from the file in the assets folder.
+    Returns None if neither exists.
+    '''
+    if os.environ.get(environmentVariable):
+        return os.environ[environmentVariable].strip()
+    settingPath = os.path.join('./assets', fileName)
+    if os.path.exists(settingPath):
+        with open(settingPath, 'r') as f:
+            return f.read().strip()
+    return None
+
+class ClientFactory:
+    def __init__(self, apiKey: str = None, baseUrl: str = None, maxConnections: int = 20, maxKeepaliveConnections: int = 10, keepaliveExpiry: float = 30.0,
+                 connectTimeout: float = 10.0, readTimeout: float = 60.0, writeTimeout: float = 10.0, poolTimeout: float = 10.0, http2: bool = None):
+        self.apiKey = apiKey
+        self.baseUrl = baseUrl
+        self.maxConnections = maxConnections
+        self.maxKeepaliveConnections = maxKeepaliveConnections
+        self.keepaliveExpiry = keepaliveExpiry
+        self.connectTimeout = connectTimeout
+        self.readTimeout = readTimeout
+        self.writeTimeout = writeTimeout
+        self.poolTimeout = poolTimeout
+        self.http2 = http2 if http2 is not None else importlib.util.find_spec("h2") is not None
+
+        self.lock = threading.Lock()
+        self.client = None
+        self.asyncClients = weakref.WeakKeyDictionary()
+
+    def getCredentials(self):
+        '''
+        - Returns the API key and base URL. They're read when the first client is created, so a missing key only fails the requests, not the app's startup.
+        NOTE: The base URL is only set when pointing the app at another OpenAI compatible server, such as tools/fakeOpenAIServer.py
+            for offline development and load tests. That server doesn't check API keys, so a key isn't required then.
+        '''
+        # get the current API key from a file so OpenAI doesn't delete it
+        baseUrl = self.baseUrl or readSetting('api_base_url.txt', 'BOOKSMART_API_BASE_URL')
+        apiKey = self.apiKey or readSetting('api_key.txt', 'OPENAI_API_KEY')
+        if apiKey is None and baseUrl:
+            apiKey = "local"
+        return apiKey, baseUrl
+
+    def makeHTTPSettings(self):
+        import httpx
+        return {
+            "limits": httpx.Limits(max_connections=self.maxConnections, max_keepalive_connections=self.maxKeepaliveConnections, keepalive_expiry=self.keepaliveExpiry),
+            "timeout": httpx.Timeout(connect=self.connectTimeout, read=self.readTimeout, write=self.writeTimeout, pool=self.poolTimeout),
+            "http2": self.http2,
+        }
+
+    def getClient(self):
+        if self.client is None:
+            with self.lock:
+                if self.client is None:
+                    import httpx
+                    import openai
+                    apiKey, baseUrl = self.getCredentials()
+                    settings = self.makeHTTPSettings()
+                    # NOTE: openai's own retries are turned off, since ModelBase retries with its own RetryPolicy and CircuitBreaker
+                    self.client = openai.OpenAI(api_key=apiKey, base_url=baseUrl, max_retries=0, timeout=settings["timeout"], http_client=httpx.Client(**settings))
+        return self.client
+
+    def getAsyncClient(self):
+        loop = asyncio.get_running_loop()
+        with self.lock:
+            client = self.asyncClients.get(loop)
+            if client is None:
+                import httpx
+                import openai
+                apiKey, baseUrl = self.getCredentials()
+                settings = self.makeHTTPSettings()
+                client = openai.AsyncOpenAI(api_key=apiKey, base_url=baseUrl, max_retries=0, timeout=settings["timeout"], http_client=httpx.AsyncClient(**settings))
+                self.asyncClients[loop] = client
+        return client
+
+    def close(self):
+        '''
+        - Closes the sync client. Async clients can only be closed from their own event loop, so they're just dropped along with it.
+        '''
+        with self.lock:
+            client, self.client = self.client, None
+        if client is not None:
+            client.close()
@@ -1,5 +1,8 @@
 from models import Base, User, Story, Message
-from Database import engine
+from Database import createEngine
+
+# Create an engine that'll setup a database in the assets folder
+engine = createEngine("sqlite:///../assets/PyProject.db")
 
 # Create the tables 
 Base.metadata.create_all(bind=engine)
\ No newline at end of file
@@ -0,0 +1,126 @@
+import contextlib
+from sqlalchemy import func, select
+from sqlalchemy.orm import sessionmaker
+from classes.models import User, Story, Message
+from classes import queries
+
+'''
++ DataAccess: Everything the pages read from or write to the database goes through here. Every operation opens a short
+	lived session of its own and closes it before returning, so nothing is kept in an identity map between operations and
+	the app's memory doesn't grow with every story and message that was ever opened. Since no session is shared, the
+	operations can also be called from any thread.
+
+	The objects that are returned are detached: the columns and relationships that the operation loaded can be used
+	freely, but anything else has to be loaded by another operation (e.g. loadStory for a story's messages). Sessions
+	don't expire objects on commit, so objects that were just saved keep their values after their session closes.
+
+Constructor:
+- engine (Engine): Engine of the database, made by classes.Database.createEngine
+
+Methods:
+- readSession(self): Context manager for a session that only reads. It never flushes and never commits; the read
+	transaction is simply ended when the session is closed.
+- writeSession(self, expireOnCommit=False): Context manager for a session whose changes are committed when the block
+	ends, or rolled back if it raises. With expireOnCommit, the objects are expired by the commit, so they're reloaded
+	the next time they're used inside the block.
+- findUser(self, username, passwordHash=None): Returns the user with the username (and password hash), or None
+- addUser(self, user): Saves a new user and returns it
+- updateUser(self, userID, **columns): Sets the columns of a user and returns the updated user
+- deleteUser(self, userID): Deletes a user along with their stories and messages
+- loadStory(self, storyID): Returns a story with all of its messages
+- loadDraft(self, userID): Returns the user's draft with all of its messages, or None if they don't have one
+- countMessages(self, storyID): Returns how many messages a story has
+- loadStoriesWithMessages(self, userID): Returns all of a user's stories with their messages, oldest first
+- loadStoryText(self, storyID): Returns the text of a story's messages as a single string
+- loadMessagesBefore(self, storyID, position, count): Returns up to count messages of a story that come before position
+	(or the newest ones if position is None), oldest first
+- saveStory(self, story): Saves a new story, or the changes and new messages of a saved one, and returns the saved story
+- deleteStory(self, storyID): Deletes a story along with its messages
+'''
+class DataAccess:
+    def __init__(self, engine):
+        self.engine = engine
+        self.Session = sessionmaker(bind=engine, expire_on_commit=False)
+
+    @contextlib.contextmanager
+    def readSession(self):
+        session = self.Session(autoflush=False)
+        try:
+            yield session
+        finally:
+            session.close()
+
+    @contextlib.contextmanager
+    def writeSession(self, expireOnCommit: bool = False):
+        session = self.Session(expire_on_commit=expireOnCommit)
+        try:
+            yield session
+            session.commit()
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+
+    def findUser(self, username: str, passwordHash: str = None):
+        query = select(User).where(User.username == username)
+        if passwordHash is not None:
+            query = query.where(User.passwordHash == passwordHash)
+        with self.readSession() as session:
+            return session.scalars(query.limit(1)).first()
+
+    def addUser(self, user):
+        with self.writeSession() as session:
+            session.add(user)
+        return user
+
+    def updateUser(self, userID: int, **columns):
+        with self.writeSession() as session:
+            user = session.get(User, userID)
+            for column, value in columns.items():
+                setattr(user, column, value)
+        return user
+
+    def deleteUser(self, userID: int):
+        with self.writeSession() as session:
+            user = session.get(User, userID)
+            if user is not None:
+                # Loads the user's stories along with all of their messages in 2 queries, so they can be deleted too
+                session.delete(user)
+
+    def loadStory(self, storyID: int):
+        with self.readSession() as session:
+            return session.get(Story, storyID)
+
+    def loadDraft(self, userID: int):
+        with self.readSession() as session:
+            return session.scalars(select(Story).where(Story.userID == userID, Story.isDraft.is_(True)).limit(1)).first()
+
+    def countMessages(self, storyID: int):
+        with self.readSession() as session:
+            return session.scalar(select(func.count(Message.id)).where(Message.storyID == storyID))
+
+    def loadStoriesWithMessages(self, userID: int):
+        with self.readSession() as session:
+            return queries.loadStoriesWithMessages(session, userID)
+
+    def loadStoryText(self, storyID: int):
+        with self.readSession() as session:
+            return queries.loadStoryText(session, storyID)
+
+    def loadMessagesBefore(self, storyID: int, position: int, count: int):
+        with self.readSession() as session:
+            return queries.loadMessagesBefore(session, storyID, position, count)
+
+    def saveStory(self, story):
+        # merge copies the story and its messages into the session, loading the saved copy first if there is one.
+        # Messages that aren't saved yet are inserted.
+        with self.writeSession() as session:
+            story = session.merge(story)
+        return story
+
+    def deleteStory(self, storyID: int):
+        with self.writeSession() as session:
+            story = session.get(Story, storyID)
+            if story is not None:
+                session.delete(story)
@@ -0,0 +1,92 @@
+import queue
+import threading
+
+'''
++ GenerationWorker: Runs the generator returned by ModelBase.complete() on a background thread so that
+	the Tk main loop never blocks while waiting on network chunks. Chunks are handed to the UI through a
+	thread-safe queue, which the page drains with after() callbacks.
+
+Constructor:
+- generator (Generator): Generator that yields the text chunks of the AI's response
+- onCancel (Callable): Optional function that aborts the in-flight request, e.g. ModelBase.abort. It's called
+	from the UI thread when the worker is cancelled so the worker doesn't have to wait for the next chunk.
+
+Attributes/Variables:
+- events (Queue): Queue of (eventType, value) tuples produced by the worker thread
+- cancelEvent (threading.Event): Set when the UI asks the worker to stop generating
+- thread (threading.Thread): Daemon thread that iterates the generator
+
+Methods:
+- start(self): Starts the background thread
+- cancel(self): Asks the worker to stop, and aborts the in-flight request if possible
+- drain(self, maxEvents): Returns the events that are currently available without blocking
+- isRunning(self): Whether the worker thread is still alive
+'''
+class GenerationWorker:
+    CHUNK = "chunk"
+    DONE = "done"
+    ERROR = "error"
+    CANCELLED = "cancelled"
+
+    def __init__(self, generator, onCancel=None):
+        self.generator = generator
+        self.onCancel = onCancel
+        self.events = queue.Queue()
+        self.cancelEvent = threading.Event()
+        self.thread = threading.Thread(target=self.run, name="GenerationWorker", daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def run(self):
+        '''
+        - Iterates the generator and puts every chunk onto the queue. Exactly one final event (DONE, ERROR or CANCELLED)
+            is always put on the queue after the chunks, so the UI knows when to stop polling.
+        NOTE: The generator is closed from this thread, because a generator can't be closed from another thread
+            while it's executing. Closing it lets ModelBase.complete() record whatever text was generated so far.
+        '''
+        try:
+            # The generator only sends its request once it's first iterated, so a worker that was cancelled before it got 
+            # here never sends one
+            if not self.cancelEvent.is_set():
+                for chunk in self.generator:
+                    if self.cancelEvent.is_set():
+                        break
+                    self.events.put((self.CHUNK, chunk))
+        except Exception as e:
+            if not self.cancelEvent.is_set():
+                self.events.put((self.ERROR, e))
+                return
+        finally:
+            close = getattr(self.generator, "close", None)
+            if close:
+                close()
+
+        if self.cancelEvent.is_set():
+            self.events.put((self.CANCELLED, None))
+        else:
+            self.events.put((self.DONE, None))
+
+    def cancel(self):
+        if self.cancelEvent.is_set():
+            return
+        self.cancelEvent.set()
+        if self.onCancel:
+            self.onCancel()
+
+    def drain(self, maxEvents=None):
+        '''
+        - Returns a list of (eventType, value) tuples that are ready, without blocking the caller.
+        1. maxEvents (int): Optional cap on the number of events returned, so one callback can't hog the main loop.
+        '''
+        drained = []
+        while maxEvents is None or len(drained) < maxEvents:
+            try:
+                drained.append(self.events.get_nowait())
+            except queue.Empty:
+                break
+        return drained
+
+    def isRunning(self):
+        return self.thread.is_alive()
@@ -0,0 +1,190 @@
+'''
++ MessageRecord: One chat message. Uses __slots__ instead of a dictionary per message to keep long chats compact.
+- id (int): Stable id of the message. It never changes, even when messages before it are added or removed.
+- role (string): "system", "user" or "assistant"
+- content (string): Text of the message
+- tokenCount (int): Number of tokens the message costs when it's sent to the AI
+
++ MessageStore: Ordered store of chat messages with O(1) appends and O(1) removal by id. Removed messages leave a
+	tombstone (None) in their slot, so no other message has to move; the tombstones are compacted away the next time
+	a position is needed, or once they make up half of the slots.
+
+Attributes:
+- slots (list): MessageRecord in chat order, or None where a message was removed
+- slotById (dict): Maps a message id to its index in slots
+- idsByMessage (dict): Maps (role, content) to the ids of the messages with that exact role and content, so messages can
+	be found by their content without scanning the chat
+- totalTokens (int): Sum of the token counts of every message
+
+Methods:
+- append(self, role, content, tokenCount): Adds a message to the end and returns its id
+- extend(self, messages): Adds many (role, content, tokenCount) messages to the end
+- insert(self, position, role, content, tokenCount): Adds a message at position and returns its id
+- removeById(self, messageId): Removes a message and returns its record
+- removeAt(self, position): Removes the message at position and returns its record
+- findId(self, role, content): Returns the id of the first message with that role and content, or None
+- idAt(self, position) / positionOf(self, messageId) / get(self, messageId): Lookups between ids, positions and records
+- records(self, start, end): Returns the records between two positions
+- reversedRecords(self): Iterates the records from newest to oldest
+- toMessages(self): Returns the messages in the OpenAI format. The list is cached until the next change that isn't an append.
+- clear(self): Removes every message
+'''
+
+class MessageRecord:
+    __slots__ = ("id", "role", "content", "tokenCount")
+
+    def __init__(self, messageId: int, role: str, content: str, tokenCount: int):
+        self.id = messageId
+        self.role = role
+        self.content = content
+        self.tokenCount = tokenCount
+
+    def toDict(self):
+        return {"role": self.role, "content": self.content}
+
+class MessageStore:
+    # Don't bother compacting until there are at least this many tombstones
+    MIN_TOMBSTONES_TO_COMPACT = 64
+
+    def __init__(self):
+        self.slots = []
+        self.slotById = {}
+        self.idsByMessage = {}
+        self.tombstoneCount = 0
+        self.nextId = 1
+        self.totalTokens = 0
+        # Cached result of toMessages(), or None when it has to be rebuilt. It's only built once it's asked for, and then 
+        # kept up to date by appends.
+        self.messageList = None
+
+    def __len__(self):
+        return len(self.slots) - self.tombstoneCount
+
+    def makeRecord(self, role: str, content: str, tokenCount: int):
+        record = MessageRecord(self.nextId, role, content, tokenCount)
+        self.nextId += 1
+        # NOTE: A dict is used as an ordered set of ids
+        self.idsByMessage.setdefault((role, content), {})[record.id] = None
+        self.totalTokens += tokenCount
+        return record
+
+    def append(self, role: str, content: str, tokenCount: int):
+        record = self.makeRecord(role, content, tokenCount)
+        self.slotById[record.id] = len(self.slots)
+        self.slots.append(record)
+        if self.messageList is not None:
+            self.messageList.append(record.toDict())
+        return record.id
+
+    def extend(self, messages):
+        '''
+        - Appends many messages at once, given as (role, content, tokenCount) tuples. Faster than calling append() for each.
+        '''
+        # NOTE: Same as makeRecord() and append(), inlined with local variables since stories are loaded in one go
+        slots, slotById, idsByMessage = self.slots, self.slotById, self.idsByMessage
+        nextId = self.nextId
+        addedTokens = 0
+        for role, content, tokenCount in messages:
+            slotById[nextId] = len(slots)
+            slots.append(MessageRecord(nextId, role, content, tokenCount))
+            idsByMessage.setdefault((role, content), {})[nextId] = None
+            addedTokens += tokenCount
+            nextId += 1
+        self.nextId = nextId
+        self.totalTokens += addedTokens
+        # The cached list is rebuilt the next time it's asked for
+        self.messageList = None
+
+    def insert(self, position: int, role: str, content: str, tokenCount: int):
+        '''
+        - Inserts like list.insert, so positions past the end append the message. This moves every later message, so it's O(n).
+        '''
+        if position >= len(self):
+            return self.append(role, content, tokenCount)
+        self.compact()
+        position = max(0, position + len(self.slots) if position < 0 else position)
+        record = self.makeRecord(role, content, tokenCount)
+        self.slots.insert(position, record)
+        for slot in range(position, len(self.slots)):
+            self.slotById[self.slots[slot].id] = slot
+        if self.messageList is not None:
+            self.messageList.insert(position, record.toDict())
+        return record.id
+
+    def removeById(self, messageId: int):
+        slot = self.slotById.pop(messageId)
+        isNewest = slot == len(self.slots) - 1
+        record = self.slots[slot]
+        self.slots[slot] = None
+        self.tombstoneCount += 1
+        self.totalTokens -= record.tokenCount
+        messageIds = self.idsByMessage[(record.role, record.content)]
+        del messageIds[messageId]
+        if not messageIds:
+            del self.idsByMessage[(record.role, record.content)]
+
+        # Removing the newest messages (e.g. undoing an append) doesn't need to leave tombstones behind
+        while self.slots and self.slots[-1] is None:
+            self.slots.pop()
+            self.tombstoneCount -= 1
+        if self.messageList is not None and isNewest:
+            self.messageList.pop()
+        else:
+            self.messageList = None
+
+        if self.tombstoneCount >= self.MIN_TOMBSTONES_TO_COMPACT and self.tombstoneCount * 2 >= len(self.slots):
+            self.compact()
+        return record
+
+    def removeAt(self, position: int):
+        return self.removeById(self.idAt(position))
+
+    def findId(self, role: str, content: str):
+        messageIds = self.idsByMessage.get((role, content))
+        if not messageIds:
+            return None
+        # Usually there's only one, but if a message was repeated, the first one in the chat is the one that's found
+        return min(messageIds, key=self.slotById.__getitem__)
+
+    def get(self, messageId: int):
+        return self.slots[self.slotById[messageId]]
+
+    def idAt(self, position: int):
+        self.compact()
+        return self.slots[position].id
+
+    def positionOf(self, messageId: int):
+        self.compact()
+        return self.slotById[messageId]
+
+    def records(self, start: int = 0, end: int = None):
+        self.compact()
+        return self.slots[start:end]
+
+    def reversedRecords(self):
+        for record in reversed(self.slots):
+            if record is not None:
+                yield record
+
+    def toMessages(self):
+        if self.messageList is None:
+            self.messageList = [record.toDict() for record in self.slots if record is not None]
+        return self.messageList
+
+    def compact(self):
+        '''
+        - Removes the tombstones and re-indexes the remaining messages
+        '''
+        if not self.tombstoneCount:
+            return
+        self.slots = [record for record in self.slots if record is not None]
+        self.slotById = {record.id: slot for slot, record in enumerate(self.slots)}
+        self.tombstoneCount = 0
+
+    def clear(self):
+        self.slots = []
+        self.slotById = {}
+        self.idsByMessage = {}
+        self.tombstoneCount = 0
+        self.totalTokens = 0
+        self.messageList = None
@@ -0,0 +1,315 @@
+import bisect
+import collections
+import json
+import os
+import threading
+import time
+
+'''
++ metrics: Timings of AI requests and of rendering their responses, so slow stories can be traced to either the network
+	or our own UI. `ModelBase.complete()` fills in a RequestMetrics for every request and AIChatPage a RenderMetrics for every
+	response it shows. Both are handed to the model's `metricsSink`, if one is set.
+
++ RequestMetrics: Timings of one request, from building it to the last chunk of the response
+- model (string): Model the request was sent to
+- stream (bool): Whether the response was streamed
+- recordBuild(promptMessages, promptTokens): Marks the request as built and sent
+- recordChunk(text): Records a chunk of the response as it arrives
+- recordRetry(delay): Records a failed attempt that's retried after `delay` seconds
+- finish(status, error): Marks the end of the request. status is "finished", "cancelled" or "error".
+- toDict(): Returns the timings as a JSON serializable dictionary
+
++ RenderMetrics: Timings of rendering one response in the UI
+- recordRender(chunkCount, seconds): Records one batch of chunks being rendered
+- finish(status): Marks the end of the response
+
+Sinks (every sink has a `record(metrics)` method, which must be thread safe):
+- RingBufferSink(capacity): Keeps the latest records in memory
+- JSONLFileSink(path): Appends every record to a file as a line of JSON
+- PrometheusSink(path): Aggregates records into counters and histograms, and renders them in Prometheus' text format
+- MultiSink(*sinks): Passes every record to several sinks
+'''
+
+class RequestMetrics:
+    kind = "request"
+
+    def __init__(self, model: str, stream: bool = True, cached: bool = False):
+        self.model = model
+        self.stream = stream
+        self.cached = cached
+        # Whether the response was generated speculatively, before the user asked for it
+        self.speculative = False
+        self.createdAt = time.time()
+        self.startTime = time.perf_counter()
+
+        self.compactionSeconds = 0.0
+        self.buildSeconds = None
+        self.promptMessages = 0
+        self.promptTokens = 0
+
+        self.sentTime = None
+        self.lastChunkTime = None
+        self.timeToFirstChunk = None
+        self.chunkGaps = []
+        self.chunkCount = 0
+        self.characterCount = 0
+
+        self.retryCount = 0
+        self.retryDelaySeconds = 0.0
+
+        self.totalSeconds = None
+        self.status = None
+        self.error = None
+
+    def recordCompaction(self, seconds: float):
+        self.compactionSeconds += seconds
+
+    def recordBuild(self, promptMessages: int, promptTokens: int):
+        self.sentTime = time.perf_counter()
+        self.buildSeconds = self.sentTime - self.startTime - self.compactionSeconds
+        self.promptMessages = promptMessages
+        self.promptTokens = promptTokens
+
+    def recordChunk(self, text: str):
+        now = time.perf_counter()
+        if self.lastChunkTime is None:
+            self.timeToFirstChunk = now - (self.sentTime or self.startTime)
+        else:
+            self.chunkGaps.append(now - self.lastChunkTime)
+        self.lastChunkTime = now
+        self.chunkCount += 1
+        self.characterCount += len(text)
+
+    def recordRetry(self, delay: float):
+        self.retryCount += 1
+        self.retryDelaySeconds += delay
+
+    def finish(self, status: str, error: str = None):
+        self.totalSeconds = time.perf_counter() - self.startTime
+        self.status = status
+        self.error = error
+
+    @property
+    def streamSeconds(self):
+        '''
+        - Seconds from the first to the last chunk
+        '''
+        return sum(self.chunkGaps)
+
+    @property
+    def chunksPerSecond(self):
+        return self.chunkCount / self.streamSeconds if self.streamSeconds else None
+
+    @property
+    def charactersPerSecond(self):
+        return self.characterCount / self.streamSeconds if self.streamSeconds else None
+
+    def toDict(self):
+        sortedGaps = sorted(self.chunkGaps)
+        return {
+            "kind": self.kind,
+            "createdAt": self.createdAt,
+            "model": self.model,
+            "stream": self.stream,
+            "cached": self.cached,
+            "speculative": self.speculative,
+            "status": self.status,
+            "error": self.error,
+            "compactionSeconds": self.compactionSeconds,
+            "buildSeconds": self.buildSeconds,
+            "promptMessages": self.promptMessages,
+            "promptTokens": self.promptTokens,
+            "timeToFirstChunk": self.timeToFirstChunk,
+            "totalSeconds": self.totalSeconds,
+            "retryCount": self.retryCount,
+            "retryDelaySeconds": self.retryDelaySeconds,
+            "chunkCount": self.chunkCount,
+            "characterCount": self.characterCount,
+            "chunksPerSecond": self.chunksPerSecond,
+            "charactersPerSecond": self.charactersPerSecond,
+            "meanChunkGap": sum(sortedGaps) / len(sortedGaps) if sortedGaps else None,
+            "p95ChunkGap": sortedGaps[int(len(sortedGaps) * 0.95)] if sortedGaps else None,
+            "maxChunkGap": sortedGaps[-1] if sortedGaps else None,
+        }
+
+class RenderMetrics:
+    kind = "render"
+
+    def __init__(self):
+        self.createdAt = time.time()
+        self.startTime = time.perf_counter()
+        self.renderCount = 0
+        self.chunkCount = 0
+        self.renderSeconds = 0.0
+        self.maxRenderSeconds = 0.0
+        self.totalSeconds = None
+        self.status = None
+
+    def recordRender(self, chunkCount: int, seconds: float):
+        self.renderCount += 1
+        self.chunkCount += chunkCount
+        self.renderSeconds += seconds
+        self.maxRenderSeconds = max(self.maxRenderSeconds, seconds)
+
+    def finish(self, status: str):
+        self.totalSeconds = time.perf_counter() - self.startTime
+        self.status = status
+
+    def toDict(self):
+        return {
+            "kind": self.kind,
+            "createdAt": self.createdAt,
+            "status": self.status,
+            "totalSeconds": self.totalSeconds,
+            "renderCount": self.renderCount,
+            "chunkCount": self.chunkCount,
+            "renderSeconds": self.renderSeconds,
+            "maxRenderSeconds": self.maxRenderSeconds,
+        }
+
+class RingBufferSink:
+    def __init__(self, capacity: int = 256):
+        self.records = collections.deque(maxlen=capacity)
+        self.lock = threading.Lock()
+
+    def record(self, metrics):
+        with self.lock:
+            self.records.append(metrics.toDict())
+
+    def getRecords(self, kind: str = None):
+        '''
+        - Returns a copy of the stored records, oldest first, optionally only the ones of one kind ("request" or "render")
+        '''
+        with self.lock:
+            return [record for record in self.records if kind is None or record["kind"] == kind]
+
+class JSONLFileSink:
+    def __init__(self, path: str):
+        self.path = path
+        self.lock = threading.Lock()
+
+    def record(self, metrics):
+        line = json.dumps(metrics.toDict())
+        with self.lock:
+            with open(self.path, "a") as f:
+                f.write(line + "\n")
+
+class Histogram:
+    '''
+    - Cumulative histogram in the shape Prometheus expects
+    '''
+    def __init__(self, buckets):
+        self.buckets = list(buckets)
+        self.counts = [0] * len(self.buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        index = bisect.bisect_left(self.buckets, value)
+        if index < len(self.counts):
+            self.counts[index] += 1
+        self.count += 1
+        self.sum += value
+
+    def render(self, name: str):
+        lines = [f"# TYPE {name} histogram"]
+        cumulativeCount = 0
+        for bucket, count in zip(self.buckets, self.counts):
+            cumulativeCount += count
+            lines.append(f'{name}_bucket{{le="{bucket}"}} {cumulativeCount}')
+        lines.append(f'{name}_bucket{{le="+Inf"}} {self.count}')
+        lines.append(f"{name}_sum {self.sum}")
+        lines.append(f"{name}_count {self.count}")
+        return lines
+
+class PrometheusSink:
+    '''
+    - Aggregates records into counters and histograms. render() returns them in Prometheus' text exposition format.
+        If path is given, the file is rewritten after every record so it can be scraped (e.g. by node_exporter's textfile collector).
+    '''
+    LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+    GAP_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1)
+
+    def __init__(self, path: str = None, prefix: str = "booksmart"):
+        self.path = path
+        self.prefix = prefix
+        self.lock = threading.Lock()
+        self.requestCounts = collections.Counter()
+        self.characterCount = 0
+        self.promptTokens = 0
+        self.retryCount = 0
+        self.timeToFirstChunk = Histogram(self.LATENCY_BUCKETS)
+        self.requestDuration = Histogram(self.LATENCY_BUCKETS)
+        self.maxChunkGap = Histogram(self.GAP_BUCKETS)
+        self.maxRenderStall = Histogram(self.GAP_BUCKETS)
+
+    def record(self, metrics):
+        record = metrics.toDict()
+        with self.lock:
+            if record["kind"] == RequestMetrics.kind:
+                self.requestCounts[record["status"]] += 1
+                self.characterCount += record["characterCount"]
+                self.promptTokens += record["promptTokens"]
+                self.retryCount += record["retryCount"]
+                if record["timeToFirstChunk"] is not None:
+                    self.timeToFirstChunk.observe(record["timeToFirstChunk"])
+                if record["totalSeconds"] is not None:
+                    self.requestDuration.observe(record["totalSeconds"])
+                if record["maxChunkGap"] is not None:
+                    self.maxChunkGap.observe(record["maxChunkGap"])
+            elif record["kind"] == RenderMetrics.kind:
+                self.maxRenderStall.observe(record["maxRenderSeconds"])
+            text = self.renderLocked() if self.path else None
+        if text is not None:
+            # NOTE: Write to a temporary file first so a scraper never reads a half written file
+            temporaryPath = f"{self.path}.tmp"
+            with open(temporaryPath, "w") as f:
+                f.write(text)
+            os.replace(temporaryPath, self.path)
+
+    def render(self):
+        with self.lock:
+            return self.renderLocked()
+
+    def renderLocked(self):
+        prefix = self.prefix
+        lines = [f"# TYPE {prefix}_requests_total counter"]
+        for status, count in sorted(self.requestCounts.items()):
+            lines.append(f'{prefix}_requests_total{{status="{status}"}} {count}')
+        lines.append(f"# TYPE {prefix}_response_characters_total counter")
+        lines.append(f"{prefix}_response_characters_total {self.characterCount}")
+        lines.append(f"# TYPE {prefix}_prompt_tokens_total counter")
+        lines.append(f"{prefix}_prompt_tokens_total {self.promptTokens}")
+        lines.append(f"# TYPE {prefix}_retries_total counter")
+        lines.append(f"{prefix}_retries_total {self.retryCount}")
+        lines += self.timeToFirstChunk.render(f"{prefix}_time_to_first_chunk_seconds")
+        lines += self.requestDuration.render(f"{prefix}_request_duration_seconds")
+        lines += self.maxChunkGap.render(f"{prefix}_max_chunk_gap_seconds")
+        lines += self.maxRenderStall.render(f"{prefix}_max_render_stall_seconds")
+        return "\n".join(lines) + "\n"
+
+class MultiSink:
+    def __init__(self, *sinks):
+        self.sinks = list(sinks)
+
+    def record(self, metrics):
+        for sink in self.sinks:
+            sink.record(metrics)
+
+def makeSink(setting: str):
+    '''
+    - Returns the sink for a setting such as the BOOKSMART_METRICS environment variable: "memory" for a RingBufferSink,
+        a path ending in ".prom" for a PrometheusSink, or any other path for a JSONLFileSink. Several settings can be
+        separated by commas.
+    '''
+    sinks = []
+    for part in filter(None, (part.strip() for part in setting.split(","))):
+        if part == "memory":
+            sinks.append(RingBufferSink())
+        elif part.endswith(".prom"):
+            sinks.append(PrometheusSink(part))
+        else:
+            sinks.append(JSONLFileSink(part))
+    if not sinks:
+        return None
+    return sinks[0] if len(sinks) == 1 else MultiSink(*sinks)
@@ -0,0 +1,62 @@
+import sqlite3
+from sqlalchemy import inspect, text
+from classes.models import Base
+
+def upgradeSchema(engine):
+    '''
+    - Brings an existing database up to date with the models in classes/models.py.
+    1. Creates any tables that don't exist yet.
+    2. Adds the columns that were added to a model after its table was created. New columns must either be
+        nullable or have a server_default, since the existing rows need a value for them.
+    3. Numbers the messages of every story by their id, if messages.position was just added.
+    4. Creates the indexes that were added to a model after its table was created. If a unique index can't be created 
+        because the existing rows have duplicates, a plain index is created instead so lookups are still fast.
+    '''
+    Base.metadata.create_all(bind=engine)
+    addedColumns = set()
+    with engine.begin() as connection:
+        # Inspect through the same connection, so the inspector's queries don't end the transaction
+        inspector = inspect(connection)
+        for table in Base.metadata.sorted_tables:
+            existingColumns = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existingColumns:
+                    continue
+                columnDefinition = f"{column.name} {column.type.compile(dialect=engine.dialect)}"
+                if column.server_default is not None:
+                    columnDefinition += f" DEFAULT {column.server_default.arg}"
+                if not column.nullable:
+                    columnDefinition += " NOT NULL"
+                connection.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {columnDefinition}"))
+                addedColumns.add((table.name, column.name))
+
+        # 3
+        if ("messages", "position") in addedColumns:
+            if sqlite3.sqlite_version_info >= (3, 33, 0):
+                connection.execute(text(
+                    "UPDATE messages SET position = numbered.position "
+                    "FROM (SELECT id, ROW_NUMBER() OVER (PARTITION BY storyID ORDER BY id) - 1 AS position FROM messages) AS numbered "
+                    "WHERE messages.id = numbered.id"
+                ))
+            else:
+                # Older SQLite doesn't have UPDATE ... FROM, so every message counts the ones before it in its story instead.
+                # The temporary index keeps every count to the rows of one story.
+                connection.execute(text("CREATE INDEX ix_messages_storyID_upgrade ON messages (storyID)"))
+                connection.execute(text(
+                    "UPDATE messages SET position = ("
+                    "SELECT COUNT(*) FROM messages AS earlier WHERE earlier.storyID = messages.storyID AND earlier.id < messages.id)"
+                ))
+                connection.execute(text("DROP INDEX ix_messages_storyID_upgrade"))
+
+        # 4
+        for table in Base.metadata.sorted_tables:
+            existingIndexes = {index["name"] for index in inspector.get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name in existingIndexes:
+                    continue
+                columnNames = ", ".join(column.name for column in index.columns)
+                if index.unique and connection.execute(text(f"SELECT 1 FROM {table.name} GROUP BY {columnNames} HAVING COUNT(*) > 1 LIMIT 1")).first():
+                    print(f"Couldn't make {index.name} unique, since {table.name} has duplicate values. Creating a plain index instead.")
+                    connection.execute(text(f"CREATE INDEX {index.name} ON {table.name} ({columnNames})"))
+                else:
+                    index.create(connection)
@@ -1,6 +1,7 @@
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
-from sqlalchemy import ForeignKey, Text, Boolean
-from typing import List
+from sqlalchemy.ext.orderinglist import ordering_list
+from sqlalchemy import ForeignKey, Text, Boolean, Index
+from typing import List, Optional
 
 class Base(DeclarativeBase):
     pass
@@ -10,7 +11,9 @@ class User(Base):
 
     # Create attribute columns in the database
     id:Mapped[int] = mapped_column(primary_key=True)
-    username:Mapped[str] = mapped_column(nullable=False)
+    # Users are looked up by username when logging in, registering and editing their account, so it's indexed.
+    # Usernames are unique, since registering checks that a username isn't taken.
+    username:Mapped[str] = mapped_column(nullable=False, unique=True, index=True)
     email:Mapped[str] = mapped_column(nullable=False)
     firstName:Mapped[str] = mapped_column(nullable=False)
     lastName:Mapped[str] = mapped_column(nullable=False)
@@ -44,12 +47,24 @@ class Story(Base):
     __tablename__ = "stories"
     id:Mapped[int] = mapped_column(primary_key=True)
 
-    # The ID associated with the story
-    userID:Mapped[int] = mapped_column(ForeignKey("users.id"), nullable=False)
+    # The ID associated with the story. Indexed since the library loads a user's stories by it.
+    userID:Mapped[int] = mapped_column(ForeignKey("users.id"), nullable=False, index=True)
     storyTitle:Mapped[str] = mapped_column(nullable=False)
 
-    # Complete the relationship with the User 
-    user:Mapped["User"] = relationship(back_populates="stories")
+    # Cached summary of the story's oldest messages, so that long stories don't have to be resent to the AI verbatim.
+    # summarizedCount is the number of messages (from the start of the story) that the summary covers.
+    summary:Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    summarizedCount:Mapped[int] = mapped_column(nullable=False, default=0, server_default="0")
+
+    # Drafts hold the messages of a chat that the user hasn't saved yet, so they survive a crash (see classes/autosave.py).
+    # A user has at most one draft, and drafts never show up in the library.
+    isDraft:Mapped[bool] = mapped_column(Boolean, nullable=False, default=False, server_default="0")
+    # The saved story that a draft's messages are being added to, or None if the draft is a new story
+    draftOfStoryID:Mapped[Optional[int]] = mapped_column(ForeignKey("stories.id"), nullable=True)
+
+    # Complete the relationship with the User. Stories are always reached through their user, so story.user never needs
+    # a query of its own; raise_on_sql makes code that would send one fail instead of quietly sending a query per story.
+    user:Mapped["User"] = relationship(back_populates="stories", lazy="raise_on_sql")
 
     
     
@@ -59,9 +74,14 @@ class Story(Base):
     cascade: If a story object is deleted, the messages are too. 
     delete-orphan: If a message isn't associated with a story or referenced anywhere else in the database
     , it's deleted from the database.
-    
+    order_by/collection_class: Messages are loaded in the order of their position in the story, and ordering_list sets 
+        the position of every message that's added to the story. Ordering by storyID first lets SQLite read a whole batch
+        of stories' messages straight from ix_messages_storyID_position without sorting them.
+    lazy: With 'selectin', loading any number of stories loads all of their messages in one more query, instead of one
+        query per story. Queries that don't need the messages, like the library grid, turn it off (see classes/queries.py).
     '''
-    messages:Mapped[List["Message"]] = relationship(back_populates="story", cascade="all, delete-orphan")
+    messages:Mapped[List["Message"]] = relationship(back_populates="story", cascade="all, delete-orphan",
+                                                    order_by="[Message.storyID, Message.position]", collection_class=ordering_list("position"), lazy="selectin")
 
     def __repr__(self):
         return f"<Story title: {self.storyTitle}>"
@@ -69,10 +89,15 @@ class Story(Base):
 
 class Message(Base):
     __tablename__ = "messages"
+    # Messages are always loaded by their story, in order, so (storyID, position) is indexed together
+    __table_args__ = (Index("ix_messages_storyID_position", "storyID", "position"),)
     id:Mapped[int] = mapped_column(primary_key=True)
 
     # Store the ID of the story that the message belongs to
     storyID:Mapped[int] = mapped_column(ForeignKey("stories.id"), nullable=False)
+
+    # Index of the message in its story, starting from 0
+    position:Mapped[int] = mapped_column(nullable=False, default=0, server_default="0")
     
     isAISender:Mapped[bool] = mapped_column(Boolean, nullable=False)
     
@@ -80,8 +105,9 @@ class Message(Base):
     text:Mapped[str] = mapped_column(Text, nullable=False)
 
     # Complete the 1 to many relationship between Story and Message
-    # So through messages, we should be able to access the story.
-    story:Mapped["Story"] = relationship(back_populates="messages") 
+    # So through messages, we should be able to access the story. Messages are only loaded through their story, which 
+    # is already in the session, so accessing message.story must never send a query.
+    story:Mapped["Story"] = relationship(back_populates="messages", lazy="raise_on_sql")
 
     def __repr__(self):
             return f"<Message Text: {self.text}>"
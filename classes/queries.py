@@ -0,0 +1,55 @@
+from sqlalchemy import and_, select
+from sqlalchemy.orm import load_only, lazyload, selectinload
+from classes.models import Story, Message
+
+'''
++ queries: The queries that pages use to load stories, each of which loads only what its page needs. Every function
+	sends the same number of SELECT statements no matter how many stories or messages a user has.
+	Drafts (see classes/autosave.py) aren't part of the library, so they're left out of the library's queries.
+	NOTE: Story.messages is loaded with 'selectin' by default, so loading any number of stories loads all of their messages
+	in one more SELECT. The library grid doesn't show messages, so libraryPageQuery turns that off.
+
+Functions:
+- libraryPageQuery(userID, limit, offset): Returns the query for a page of the story library. Only the columns that the
+	story cards show are loaded; everything else is loaded when a story is opened, remixed or exported.
+- libraryFilter(userID): Returns the WHERE clause that selects a user's saved stories, without their draft
+- loadStoriesWithMessages(session, userID): Returns all of a user's stories, oldest first, with their messages. Sends
+	2 SELECTs.
+- loadStoryText(session, storyID): Returns the text of a story's messages, in order, as a single string. Only the text
+	column is loaded. Sends 1 SELECT.
+- loadMessagesBefore(session, storyID, position, count): Returns up to count messages of a story that come before position
+	(or the newest ones if position is None), oldest first. Sends 1 SELECT, which reads only count rows however long the
+	story is.
+'''
+
+def libraryFilter(userID: int):
+    return and_(Story.userID == userID, Story.isDraft.is_(False))
+
+def libraryPageQuery(userID: int, limit: int, offset: int = 0):
+    return (select(Story)
+            .where(libraryFilter(userID))
+            .order_by(Story.id)
+            .limit(limit)
+            .offset(offset)
+            .options(load_only(Story.id, Story.userID, Story.storyTitle), lazyload(Story.messages)))
+
+def loadStoriesWithMessages(session, userID: int):
+    query = (select(Story)
+             .where(libraryFilter(userID))
+             .order_by(Story.id)
+             .options(selectinload(Story.messages)))
+    return list(session.scalars(query))
+
+def loadStoryText(session, storyID: int):
+    query = (select(Message.text)
+             .where(Message.storyID == storyID)
+             .order_by(Message.position))
+    return "".join(session.scalars(query))
+
+def loadMessagesBefore(session, storyID: int, position: int, count: int):
+    query = select(Message).where(Message.storyID == storyID)
+    if position is not None:
+        query = query.where(Message.position < position)
+    messages = list(session.scalars(query.order_by(Message.position.desc()).limit(count)))
+    messages.reverse()
+    return messages
@@ -0,0 +1,253 @@
+import email.utils
+import random
+import threading
+import time
+
+'''
++ resilience: Retries, backoff and a circuit breaker for the requests that ModelBase sends to OpenAI. Transient failures
+	(rate limits, server errors, dropped connections) are retried with jittered exponential backoff, and a stream that
+	breaks part way is resumed instead of started over, so the text that was already shown is never repeated. Errors
+	that are left over are raised as GenerationError, and never end up in the story text.
+	describeError and RetryPolicy.isRetryable import openai and httpx themselves, for the reason given in classes/clients.py.
+
++ GenerationError: Raised when a response couldn't be generated
+- retryable (bool): Whether the failure was transient, i.e. trying again later may work
+- retryAfter (float): Seconds the caller should wait before trying again, if known
+
++ CircuitOpenError(GenerationError): Raised without sending a request while the circuit breaker is open
+
++ RetryPolicy: Decides which errors are retried and how long to wait in between
+- maxAttempts (int): Attempts per request, including the first one
+- baseDelay, maxDelay (float): The backoff before attempt n is a random delay between 0 and min(maxDelay, baseDelay * 2^n) ("full jitter")
+- maxRetryAfter (float): Longest Retry-After that's honoured. The request fails instead of waiting any longer than that.
+
++ CircuitBreaker: Stops sending requests after `failureThreshold` transient failures in a row, so an outage doesn't get
+	hammered by every open story. After `resetTimeout` seconds one trial request is let through (half open); if it
+	succeeds the circuit closes again, otherwise it opens for another `resetTimeout` seconds.
+
++ StreamResumer: Keeps track of the text of a streamed response, and builds the request that continues it after a retry
+'''
+
+class GenerationError(Exception):
+    def __init__(self, message: str, retryable: bool = False, retryAfter: float = None):
+        super().__init__(message)
+        self.retryable = retryable
+        self.retryAfter = retryAfter
+
+class CircuitOpenError(GenerationError):
+    pass
+
+def describeError(error: Exception):
+    '''
+    - Returns a short explanation of an error from openai that can be shown to the user
+    '''
+    import httpx
+    import openai
+    if isinstance(error, openai.RateLimitError):
+        return "OpenAI is receiving too many requests right now"
+    if isinstance(error, openai.APIStatusError):
+        if error.status_code >= 500:
+            return f"OpenAI's servers had an error ({error.status_code})"
+        body = error.body if isinstance(error.body, dict) else {}
+        return f"OpenAI rejected the request ({error.status_code}): {body.get('message', error.message)}"
+    if isinstance(error, (openai.APIConnectionError, httpx.TransportError)):
+        return "Couldn't connect to OpenAI"
+    if isinstance(error, openai.APIError):
+        body = error.body if isinstance(error.body, dict) else {}
+        return f"OpenAI stopped the response: {body.get('message', error.message)}"
+    return f"Unexpected error: {error}"
+
+class RetryPolicy:
+    RETRYABLE_STATUS_CODES = (408, 409, 429)
+
+    def __init__(self, maxAttempts: int = 4, baseDelay: float = 0.5, maxDelay: float = 20.0, maxRetryAfter: float = 60.0, seed: int = None):
+        self.maxAttempts = maxAttempts
+        self.baseDelay = baseDelay
+        self.maxDelay = maxDelay
+        self.maxRetryAfter = maxRetryAfter
+        self.random = random.Random(seed)
+
+    def isRetryable(self, error: Exception):
+        import httpx
+        import openai
+        if isinstance(error, openai.APIStatusError):
+            return error.status_code in self.RETRYABLE_STATUS_CODES or error.status_code >= 500
+        if isinstance(error, openai.APIResponseValidationError):
+            return False
+        # Connection errors, timeouts, and error events in the middle of a stream
+        return isinstance(error, (openai.APIError, httpx.TransportError))
+
+    def getRetryAfter(self, error: Exception):
+        '''
+        - Returns the seconds to wait that the server asked for in its Retry-After(-ms) header, or None
+        '''
+        response = getattr(error, "response", None)
+        headers = getattr(response, "headers", None)
+        if not headers:
+            return None
+        try:
+            if headers.get("retry-after-ms"):
+                return float(headers["retry-after-ms"]) / 1000
+            retryAfter = headers.get("retry-after")
+            if not retryAfter:
+                return None
+            try:
+                return float(retryAfter)
+            except ValueError:
+                # The header can also be an HTTP date
+                return max(0.0, email.utils.parsedate_to_datetime(retryAfter).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
+
+    def getDelay(self, attempt: int, error: Exception = None):
+        '''
+        - Returns the seconds to wait before retrying, after `attempt` attempts (1 or more) failed, or None if the request shouldn't be retried
+        '''
+        if attempt >= self.maxAttempts or (error is not None and not self.isRetryable(error)):
+            return None
+        retryAfter = self.getRetryAfter(error) if error is not None else None
+        if retryAfter is not None:
+            return retryAfter if retryAfter <= self.maxRetryAfter else None
+        return self.random.uniform(0, min(self.maxDelay, self.baseDelay * 2 ** (attempt - 1)))
+
+class CircuitBreaker:
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half open"
+
+    def __init__(self, failureThreshold: int = 5, resetTimeout: float = 30.0, clock=time.monotonic):
+        self.failureThreshold = failureThreshold
+        self.resetTimeout = resetTimeout
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.state = self.CLOSED
+        self.failureCount = 0
+        self.openedAt = None
+        self.isTrialRunning = False
+        self.trialStartedAt = None
+
+    def allowRequest(self):
+        '''
+        - Returns whether a request may be sent now. In the half open state, only one trial request is allowed at a time.
+            NOTE: A trial that never reports back (e.g. its task was cancelled) is given up on after resetTimeout seconds.
+        '''
+        with self.lock:
+            if self.state == self.OPEN and self.clock() - self.openedAt >= self.resetTimeout:
+                self.state = self.HALF_OPEN
+                self.isTrialRunning = False
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.HALF_OPEN and (not self.isTrialRunning or self.clock() - self.trialStartedAt >= self.resetTimeout):
+                self.isTrialRunning = True
+                self.trialStartedAt = self.clock()
+                return True
+            return False
+
+    def getRetryAfter(self):
+        '''
+        - Returns the seconds until a trial request will be let through, or 0 if requests are allowed
+        '''
+        with self.lock:
+            if self.state != self.OPEN:
+                return 0.0
+            return max(0.0, self.resetTimeout - (self.clock() - self.openedAt))
+
+    def checkRequest(self):
+        '''
+        - Raises CircuitOpenError if a request may not be sent now
+        '''
+        if not self.allowRequest():
+            retryAfter = self.getRetryAfter()
+            raise CircuitOpenError(f"OpenAI has been failing, so StoryBot is pausing requests. Please try again in {retryAfter:.0f} seconds.", retryable=True, retryAfter=retryAfter)
+
+    def recordSuccess(self):
+        with self.lock:
+            self.state = self.CLOSED
+            self.failureCount = 0
+            self.isTrialRunning = False
+
+    def recordFailure(self):
+        with self.lock:
+            self.failureCount += 1
+            self.isTrialRunning = False
+            if self.state == self.HALF_OPEN or self.failureCount >= self.failureThreshold:
+                self.state = self.OPEN
+                self.openedAt = self.clock()
+
+class StreamResumer:
+    '''
+    - request: Keyword arguments of the original streaming request
+    - minOverlap: Shortest overlap between the old text and a continuation that's treated as repeated text
+    - overlapWindow: Characters of a continuation that are held back to look for repeated text
+    '''
+    RESUME_INSTRUCTION = "Your previous response was cut off. Continue it exactly where it stopped, without repeating any of it and without any introduction."
+
+    def __init__(self, request: dict, minOverlap: int = 12, overlapWindow: int = 120):
+        self.request = request
+        self.minOverlap = minOverlap
+        self.overlapWindow = overlapWindow
+        self.parts = []
+        # Text that was received before the current attempt, and the start of the continuation, which is held back 
+        # until it's clear how much of it repeats the old text. pendingText is None when nothing is held back.
+        self.previousText = ""
+        self.pendingText = None
+
+    @property
+    def text(self):
+        return "".join(self.parts)
+
+    def nextRequest(self):
+        '''
+        - Returns the request for the next attempt: the original request if nothing was received yet, or else one that
+            asks the model to continue the partial response
+        '''
+        self.pendingText = None
+        self.previousText = self.text
+        if not self.previousText:
+            return self.request
+        self.pendingText = ""
+        return dict(self.request, messages=self.request["messages"] + [
+            {"role": "assistant", "content": self.previousText},
+            {"role": "user", "content": self.RESUME_INSTRUCTION},
+        ])
+
+    def accept(self, content: str):
+        '''
+        - Takes a chunk of the response and returns the part of it that should be shown (possibly "")
+        '''
+        if self.pendingText is None:
+            self.parts.append(content)
+            return content
+        self.pendingText += content
+        previousText = self.previousText
+        if previousText.startswith(self.pendingText[:len(previousText)]):
+            # The model may have started over. Hold back until it has either repeated all of the old text or departed from it.
+            if len(self.pendingText) <= len(previousText):
+                return ""
+            return self.finishResume(self.pendingText[len(previousText):])
+        if len(self.pendingText) < self.overlapWindow:
+            return ""
+        return self.flush()
+
+    def flush(self):
+        '''
+        - Returns the continuation that's still held back, without the part that repeats the end of the old text
+        '''
+        if self.pendingText is None:
+            return ""
+        pendingText = self.pendingText
+        previousText = self.previousText
+        if previousText.startswith(pendingText):
+            # Everything that came was a repeat
+            return self.finishResume("")
+        for overlap in range(min(len(previousText), len(pendingText)), self.minOverlap - 1, -1):
+            if previousText.endswith(pendingText[:overlap]):
+                pendingText = pendingText[overlap:]
+                break
+        return self.finishResume(pendingText)
+
+    def finishResume(self, newText: str):
+        self.pendingText = None
+        if newText:
+            self.parts.append(newText)
+        return newText
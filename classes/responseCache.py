@@ -0,0 +1,99 @@
+import collections
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+import time
+
+'''
++ ResponseCache: Opt-in cache of AI responses, keyed on a hash of everything that's sent to the API (model, the full
+	message list and the sampling parameters). Identical requests are answered from the cache instead of the network,
+	which is useful in test and demo environments and for repeated remixes.
+
+Constructor:
+- maxEntries (int): Number of responses kept in memory. The least recently used response is evicted first.
+- databasePath (string): Optional path of a SQLite file that's used as a persistent second tier, so cached
+	responses survive restarts.
+- maxPersistentEntries (int): Number of responses kept in the SQLite file.
+
+Methods:
+- makeKey(request): Returns the cache key of the keyword arguments for `client.chat.completions.create`
+- get(self, key): Returns the cached response text, or None
+- put(self, key, response): Caches a response
+- replay(response): Generator that yields a cached response in chunks, like a streamed response from openai
+- clear(self): Removes every cached response from both tiers
+'''
+class ResponseCache:
+    # Request arguments that don't change the text of the response
+    IGNORED_REQUEST_KEYS = ("stream",)
+
+    def __init__(self, maxEntries=256, databasePath=None, maxPersistentEntries=5000):
+        self.maxEntries = maxEntries
+        self.maxPersistentEntries = maxPersistentEntries
+        self.entries = collections.OrderedDict()
+        self.lock = threading.Lock()
+        self.connection = None
+        if databasePath:
+            # NOTE: Responses are generated on a background thread, so the connection is shared between threads behind self.lock
+            self.connection = sqlite3.connect(databasePath, check_same_thread=False)
+            self.connection.execute("CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, response TEXT NOT NULL, lastUsed REAL NOT NULL)")
+            self.connection.execute("CREATE INDEX IF NOT EXISTS ix_responses_lastUsed ON responses (lastUsed)")
+            self.connection.commit()
+
+    @classmethod
+    def makeKey(cls, request):
+        normalizedRequest = {key: value for key, value in request.items() if key not in cls.IGNORED_REQUEST_KEYS}
+        serializedRequest = json.dumps(normalizedRequest, sort_keys=True, separators=(",", ":"))
+        return hashlib.sha256(serializedRequest.encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                return self.entries[key]
+            if not self.connection:
+                return None
+            row = self.connection.execute("SELECT response FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            self.connection.execute("UPDATE responses SET lastUsed = ? WHERE key = ?", (time.time(), key))
+            self.connection.commit()
+            self.remember(key, row[0])
+            return row[0]
+
+    def put(self, key, response):
+        with self.lock:
+            self.remember(key, response)
+            if not self.connection:
+                return
+            self.connection.execute("INSERT OR REPLACE INTO responses (key, response, lastUsed) VALUES (?, ?, ?)", (key, response, time.time()))
+            self.connection.execute(
+                "DELETE FROM responses WHERE key IN (SELECT key FROM responses ORDER BY lastUsed DESC LIMIT -1 OFFSET ?)",
+                (self.maxPersistentEntries,)
+            )
+            self.connection.commit()
+
+    def remember(self, key, response):
+        '''
+        - Puts a response in the in-memory tier and evicts the least recently used responses. Caller must hold self.lock.
+        '''
+        self.entries[key] = response
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.maxEntries:
+            self.entries.popitem(last=False)
+
+    @staticmethod
+    def replay(response):
+        '''
+        - Yields the response one word at a time (with its leading whitespace), so that joining the chunks gives back the exact response
+        '''
+        for match in re.finditer(r"\s*\S+|\s+$", response):
+            yield match.group()
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            if self.connection:
+                self.connection.execute("DELETE FROM responses")
+                self.connection.commit()
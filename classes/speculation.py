@@ -0,0 +1,93 @@
+import threading
+
+'''
++ SpeculativeResponse: A streaming response that's requested before the user has actually asked for it, e.g. the next part
+	of the story while the user is still reading the last one. Its chunks are buffered on a background thread, so when the
+	user does ask for it, everything that arrived in the meantime can be shown at once and the rest streams in as usual.
+	NOTE: It's low priority by design. It's sent once, without retries, and anything else the model does cancels it.
+
+Constructor:
+- request (dict): Keyword arguments of the streaming request. ModelBase only serves the response for this exact request.
+- createStream (Callable): Sends a request and returns the streaming response, e.g. client.chat.completions.create
+
+Attributes/Variables:
+- chunks (Array): Text chunks received so far
+- isDone (bool): Whether the response has ended, because it finished, failed or was cancelled
+- error (Exception): Why the response failed, if it did
+
+Methods:
+- start(self): Sends the request on a background thread
+- cancel(self): Stops the response and closes its connection. Safe to call from any thread.
+- replay(self): Generator that yields the chunks received so far, then the rest as they arrive, until the response ends
+'''
+class SpeculativeResponse:
+    def __init__(self, request: dict, createStream):
+        self.request = request
+        self.createStream = createStream
+        self.chunks = []
+        self.isDone = False
+        self.error = None
+        self.condition = threading.Condition()
+        self.cancelEvent = threading.Event()
+        self.response = None
+        self.thread = threading.Thread(target=self.run, name="SpeculativeResponse", daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def run(self):
+        response = None
+        try:
+            response = self.createStream(**self.request)
+            with self.condition:
+                self.response = response
+            # cancel() may have been called while the request was being sent, when there was nothing to close yet
+            if self.cancelEvent.is_set():
+                return
+            for chunk in response:
+                if self.cancelEvent.is_set():
+                    break
+                content = chunk.choices[0].delta.content
+                if content:
+                    with self.condition:
+                        self.chunks.append(content)
+                        self.condition.notify_all()
+        except Exception as e:
+            if not self.cancelEvent.is_set():
+                self.error = e
+        finally:
+            httpResponse = getattr(response, "response", None)
+            if httpResponse is not None:
+                httpResponse.close()
+            with self.condition:
+                self.isDone = True
+                self.condition.notify_all()
+
+    def cancel(self):
+        self.cancelEvent.set()
+        with self.condition:
+            response = self.response
+        httpResponse = getattr(response, "response", None)
+        if httpResponse is not None:
+            try:
+                httpResponse.close()
+            except Exception:
+                pass
+
+    @property
+    def isCancelled(self):
+        return self.cancelEvent.is_set()
+
+    def replay(self):
+        position = 0
+        while True:
+            with self.condition:
+                while position == len(self.chunks) and not self.isDone:
+                    self.condition.wait()
+                newChunks = self.chunks[position:]
+                position = len(self.chunks)
+                isDone = self.isDone
+            yield from newChunks
+            if isDone:
+                return
@@ -0,0 +1,82 @@
+import contextlib
+import importlib
+import sys
+import threading
+import time
+
+'''
++ StartupProfiler: Records how long each import and initialization phase of the app's startup takes, so slow startups
+	can be tracked down. Turn it on with the BOOKSMART_PROFILE_STARTUP environment variable; when it's off, phases cost
+	next to nothing and nothing is printed.
+
+Constructor:
+- enabled (bool): Whether phases are recorded
+- output: Where the report is written, sys.stderr by default
+
+Attributes:
+- startTime (float): When the profiler was created, which is treated as the start of startup
+- phases (list): (name, start, seconds, thread name) of every phase that finished, in the order they finished
+
+Methods:
+- phase(self, name): Context manager that records how long the code inside it takes
+- importModule(self, moduleName): Imports a module as a phase of its own and returns it
+- report(self): Returns the report as text, one line per phase
+- printReport(self): Writes the report to output if the profiler is enabled
+
++ warmUp(moduleNames, profiler=None, onFinished=None): Imports modules on a background daemon thread, so that they're
+	already loaded by the time a page needs them. Modules that fail to import are skipped; the page that needs them reports
+	the error. onFinished is called on that thread once every module was imported. Returns the thread.
+'''
+class StartupProfiler:
+    def __init__(self, enabled: bool = False, output=None):
+        self.enabled = enabled
+        self.output = output
+        self.startTime = time.perf_counter()
+        self.phases = []
+        self.lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def phase(self, name: str):
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            with self.lock:
+                self.phases.append((name, start - self.startTime, seconds, threading.current_thread().name))
+
+    def importModule(self, moduleName: str):
+        with self.phase(f"import {moduleName}"):
+            return importlib.import_module(moduleName)
+
+    def report(self):
+        with self.lock:
+            phases = list(self.phases)
+        lines = ["Startup profile (ms since start | ms taken | phase):"]
+        for name, start, seconds, threadName in phases:
+            background = "" if threadName == "MainThread" else f" [{threadName}]"
+            lines.append(f"{start * 1000:9.1f} | {seconds * 1000:8.1f} | {name}{background}")
+        return "\n".join(lines)
+
+    def printReport(self):
+        if self.enabled:
+            print(self.report(), file=self.output or sys.stderr)
+
+def warmUp(moduleNames, profiler: StartupProfiler = None, onFinished=None):
+    profiler = profiler or StartupProfiler()
+
+    def importModules():
+        for moduleName in moduleNames:
+            try:
+                profiler.importModule(moduleName)
+            except Exception:
+                continue
+        if onFinished:
+            onFinished()
+
+    thread = threading.Thread(target=importModules, name="warmUp", daemon=True)
+    thread.start()
+    return thread
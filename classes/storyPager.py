@@ -0,0 +1,44 @@
+from sqlalchemy import func, select
+from classes.models import Story
+from classes.queries import libraryFilter, libraryPageQuery
+
+'''
++ StoryPager: Loads a user's saved stories one page at a time, so the story library only has to query and render the
+	stories that are on screen no matter how many stories the user has.
+
+Constructor:
+- readSession: Callable that returns a context manager for a session, such as DataAccess.readSession. Every query opens a
+	session of its own, so the stories of pages that were shown before aren't kept in memory.
+- userID (int): ID of the user whose stories are paged
+- pageSize (int): Most stories on a page
+
+Methods:
+- countStories(self): Returns how many stories the user has. The count is cached until refresh() is called.
+- pageCount(self): Returns how many pages there are. There's always at least one page, even if it's empty.
+- getPage(self, pageIndex): Returns the stories on a page, oldest first. Only those stories are loaded from the database,
+	and only the columns that the story cards show.
+- refresh(self): Forgets the cached count, e.g. after a story was deleted
+'''
+class StoryPager:
+    def __init__(self, readSession, userID: int, pageSize: int = 12):
+        self.readSession = readSession
+        self.userID = userID
+        self.pageSize = pageSize
+        self.storyCount = None
+
+    def countStories(self):
+        if self.storyCount is None:
+            with self.readSession() as session:
+                self.storyCount = session.scalar(select(func.count(Story.id)).where(libraryFilter(self.userID)))
+        return self.storyCount
+
+    def pageCount(self):
+        return max(1, -(-self.countStories() // self.pageSize))
+
+    def getPage(self, pageIndex: int):
+        pageIndex = min(max(0, pageIndex), self.pageCount() - 1)
+        with self.readSession() as session:
+            return list(session.scalars(libraryPageQuery(self.userID, self.pageSize, pageIndex * self.pageSize)))
+
+    def refresh(self):
+        self.storyCount = None
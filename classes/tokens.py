@@ -0,0 +1,40 @@
+import functools
+
+'''
+- Helpers for estimating how many tokens a chat message costs. If tiktoken is installed, it's used for exact counts.
+	Else we fall back on the usual approximation of about 4 characters per token for English text, which is close
+	enough for budgeting how much chat history fits into a request.
+'''
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+# Every chat message costs a few tokens on top of its content (role and separators)
+MESSAGE_OVERHEAD_TOKENS = 4
+CHARS_PER_TOKEN = 4
+
+@functools.lru_cache(maxsize=None)
+def getEncoding(model):
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("cl100k_base")
+
+@functools.lru_cache(maxsize=4096)
+def countTextTokens(text, model="gpt-3.5-turbo"):
+    '''
+    - Returns the number of tokens in text. Results are cached, so re-counting the same message (e.g. when a
+        story is loaded again) is free.
+    '''
+    if not text:
+        return 0
+    if tiktoken:
+        return len(getEncoding(model).encode(text))
+    return -(-len(text) // CHARS_PER_TOKEN)
+
+def countMessageTokens(message, model="gpt-3.5-turbo"):
+    '''
+    - Returns the number of tokens an OpenAI formatted chat dictionary costs in a request
+    '''
+    return countTextTokens(message["content"] or "", model) + MESSAGE_OVERHEAD_TOKENS
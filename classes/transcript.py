@@ -0,0 +1,81 @@
+'''
++ TranscriptWindow: Keeps track of which messages of a (possibly very long) story are shown on the AIChatPage. Only a window of
+	`windowSize` messages has widgets at a time; scrolling past either end of the window moves it by `pageSize` messages.
+	Older messages are only loaded (e.g. from the database) once the user scrolls up to them.
+
+Constructor:
+- messages (Array): Messages that are already loaded, oldest first, e.g. the newest page of a saved story plus the unsaved messages
+- loadOlder (Callable): Optional function that takes (oldestMessage, count) and returns up to `count` messages that come right
+	before oldestMessage, oldest first. oldestMessage is None when no message is loaded yet. An empty list means there are no more.
+- windowSize (int): Most messages that are shown at the same time
+- pageSize (int): Messages the window moves by when scrolling
+
+Methods:
+- visibleMessages(self): Returns the messages in the window, oldest first
+- append(self, message): Adds a new message at the end. The window follows it if the newest message was already shown.
+- scrollUp(self): Moves the window to older messages, loading them if needed. Returns whether the window moved.
+- scrollDown(self): Moves the window to newer messages. Returns whether the window moved.
+- showNewest(self): Moves the window to the newest messages
+- hasOlder(self), hasNewer(self): Whether there are messages before/after the window
+'''
+class TranscriptWindow:
+    def __init__(self, messages=None, loadOlder=None, windowSize: int = 40, pageSize: int = 20):
+        self.messages = list(messages or [])
+        self.loadOlder = loadOlder
+        self.windowSize = windowSize
+        self.pageSize = pageSize
+        # Whether loadOlder has run out of messages
+        self.isExhausted = loadOlder is None
+        self.windowEnd = len(self.messages)
+        self.windowStart = max(0, self.windowEnd - windowSize)
+
+    def visibleMessages(self):
+        return self.messages[self.windowStart:self.windowEnd]
+
+    def hasOlder(self):
+        return self.windowStart > 0 or not self.isExhausted
+
+    def hasNewer(self):
+        return self.windowEnd < len(self.messages)
+
+    def append(self, message):
+        isShowingNewest = not self.hasNewer()
+        self.messages.append(message)
+        if isShowingNewest:
+            self.windowEnd = len(self.messages)
+            self.windowStart = max(self.windowStart, self.windowEnd - self.windowSize)
+
+    def loadOlderPage(self):
+        '''
+        - Loads the page of messages before the oldest loaded one. Returns how many were loaded.
+        '''
+        if self.isExhausted:
+            return 0
+        olderMessages = self.loadOlder(self.messages[0] if self.messages else None, self.pageSize)
+        if len(olderMessages) < self.pageSize:
+            self.isExhausted = True
+        if olderMessages:
+            self.messages[:0] = olderMessages
+            self.windowStart += len(olderMessages)
+            self.windowEnd += len(olderMessages)
+        return len(olderMessages)
+
+    def scrollUp(self):
+        if self.windowStart < self.pageSize:
+            self.loadOlderPage()
+        if self.windowStart == 0:
+            return False
+        self.windowStart = max(0, self.windowStart - self.pageSize)
+        self.windowEnd = min(len(self.messages), self.windowStart + self.windowSize)
+        return True
+
+    def scrollDown(self):
+        if not self.hasNewer():
+            return False
+        self.windowEnd = min(len(self.messages), self.windowEnd + self.pageSize)
+        self.windowStart = max(0, self.windowEnd - self.windowSize)
+        return True
+
+    def showNewest(self):
+        self.windowEnd = len(self.messages)
+        self.windowStart = max(0, self.windowEnd - self.windowSize)
@@ -3,9 +3,12 @@ import customtkinter as ctk
 import sys, os
 sys.path.append("..")
 from classes.models import Message
+from classes.generationWorker import GenerationWorker
+from classes.metrics import RenderMetrics
+from classes.chunkRenderer import ChunkRenderer
+from classes.transcript import TranscriptWindow
 from tkinter import messagebox
 from customtkinter import CTkCanvas
-from PIL import Image 
 
 '''
 + AIChatPage: Frame that represents the page where the user and AI send chat messages to each other in order to 
@@ -21,25 +24,71 @@ Attributes/Variables:
 - pageStatusMessage (CTkLabel): Indicates status of the page like when the user is currently waiting on the AI for a response
 	or whether an occur has occurred.
 - chatBox (CTkTextbox): Textbox that shows the messages of the user and AI.
+- transcript (TranscriptWindow): Which messages of the story are shown. Only a window of them gets widgets, and the older
+	messages of a saved story are only loaded from the database once the user scrolls up to them.
+- transcriptWidgets (Dictionary): Message box of every message in the transcript's window, by message object
+- widgetPool (Array): Message boxes of messages that scrolled out of the window, ready to be reused for other messages
+- showOlderBtn, showNewerBtn (CTkButton): Move the transcript's window. Scrolling to either end of the chat box does the same.
+- liveMsgboxes (Array): Message boxes of the AI's response that's being generated, below the transcript
 - chatInputSection (CTkFrame): Section with all of the input related widgets
 - chatEntry (CTkEntry): Input text box where user types in their message
 - openSaveStoryBtn (CTkButton): Button that redirects the user to the saveStoryPage
 - sendChatBtn (CTkButton): Button that sends the chat to the AI.
+- stopChatBtn (CTkButton): Button that cancels the AI's response while it's being generated.
+- generationWorker (GenerationWorker): Background worker that's currently generating the AI's response, if any.
+- renderMetrics (RenderMetrics): Time spent rendering the AI's current response. It's recorded to storyGPT's metrics sink once the response ends.
+- chunkRenderers (Array): ChunkRenderer for every message box the AI's current response is rendered into. There's one per draft
+	when StoryBot is writing several drafts at the same time (storyGPT.candidate_count is more than 1).
+- isWritingDrafts (bool): Whether the current response is several drafts that the user picks from
+- candidatePicker (CTkFrame): Buttons for keeping one of the drafts, shown once the drafts are finished
 
 Methods:
 - processUserChat(self): Sends a user chat message to the AI and gets its response.
-- renderChat(self, messageObj): Renders message text onto the screen given a messgae object.
+- onChatEntryModified(self, event): Schedules resizeChatEntry when the text in chatEntry changes.
+- resizeChatEntry(self): Adjusts the height of chatEntry to the number of lines of its text.
+- renderChatMessageObj(self, messageObj, msgbox): Renders message text into msgbox given a messgae object.
+- renderTranscript(self): Gives every message in the transcript's window a message box, reusing the boxes of messages that left it.
+- loadOlderMessages(self, oldestMessage, count): Loads a page of the saved story's messages from the database.
+- processAIChat(self): Starts rendering the AI's response, which is generated on a background thread.
+- pollAIChat(self): Renders the chunks that the background worker has produced so far, once per frame.
+- cancelAIChat(self): Stops the AI's response that's currently being generated.
+- autosaveMessage(self, messageObj): Queues a finished message to be written to the user's draft.
+- showCandidatePicker(self): Lets the user pick which of the finished drafts to keep.
+- chooseCandidate(self, index): Keeps draft `index` as the AI's response and removes the other drafts.
 '''
 class AIChatPage(ctk.CTkFrame):
 	def __init__(self, master):
 		self.master = master
 		super().__init__(self.master, fg_color=self.master.theme["main_clr"], corner_radius=0)
 
-		self.chatEntry_height=20
 		self.max_chatEntry_height = 400 # 4 line max view space
+		# Lines of text in chatEntry the last time it was resized. It's only resized again when this changes.
+		self.chatEntryLineCount = None
 		# This logic prevents the dynamically resizing msgbox from overexpanding - Powered by Nuke The Dev
-		self.msgbox_height=30
 		self.max_msgbox_height = 1200 # 12 line max view space
+		# Most messages that have a message box at the same time. Long stories are paged in as the user scrolls.
+		self.transcriptWindowSize = 40
+
+		# The AI's response is rendered at most this many times a second. Chunks that arrive in between are 
+		# buffered and inserted together, so a fast stream doesn't make the window stutter.
+		self.maxFramesPerSecond = 30
+		self.pollInterval = 1000 // self.maxFramesPerSecond
+		self.generationWorker = None
+		self.pollAfterId = None
+		self.renderMetrics = None
+		self.chunkRenderers = []
+		self.isWritingDrafts = False
+		self.candidatePicker = None
+		self.transcriptWidgets = {}
+		self.widgetPool = []
+		self.liveMsgboxes = []
+		# Last scroll position of the chat box, so that moving the window only happens when the user scrolls to an end
+		self.lastScrollView = (0.0, 1.0)
+		self.transcriptAfterId = None
+		# Callbacks that are scheduled with after() are cancelled when the page is destroyed, so none of them run on a 
+		# page that no longer exists
+		self.scrollAfterId = None
+		self.resizeAfterId = None
 
 		self.setup_ui()
 
@@ -50,10 +99,9 @@ class AIChatPage(ctk.CTkFrame):
 			we're rendering the AI's first response to a user's remixed story, which would be the first message of the chat.
 		3. Using is continuing an unsaved story that isn't a remix.
 		'''
-		# If there have been any unsaved messages, render them 
-		if self.master.unsavedStoryMessages:
-			for messageObj in self.master.unsavedStoryMessages:
-				self.renderChatMessageObj(messageObj)
+		# Render the newest saved and unsaved messages. Older ones are rendered when the user scrolls up to them.
+		self.renderTranscript()
+		self.scrollAfterId = self.after_idle(self.scrollToNewest)
 
 		# if storyGenObj exists, then we have to process a generator that the AI returned
 		# NOTE: In this case, when storyGenObj exists here, that means it was set by the remixStoryPage, 
@@ -61,8 +109,9 @@ class AIChatPage(ctk.CTkFrame):
 		if self.master.storyGenObj:
 			self.processAIChat()
 
-		# call the function once to start the periodic check
-		self.check_length_and_resize()
+		# Size chatEntry to its text, and again whenever the text changes
+		self.chatEntry.bind("<<Modified>>", self.onChatEntryModified)
+		self.resizeChatEntry()
 	
 	def setup_ui(self):
 		innerPageFrame = ctk.CTkFrame(self, fg_color=self.master.theme["sub_clr"])
@@ -74,22 +123,31 @@ class AIChatPage(ctk.CTkFrame):
 
 		# This is where we view the messages sent from the AI and the User
 		self.chatBox = ctk.CTkScrollableFrame(innerPageFrame, fg_color=self.master.theme["main_clr"], width=800, height=400)
+		# NOTE: CTkScrollableFrame doesn't say when it's scrolled, so its canvas' scroll command is wrapped to find out 
+		# when the user reaches either end of the transcript
+		scrollbarSet = self.chatBox._scrollbar.set
+		def onChatBoxScroll(first, last):
+			scrollbarSet(first, last)
+			self.onTranscriptScroll(float(first), float(last))
+		self.chatBox._parent_canvas.configure(yscrollcommand=onChatBoxScroll)
+		self.showOlderBtn = ctk.CTkButton(self.chatBox, text="Show earlier messages", text_color=self.master.theme["btn_text_clr"], fg_color=self.master.theme["btn_clr"], hover_color=self.master.theme["hover_clr"], command=self.showOlderMessages)
+		self.showNewerBtn = ctk.CTkButton(self.chatBox, text="Show newer messages", text_color=self.master.theme["btn_text_clr"], fg_color=self.master.theme["btn_clr"], hover_color=self.master.theme["hover_clr"], command=self.showNewerMessages)
 
 		# Section with all of the input options the user has for the AIChatPage
 		chatInputSection = ctk.CTkFrame(innerPageFrame, fg_color="transparent")
 		self.chatEntry = ctk.CTkTextbox(chatInputSection, height=50, width=600, fg_color=self.master.theme["entry_clr"], text_color=self.master.theme["entry_text_clr"], font=("Helvetica", 16), wrap="word", activate_scrollbars=True)
   
 		try:
-			openSaveStoryBtn_image = ctk.CTkImage(Image.open(os.path.join(self.master.image_path, 'glass_save_btn.png')), size=(50, 50))
+			openSaveStoryBtn_image = self.master.assets.getCTkImage('glass_save_btn.png', (50, 50))
 		except IOError as e:
 			messagebox.showerror("Error", f"Failed to load image: {e}")
 			return
 
 		self.openSaveStoryBtn = ctk.CTkButton(chatInputSection, image=openSaveStoryBtn_image, height=10, width=20, text="Save Story", font=("Helvetica", 16, "bold"), text_color=self.master.theme["btn_text_clr"], fg_color='transparent', hover_color=self.master.theme["hover_clr"], command=lambda: self.master.openPage("saveStoryPage"))
 		
-		sendChatBtn_image = ctk.CTkImage(Image.open(os.path.join(self.master.image_path, 'glass_send_btn.png')),
-				size=(50, 50))
+		sendChatBtn_image = self.master.assets.getCTkImage('glass_send_btn.png', (50, 50))
 		self.sendChatBtn = ctk.CTkButton(chatInputSection, corner_radius=0, image=sendChatBtn_image, height=10, width=20, text="Send", font=("Helvetica", 16, "bold"), text_color=self.master.theme["btn_text_clr"], fg_color='transparent', hover_color=self.master.theme["hover_clr"], hover=True, anchor="e", command=self.processUserChat)
+		self.stopChatBtn = ctk.CTkButton(chatInputSection, text="Stop", height=10, width=20, font=("Helvetica", 16, "bold"), text_color=self.master.theme["btn_text_clr"], fg_color=self.master.theme["btn_clr"], hover_color=self.master.theme["hover_clr"], state="disabled", command=self.cancelAIChat)
 	
 		# Structure and style widgets accordingly
 		header.grid(row=0, column=0, pady=10)
@@ -101,20 +159,116 @@ class AIChatPage(ctk.CTkFrame):
 		self.chatEntry.grid(row=0, column=0, padx=10, pady=5)
 		self.sendChatBtn.grid(row=0, column=1, padx=5)
 		self.openSaveStoryBtn.grid(row=0, column=2, padx=5)
+		self.stopChatBtn.grid(row=0, column=3, padx=5)
   
 		if self.master.isSavedStory: 
-			# Render saved messages associated with the current story
-			for messageObj in self.master.currentStory.messages:
-				self.renderChatMessageObj(messageObj)
+			# Only the newest page of the saved story's messages is loaded now, followed by the unsaved ones
+			savedMessages = self.loadOlderMessages(None, self.transcriptWindowSize)
+			hasOlderMessages = len(savedMessages) == self.transcriptWindowSize
+			self.transcript = TranscriptWindow(savedMessages + self.master.unsavedStoryMessages, self.loadOlderMessages if hasOlderMessages else None, self.transcriptWindowSize)
 			storyStateMessage.configure(text=f"Currently continuing '{self.master.currentStory.storyTitle}'!")
 		elif self.master.isRemixedStory: 
 			storyStateMessage.configure(text=f"Currently writing a remix based on '{self.master.currentStory.storyTitle}'!")
 		else:
 			storyStateMessage.configure(text=f"Currently continuing writing a new story!")
+		if not self.master.isSavedStory:
+			self.transcript = TranscriptWindow(self.master.unsavedStoryMessages, None, self.transcriptWindowSize)
  
-	def renderChatMessageObj(self, messageObj):
+	def loadOlderMessages(self, oldestMessage, count):
+		'''
+		- Returns up to `count` messages of the saved story that come before oldestMessage (or the newest ones if it's None), oldest first
+		'''
+		# Served by the (storyID, position) index, so only `count` rows are read however long the story is
+		return self.master.dataAccess.loadMessagesBefore(self.master.currentStory.id, oldestMessage.position if oldestMessage is not None else None, count)
+
+	def renderTranscript(self):
+		'''
+		- Gives every message in the transcript's window a message box, in order. Boxes of messages that left the window are 
+			hidden and reused, so the number of widgets stays the same however long the story gets.
 		'''
-		- Renders messageObj as chat messages on the screen
+		visibleMessages = self.transcript.visibleMessages()
+		visibleSet = set(visibleMessages)
+		for messageObj in list(self.transcriptWidgets):
+			if messageObj not in visibleSet:
+				msgbox = self.transcriptWidgets.pop(messageObj)
+				msgbox.grid_remove()
+				self.widgetPool.append(msgbox)
+
+		for row, messageObj in enumerate(visibleMessages, start=1):
+			msgbox = self.transcriptWidgets.get(messageObj)
+			if msgbox is None:
+				msgbox = self.widgetPool.pop() if self.widgetPool else self.createMsgBox()
+				self.renderChatMessageObj(messageObj, msgbox)
+				self.transcriptWidgets[messageObj] = msgbox
+			msgbox.grid(row=row, column=0, padx=5, pady=5, sticky="nsew")
+
+		if self.transcript.hasOlder():
+			self.showOlderBtn.grid(row=0, column=0, pady=5)
+		else:
+			self.showOlderBtn.grid_remove()
+		if self.transcript.hasNewer():
+			self.showNewerBtn.grid(row=len(visibleMessages) + 1, column=0, pady=5)
+		else:
+			self.showNewerBtn.grid_remove()
+
+	def onTranscriptScroll(self, first, last):
+		'''
+		- Moves the transcript's window when the user scrolls to the top or the bottom of the chat box
+		'''
+		previousFirst, previousLast = self.lastScrollView
+		self.lastScrollView = (first, last)
+		if self.transcriptAfterId or (first, last) == (0.0, 1.0):
+			return
+		if first <= 0.0 < previousFirst and self.transcript.hasOlder():
+			self.transcriptAfterId = self.after_idle(self.showOlderMessages)
+		elif last >= 1.0 > previousLast and self.transcript.hasNewer():
+			self.transcriptAfterId = self.after_idle(self.showNewerMessages)
+
+	def showOlderMessages(self):
+		self.transcriptAfterId = None
+		visibleMessages = self.transcript.visibleMessages()
+		anchor = self.transcriptWidgets.get(visibleMessages[0]) if visibleMessages else None
+		hasMoved = self.transcript.scrollUp()
+		# NOTE: Rendered even if the window didn't move, since that's how the button learns there's nothing older
+		self.renderTranscript()
+		if hasMoved:
+			self.scrollToWidget(anchor, alignBottom=False)
+
+	def showNewerMessages(self):
+		self.transcriptAfterId = None
+		visibleMessages = self.transcript.visibleMessages()
+		anchor = self.transcriptWidgets.get(visibleMessages[-1]) if visibleMessages else None
+		if self.transcript.scrollDown():
+			self.renderTranscript()
+			self.scrollToWidget(anchor, alignBottom=True)
+
+	def scrollToWidget(self, msgbox, alignBottom):
+		'''
+		- Keeps msgbox where the user was looking after the window moved, so the chat box doesn't jump to a different message
+		'''
+		if msgbox is None:
+			return
+		self.chatBox.update_idletasks()
+		canvas = self.chatBox._parent_canvas
+		contentHeight = max(1, self.chatBox.winfo_height())
+		top = msgbox.winfo_y()
+		if alignBottom:
+			top = top + msgbox.winfo_height() - canvas.winfo_height()
+		canvas.yview_moveto(max(0.0, top / contentHeight))
+
+	def addTranscriptMessage(self, messageObj, msgbox=None):
+		'''
+		- Adds a new message at the end of the transcript and shows it. msgbox is the box it's already rendered in, if any.
+		'''
+		self.transcript.showNewest()
+		self.transcript.append(messageObj)
+		if msgbox is not None:
+			self.transcriptWidgets[messageObj] = msgbox
+		self.renderTranscript()
+
+	def renderChatMessageObj(self, messageObj, msgbox):
+		'''
+		- Renders messageObj as a chat message into msgbox, replacing whatever message it showed before
 		- NOTE: Only good for rendering saved, unsaved, and user chats because those are easily in message object form.
 			For rendering AI's response, it's a generator so use processAIChat(self).
 		'''
@@ -127,25 +281,48 @@ class AIChatPage(ctk.CTkFrame):
 		else:
 			messageText = f"{self.master.loggedInUser.username}: " + messageText 
 
-		# access the last msgbox to print to
-		msgbox = self.drawMsgBox()
+		msgbox.configure(state="normal")
+		msgbox.delete("1.0", "end")
 		msgbox.insert("1.0", messageText)
 
 		# Calculate the required height of the message
-		height = self.expandEntryBox(msgLength=messageText)
+		height = min(self.expandEntryBox(msgLength=messageText), self.max_msgbox_height)
 		# Now we use the calculated `height` parameter to set the height of the msgbox
-		print('height=', height)
-		msgbox.configure(height=height)
-
-    # Check for the length of text in the entry field and adjust entry field height accordingly
-	def check_length_and_resize(self):
-		# get the text in the CTkTextbox
-		if self.chatEntry_height <= self.max_chatEntry_height:
-			new_height=self.expandEntryBox(self.chatEntry.get('1.0', 'end'))
-			self.chatEntry.configure(height=new_height)
-
-		# schedule the next check in 5000 milliseconds (1 second)
-		self.after(2000, self.check_length_and_resize)
+		msgbox.configure(height=height, state="disabled")
+
+	def scrollToNewest(self):
+		self.scrollAfterId = None
+		self.chatBox._parent_canvas.yview_moveto(1.0)
+
+	def onChatEntryModified(self, event=None):
+		'''
+		- Called by tkinter when the text in chatEntry changes, whether it's typed, pasted or deleted
+		1. Tkinter only sends <<Modified>> again once the modified flag is reset, so reset it. Resetting it sends 
+			<<Modified>> too, which is ignored since the flag is off.
+		2. Resize once the pending key presses are handled, so that typing quickly only resizes once
+		'''
+		# 1
+		if not self.chatEntry.edit_modified():
+			return
+		self.chatEntry.edit_modified(False)
+		# 2
+		if not self.resizeAfterId:
+			self.resizeAfterId = self.after_idle(self.resizeChatEntry)
+
+	def resizeChatEntry(self):
+		'''
+		- Adjusts the height of chatEntry to the length of its text. Tkinter counts the characters, so the text itself 
+			is never copied out of the widget, and the height is only changed when the number of lines changes.
+		'''
+		self.resizeAfterId = None
+		charCount = self.chatEntry._textbox.count("1.0", "end-1c", "chars")
+		charCount = charCount[0] if charCount else 0
+		# Calculate the number of lines at 100 characters per line of text onscreen, with room for at least one line
+		lineCount = max(1, -(-charCount // 100))
+		if lineCount == self.chatEntryLineCount:
+			return
+		self.chatEntryLineCount = lineCount
+		self.chatEntry.configure(height=min(lineCount * 30, self.max_chatEntry_height))
 		
 	def processUserChat(self):
 		'''
@@ -162,8 +339,9 @@ class AIChatPage(ctk.CTkFrame):
 		# The .strip() method ensures that a user cannot type whitespaces 
 		# before the message content which has been known to cause an openAI api exception
 		userMessage = Message(text=self.chatEntry.get('1.0', 'end').strip(), isAISender=False)
-		self.renderChatMessageObj(userMessage)
 		self.master.unsavedStoryMessages.append(userMessage) 	
+		self.autosaveMessage(userMessage)
+		self.addTranscriptMessage(userMessage)
 		
 		# Clear entry widget when user sends a message
 		self.chatEntry.delete(1.0, "end")
@@ -174,10 +352,19 @@ class AIChatPage(ctk.CTkFrame):
 		# Process and render AI's message
 		self.processAIChat()
 
+	def createMsgBox(self):
+		return ctk.CTkTextbox(self.chatBox, fg_color=self.master.theme["entry_clr"], font=("Helvetica", 16), width=750, height=20, wrap="word", activate_scrollbars=False)
+
 	def drawMsgBox(self):
-		msgbox = ctk.CTkTextbox(self.chatBox, fg_color=self.master.theme["entry_clr"], font=("Helvetica", 16), width=750, height=20, wrap="word", activate_scrollbars=False)
-		msgbox.grid(row=len(self.master.msgboxes), column=0, padx=5, pady=5, sticky="nsew")
-		self.master.msgboxes.append(msgbox)
+		'''
+		- Draws a message box for the AI's response that's being generated, below the transcript
+		'''
+		msgbox = self.widgetPool.pop() if self.widgetPool else self.createMsgBox()
+		msgbox.configure(state="normal", height=20)
+		msgbox.delete("1.0", "end")
+		# Rows after the transcript's window (and the "Show newer messages" button) are free for the response
+		msgbox.grid(row=self.transcriptWindowSize + 2 + len(self.liveMsgboxes), column=0, padx=5, pady=5, sticky="nsew")
+		self.liveMsgboxes.append(msgbox)
 		return msgbox
 
 	def expandEntryBox(self, msgLength):
@@ -200,13 +387,14 @@ class AIChatPage(ctk.CTkFrame):
 		1. Enable and disable certain parts of the UI, preventing the user from sending another 
 			message to the AI until the first one is finished. Also prevent the user from being 
 			able to redirect themselves to other pages, so that they don't lose their AI generated message.
-		2. Renders chunks of the messages as they're being obtained from openai. 
-		3. Save the ai's generated message to unsavedStoryMessages so that we can keep track of it
+		2. Start a background worker that iterates storyGenObj, so that the window stays responsive while 
+			we're waiting on openai. The chunks are rendered by pollAIChat as they arrive.
 		'''
 
 		# Access the current messagebox at it's index
 		# Disable send chat button as user can't send another chat until the ai is finished
 		self.sendChatBtn.configure(state="disabled")		
+		self.stopChatBtn.configure(state="normal")
 
 		# Ensure user can't navigate to other pages while AI is generating message
 		self.master.sidebar.disableSidebarButtons()
@@ -215,55 +403,191 @@ class AIChatPage(ctk.CTkFrame):
 		# Update page status message to indicate that AI is currently generating a message 
 		self.pageStatusMessage.configure(text="Please wait here until StoryBot is finished!")
 		
-		# Message object that contains the text from the generator
-		messageObj = Message(text="", isAISender=True) 
-		chunkIndex = 0
+		# The response is drawn right below the newest messages
+		if self.transcript.hasNewer():
+			self.transcript.showNewest()
+			self.renderTranscript()
 
-		
-		# Create a new real-time dynamically resizing msg bubble to display AI response in
-		msgbox = self.drawMsgBox()
-		# Make the chat box writable
-		msgbox.configure(state="normal")
+		# NOTE: With several drafts the generator yields (index, chunk) tuples, and every draft gets its own msg bubble
+		candidateCount = self.master.storyGPT.candidate_count
+		self.isWritingDrafts = candidateCount > 1
+		self.chunkRenderers = []
+		for index in range(candidateCount):
+			prefix = f'Story Bot (Draft {index + 1}): ' if self.isWritingDrafts else 'Story Bot: '
+			# Create a new real-time dynamically resizing msg bubble to display AI response in
+			msgbox = self.drawMsgBox()
+			# Make the chat box writable
+			msgbox.configure(state="normal")
+			msgbox.insert('end', prefix)
+			# Message object that contains the text from the generator
+			messageObj = Message(text="", isAISender=True)
+			self.chunkRenderers.append(ChunkRenderer(msgbox, messageObj, prefix, self.max_msgbox_height))
+		self.aiMsgbox = self.chunkRenderers[0].msgbox
+		self.aiMessageObj = self.chunkRenderers[0].messageObj
+
+		# Time spent rendering the response, so UI stalls can be told apart from a slow network
+		self.renderMetrics = RenderMetrics()
+		self.generationWorker = GenerationWorker(self.master.storyGenObj, onCancel=self.master.storyGPT.abort).start()
+		self.pollAfterId = self.after(self.pollInterval, self.pollAIChat)
 
-		msgbox.insert('end', 'Story Bot: ')
-		for chunk in self.master.storyGenObj: 
-			if any(chunk.endswith(char) for char in ['.', '?', '!']):
-				punct_marks = ['.', '?', '!']
-				for mark in punct_marks:
-					if chunk.endswith(f'{mark}'):
-						msgbox.insert('end', f"{mark}" + " ")
+	def pollAIChat(self):
+		'''
+		- Runs once per frame. Buffers every chunk that the generation worker has queued since the last frame, and renders 
+			them with one insert per message box. Once the worker reports that it's finished, the message is finalized instead.
+		'''
+		self.pollAfterId = None
+		renderStart = time.perf_counter()
+		finalEvent = None
+		for eventType, value in self.generationWorker.drain():
+			if eventType != GenerationWorker.CHUNK:
+				finalEvent = (eventType, value)
+				break
+			if self.isWritingDrafts:
+				index, chunk = value
+				self.chunkRenderers[index].add(chunk)
 			else:
-				msgbox.insert('end', chunk)
-			
-			# Enables smooth real time typing
-			if (self.msgbox_height <= self.max_msgbox_height):
-					new_height=self.expandEntryBox(msgbox.get('1.0', 'end'))
-					self.msgbox_height = new_height
-
-			# Dynamically resize the height of the current msgbox
-			msgbox.update()
-			msgbox.configure(height=self.msgbox_height)
-			self.update_idletasks()
-			# add the chunk onto the message object's text since we want to keep track of this message; then increment chunkIndex
-			messageObj.text += chunk
-			chunkIndex += 1
-
-		#reset the msgbox height after each message
-		self.msgbox_height=30
+				self.chunkRenderers[0].add(value)
+		renderedChunks = sum(renderer.flush() for renderer in self.chunkRenderers)
+		self.renderMetrics.recordRender(renderedChunks, time.perf_counter() - renderStart)
+
+		if finalEvent is None:
+			self.pollAfterId = self.after(self.pollInterval, self.pollAIChat)
+			return
+		eventType, value = finalEvent
+		statusMessage = f"StoryBot ran into an error: {value}" if eventType == GenerationWorker.ERROR else None
+		if self.isWritingDrafts and any(self.master.storyGPT.candidates or []):
+			self.showCandidatePicker(statusMessage=statusMessage, renderStatus=eventType)
+		elif self.isWritingDrafts:
+			# Every draft failed, so there's nothing to pick from
+			self.chooseCandidate(0, statusMessage=statusMessage, renderStatus=eventType)
+		elif statusMessage:
+			self.finishAIChat(statusMessage=statusMessage, renderStatus=eventType)
+		else:
+			self.finishAIChat(renderStatus=eventType)
+
+	def cancelAIChat(self):
+		'''
+		- Stops the AI's response that's currently being generated. The text that was already generated is kept.
+		'''
+		if self.generationWorker:
+			self.stopChatBtn.configure(state="disabled")
+			self.pageStatusMessage.configure(text="Stopping StoryBot...")
+			self.generationWorker.cancel()
+
+	def showCandidatePicker(self, statusMessage=None, renderStatus=GenerationWorker.DONE):
+		'''
+		- Once the drafts are finished (or stopped), shows a button for keeping each draft that has any text. 
+			The user can't send another message or leave the page until they've picked one.
+		'''
+		self.recordRenderMetrics(renderStatus)
+		self.master.storyGenObj = None
+		self.generationWorker = None
+		self.stopChatBtn.configure(state="disabled")
+
+		self.candidatePicker = ctk.CTkFrame(self.chatBox, fg_color="transparent")
+		self.candidatePicker.grid(row=self.transcriptWindowSize + 2 + len(self.liveMsgboxes), column=0, pady=5)
+		for index in range(len(self.chunkRenderers)):
+			if not self.master.storyGPT.candidates[index]:
+				continue
+			keepDraftBtn = ctk.CTkButton(self.candidatePicker, text=f"Keep Draft {index + 1}", font=("Helvetica", 16, "bold"), text_color=self.master.theme["btn_text_clr"], fg_color=self.master.theme["btn_clr"], hover_color=self.master.theme["hover_clr"], command=lambda index=index: self.chooseCandidate(index))
+			keepDraftBtn.grid(row=0, column=index, padx=5)
+		self.pageStatusMessage.configure(text=statusMessage or "Pick the draft you'd like to keep!")
+
+	def chooseCandidate(self, index, statusMessage=None, renderStatus=GenerationWorker.DONE):
+		'''
+		- Keeps draft `index` as the AI's response, both on the page and in storyGPT's chat history, and removes the other drafts
+		'''
+		if self.candidatePicker:
+			self.candidatePicker.destroy()
+			self.candidatePicker = None
+		for candidateIndex, renderer in enumerate(self.chunkRenderers):
+			if candidateIndex != index:
+				self.liveMsgboxes.remove(renderer.msgbox)
+				renderer.msgbox.grid_remove()
+				self.widgetPool.append(renderer.msgbox)
+		self.chunkRenderers = [self.chunkRenderers[index]]
+		self.isWritingDrafts = False
+		self.aiMsgbox = self.chunkRenderers[0].msgbox
+		self.aiMessageObj = self.chunkRenderers[0].messageObj
+		self.aiMessageObj.text = self.master.storyGPT.chooseCandidate(index)
+		if statusMessage:
+			self.finishAIChat(statusMessage=statusMessage, renderStatus=renderStatus)
+		else:
+			self.finishAIChat(renderStatus=renderStatus)
+
+	def recordRenderMetrics(self, renderStatus):
+		'''
+		- Ends the render timings of the current response and records them to storyGPT's metrics sink
+		'''
+		if self.renderMetrics.status is not None:
+			return
+		self.renderMetrics.finish(renderStatus)
+		metricsSink = self.master.storyGPT.metricsSink
+		if metricsSink:
+			try:
+				metricsSink.record(self.renderMetrics)
+			except Exception as e:
+				print(f"Couldn't record metrics: {e}")
+
+	def autosaveMessage(self, messageObj):
+		'''
+		- Queues a finished message to be written to the user's draft. When a saved story is being continued, the draft 
+			remembers it, so the chat is restored into that story if the app closes before it's saved.
+		'''
+		storyID = self.master.currentStory.id if self.master.isSavedStory else None
+		self.master.autosave.addMessage(self.master.loggedInUser.id, messageObj, storyID)
+
+	def finishAIChat(self, statusMessage="StoryBot is currently waiting for your input.", renderStatus=GenerationWorker.DONE):
+		'''
+		- Saves the AI's generated message and gives control of the page back to the user.
+		- renderStatus: How the response ended (one of the GenerationWorker events), recorded with the render metrics
+		'''
+		self.recordRenderMetrics(renderStatus)
+
+		msgbox = self.aiMsgbox
+		self.chunkRenderers = []
+		# Make chatbox read only
+		msgbox.configure(state="disabled")
 			
 		# AI response processing is done, so append message object and variables related to processing a message
-		self.master.unsavedStoryMessages.append(messageObj) 
+		# NOTE: The response's message box becomes the transcript's box for the message, so it's moved up into the transcript
+		# A response that failed or was cancelled before any text arrived isn't kept, so no empty message is saved
+		hasText = bool(self.aiMessageObj.text.strip())
+		if hasText:
+			self.master.unsavedStoryMessages.append(self.aiMessageObj) 
+			self.autosaveMessage(self.aiMessageObj)
+			self.addTranscriptMessage(self.aiMessageObj, msgbox)
+		else:
+			msgbox.grid_remove()
+			self.widgetPool.append(msgbox)
+		self.liveMsgboxes = []
 		self.master.storyGenObj = None 
+		self.generationWorker = None
 
-		# Scroll to bottom and make chatbox read only
-		# This allows the user to view the latest text
+		# Scroll to bottom. This allows the user to view the latest text
 		msgbox.see("end-1c")
-		msgbox.configure(state="disabled")
+		self.chatBox._parent_canvas.yview_moveto(1.0)
 
 		# Allow the user to send another message and navigate to other pages
 		self.openSaveStoryBtn.configure(state="normal")
 		self.sendChatBtn.configure(state="normal")
+		self.stopChatBtn.configure(state="disabled")
 		self.master.sidebar.updateSidebar() 
 
 		# Update the page status message to indicate the ai is done
-		self.pageStatusMessage.configure(text="StoryBot is currently waiting for your input.")
\ No newline at end of file
+		self.pageStatusMessage.configure(text=statusMessage)
+
+		# While the user reads the response, get a head start on the next part of the story (if that's turned on)
+		if renderStatus == GenerationWorker.DONE and hasText:
+			self.master.storyGPT.speculateContinuation()
+
+	def destroy(self):
+		# Don't leave a worker generating text for a page that no longer exists
+		if self.generationWorker:
+			self.generationWorker.cancel()
+		# NOTE: If the user never picked a draft, storyGPT keeps the first one the next time it's prompted
+		self.master.storyGPT.cancelSpeculation()
+		for afterId in (self.pollAfterId, self.transcriptAfterId, self.scrollAfterId, self.resizeAfterId):
+			if afterId:
+				self.after_cancel(afterId)
+		super().destroy()
@@ -16,6 +16,9 @@ Attributes/Variables:
 - sliderVar (tk.IntVar): Variable that stores the numerical value of the slider.
 - sliderLabel(CTkLabel): Label corresponding to 'slider'.
 - slider (CTkSlider): A tkinter slider object that is displayed on screen.
+- draftsSlider (CTkSlider): Number of drafts StoryBot writes at the same time for every message, so the user can keep the one they like best.
+- prefetchCheckBox (CTkCheckBox): Whether StoryBot starts writing the next part of the story while the user is reading, 
+	so that asking it to continue is instant.
 - formBtnsSection (CTkFrame): Frame that contains all of the buttons on the form.
 - restoreSettingsBtn (CTkButton): Button that restores the settings sliders on the form to reflect the AI's current settings.
 - changeSettingsBtn (CTkButton): Applies changes to the AI's settings configurations.
@@ -23,6 +26,7 @@ Attributes/Variables:
 Methods:
 - restoreAISettings(self): Restores sliders for the AI settings page to the values that are 
 	currently set on the AI.
+- refresh(self, state): Called when the kept page is opened again. Throws away unconfirmed changes and shows the AI's current settings.
 - changeAISettings(self): Applies changes to the AI class instance in the 'App' class
 '''
 # Ai settings page frame
@@ -70,6 +74,18 @@ class AISettingsPage(ctk.CTkFrame):
         # Insert/render the AI's current response/writing style
         self.responseStyleBox.insert("1.0", self.master.storyGPT.response_style)
 
+        # Drafts per response slider and label
+        self.draftsSliderLabel = ctk.CTkLabel(innerAISettingsFrame, text=f'Drafts Per Response: {self.master.storyGPT.candidate_count}', text_color=self.master.theme["label_clr"], font=("Helvetica", 16))
+        self.draftsSliderLabel.grid(row=5, column=0, padx=(10, 10), pady=(10, 0))
+        self.draftsSlider = ctk.CTkSlider(innerAISettingsFrame, from_=1, to=3, number_of_steps=2, command=lambda value: self.draftsSliderLabel.configure(text=f'Drafts Per Response: {int(value)}'))
+        self.draftsSlider.grid(row=6, column=0, padx=(10, 10), pady=(10, 10))
+        self.draftsSlider.set(self.master.storyGPT.candidate_count)
+
+        self.prefetchCheckBox = ctk.CTkCheckBox(innerAISettingsFrame, text="Write ahead while I'm reading", text_color=self.master.theme["label_clr"], font=("Helvetica", 16))
+        self.prefetchCheckBox.grid(row=7, column=0, padx=(10, 10), pady=(0, 10))
+        if self.master.storyGPT.speculative_prefetch:
+            self.prefetchCheckBox.select()
+
         # Create the form buttons
         formBtnsSection = ctk.CTkFrame(innerAISettingsFrame, fg_color="transparent")
         restoreSettingsBtn = ctk.CTkButton(formBtnsSection, text="Restore Settings",  text_color=self.master.theme[
@@ -77,7 +93,7 @@ class AISettingsPage(ctk.CTkFrame):
         self.changeSettingsBtn = ctk.CTkButton(formBtnsSection, text="Confirm Changes",  text_color=self.master.theme[
                                           "btn_text_clr"], fg_color=self.master.theme["btn_clr"], hover_color=self.master.theme["hover_clr"], command=lambda: self.applyAISettings(self.aiSettings))
 
-        formBtnsSection.grid(row=5, column=0, pady=10)
+        formBtnsSection.grid(row=8, column=0, pady=10)
         restoreSettingsBtn.grid(row=0, column=1, padx=10)
         self.changeSettingsBtn.grid(row=0, column=2, padx=10)
 
@@ -128,6 +144,8 @@ class AISettingsPage(ctk.CTkFrame):
 
     def applyAISettings(self, settingsObj):
         self.checkConditions()
+        self.master.storyGPT.candidate_count = int(self.draftsSlider.get())
+        self.master.storyGPT.speculative_prefetch = bool(self.prefetchCheckBox.get())
     # Access the settings object's values and set them to the AI's attributes
         self.master.storyGPT.temperature = settingsObj["temp"]
         self.master.storyGPT.top_p = settingsObj["top_p"]
@@ -143,9 +161,22 @@ class AISettingsPage(ctk.CTkFrame):
             messagebox.showinfo('Success', 'Changes saved successfully!')
             print('responseStyle=', self.master.storyGPT.response_style)
 
+    def refresh(self, state):
+        self.temp_mode = self.master.currentMode
+        self.temp_modekey = self.master.currentModeKey
+        self.aiSettings = []
+        self.restoreSettings()
+        return True
+
     def restoreSettings(self):
         self.aiModeSlider.set(self.master.currentModeKey)
         self.aiModeSliderLabel.configure(text=f'Conversation Style: \n {self.master.currentMode}')
+        self.draftsSlider.set(self.master.storyGPT.candidate_count)
+        self.draftsSliderLabel.configure(text=f'Drafts Per Response: {self.master.storyGPT.candidate_count}')
+        if self.master.storyGPT.speculative_prefetch:
+            self.prefetchCheckBox.select()
+        else:
+            self.prefetchCheckBox.deselect()
         # First clear the responseStyleBox, and then insert in the ai's current response style
         self.responseStyleBox.delete("1.0", "end-1c")		
         self.responseStyleBox.insert("1.0", self.master.storyGPT.response_style)
@@ -3,7 +3,6 @@ import hashlib
 import sys
 sys.path.append("..")
 from classes.utilities import clearEntryWidgets, isEmptyEntryWidgets, isValidPassword, toggleHidden
-from classes.models import User
 '''
 + changePasswordPage: Page where the user can change the password of their account
 
@@ -116,7 +115,7 @@ class changePasswordPage(ctk.CTkFrame):
 		
 		# User can only change the password of the account that they're currently logged into.
 		# So query in the user's table for a matching username, and a matching password hash
-		retrievedUser = self.master.session.query(User).filter_by(username=self.master.loggedInUser.username, passwordHash=oldPasswordHash).first() 
+		retrievedUser = self.master.dataAccess.findUser(self.master.loggedInUser.username, oldPasswordHash)
 		
 		# If we didn't find a user with the current usernmae and password hash to current password, then they had to have gotten the password input wrong
 		if not retrievedUser:
@@ -124,9 +123,7 @@ class changePasswordPage(ctk.CTkFrame):
 			return
 		
 		# Save new password to user and commit it to the database
-		retrievedUser.passwordHash = hashlib.md5(newPassword.encode("utf-8")).hexdigest()
-		self.master.session.commit() 
-		self.master.session.close() 
+		self.master.dataAccess.updateUser(retrievedUser.id, passwordHash=hashlib.md5(newPassword.encode("utf-8")).hexdigest())
 
 		# After a password is changed we log out our user
 		self.master.userSessionManager.logoutUser() 
@@ -80,8 +80,7 @@ class deleteAccountPage(ctk.CTkFrame):
 		'''
 		if self.master.loggedInUser.username == username and self.master.loggedInUser.passwordHash == passwordHash: 
 			# Delete the logged in user from the database and save those changes
-			self.master.session.delete(self.master.loggedInUser) 
-			self.master.session.commit() 
+			self.master.dataAccess.deleteUser(self.master.loggedInUser.id)
 			# We can safely do the logout process on the user now, since their account does not exist anymore
 			self.master.userSessionManager.logoutUser() 
 		else:
@@ -2,7 +2,6 @@ import customtkinter as ctk
 import sys
 sys.path.append("..")
 from classes.utilities import *
-from classes.models import User
 
 
 ###### The page for editting accounts #####
@@ -104,22 +103,18 @@ class editAccountPage(ctk.CTkFrame):
 			Case 1: This could mean, a different user from the logged in user has the username
 			Case 2: The currently logged in user kept their current username in the username entry field.
 			So the retrievedUser is just a record of the currently logged in user. In this case, we want 
-			to let the form go through. By putting "and self.master.loggedInUser != retrievedUser", we're making 
+			to let the form go through. By putting "and self.master.loggedInUser.id != retrievedUser.id", we're making 
 			sure that a different user from the currently logged in user already has the username that they entered.
 			As a result, the user is able to submit the form when they don't change their username, and the system
 			correctly detects when a separate user has their inputted username
 		'''
-		retrievedUser = self.master.session.query(User).filter_by(username=username).first() 
-		if retrievedUser and (self.master.loggedInUser != retrievedUser): 
+		retrievedUser = self.master.dataAccess.findUser(username)
+		if retrievedUser and (self.master.loggedInUser.id != retrievedUser.id): 
 			self.formErrorMessage.configure(text="Username is already taken!")
 			return
 		
 		# All form checks passed, so apply changes
-		self.master.loggedInUser.username = username 
-		self.master.loggedInUser.email = email 
-		self.master.loggedInUser.firstName = firstName 
-		self.master.loggedInUser.lastName = lastName 
-		self.master.session.commit() 
+		self.master.loggedInUser = self.master.dataAccess.updateUser(self.master.loggedInUser.id, username=username, email=email, firstName=firstName, lastName=lastName)
 
 		# Then redirect user to the account page, so that they can see their changes
 		self.master.openPage("userAccountPage") 
\ No newline at end of file
@@ -2,7 +2,6 @@ from tkinter import messagebox
 import customtkinter as ctk
 import tkinter as tk
 from tkinter import filedialog  # Import filedialog
-from PIL import Image, ImageTk
 import os		
 
 # Now when pathing, we are in a directory above. This lets us more easily 
@@ -61,8 +60,8 @@ class editAvatarPage(ctk.CTkFrame):
 	# Loads the current image onto the screen  
 	def loadCurrentImage(self):
 		try:
-			imagePath = f"{self.imageFolderPath}{self.imageList[self.imageIndex]}"
-			newImage = ImageTk.PhotoImage(Image.open(imagePath).resize((300, 300)))
+			imagePath = f"profile_pics/{self.imageList[self.imageIndex]}"
+			newImage = self.master.assets.getPhotoImage(imagePath, (300, 300))
 			self.imageLabel.configure(image=newImage)
 			self.imageLabel.image = newImage
    
@@ -94,7 +93,7 @@ class editAvatarPage(ctk.CTkFrame):
 			self.loadImageFromFile(file_path)
 
 	def loadImageFromFile(self, file_path):
-		newImage = ImageTk.PhotoImage(Image.open(file_path).resize((300, 300)))
+		newImage = self.master.assets.getPhotoImage(file_path, (300, 300))
 		self.imageLabel.configure(image=newImage)
 		self.imageLabel.image = newImage
 
@@ -103,8 +102,7 @@ class editAvatarPage(ctk.CTkFrame):
 	# Changes the avatar of the currently logged in user
 	def changeAvatar(self):
 		# Update the avatar attribute with the image's file name, and persist that change to the database
-		self.master.loggedInUser.avatar = self.currentImageFileName 
-		self.master.session.commit() # type: ignore
+		self.master.loggedInUser = self.master.dataAccess.updateUser(self.master.loggedInUser.id, avatar=self.currentImageFileName) # type: ignore
 
 		# Redirect the user to the account page to make sure they see their changess
 		self.master.openPage("userAccountPage") 
\ No newline at end of file
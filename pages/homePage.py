@@ -1,6 +1,4 @@
 import customtkinter as ctk
-from PIL import Image # Import python image library for the button images
-import os
 '''
 + homePage: Frame that represents the home page of the application. Here the user can choose to start a new story/chat, 
 	or continue the story that they were most recently on.
@@ -16,6 +14,7 @@ Attributes/Variables:
 	and redirects them to the AIChatPage
 
 Methods: 
+- refresh(self, state): Called when the kept home page is opened again. Nothing on it depends on the state of the application.
 - startNewStory: Redirects user to the AIChatPage, wipes out previous story information such as unsaved messages,
 	and as a result let's them start a new story.
 '''
@@ -30,10 +29,10 @@ class homePage(ctk.CTkFrame):
 		pageHeading = ctk.CTkLabel(pageHeader, text="Home", text_color=self.master.theme["label_clr"], font=("Helvetica", 32))
 
 		pageBtnsSection = ctk.CTkFrame(innerPageFrame, fg_color="transparent")
-		newStoryBtn_img = ctk.CTkImage(Image.open(os.path.join(self.master.image_path, "glass_addStoryBtn.png")),size=(150, 150))
+		newStoryBtn_img = self.master.assets.getCTkImage("glass_addStoryBtn.png", (150, 150))
 		newStoryBtn = ctk.CTkButton(pageBtnsSection, image=newStoryBtn_img, text=" ", height=40, width=40, fg_color=self.master.theme["btn_clr"], hover_color=self.master.theme["hover_clr"], command=self.startNewStory)
 		newStoryBtn_lbl = ctk.CTkLabel(pageBtnsSection, font=("Helvetica", 24), text="New Story", text_color=self.master.theme["btn_text_clr"])
-		continuePrevStoryBtn_img = ctk.CTkImage(Image.open(os.path.join(self.master.image_path, "glass_prevStoryBtn.png")),size=(150, 150))
+		continuePrevStoryBtn_img = self.master.assets.getCTkImage("glass_prevStoryBtn.png", (150, 150))
 		continuePrevStoryBtn = ctk.CTkButton(pageBtnsSection, image=continuePrevStoryBtn_img, text=" ", height=40, width=40, fg_color=self.master.theme["btn_clr"], hover_color=self.master.theme["hover_clr"], command=lambda: self.master.openPage("AIChatPage")) 
 		continuePrevStoryBtn_lbl = ctk.CTkLabel(pageBtnsSection, font=("Helvetica", 24), text="Continue Story", text_color=self.master.theme["btn_text_clr"])
 		innerPageFrame.pack(expand=True)
@@ -47,11 +46,14 @@ class homePage(ctk.CTkFrame):
 		continuePrevStoryBtn_lbl.grid(row=2, column=1, padx=20, pady=20)
 
 
+	def refresh(self, state):
+		return True
+
 	# Starts a new chat, so that user can write a new story
 	def startNewStory(self):
 		# Clear previous chat messages and wipe story data since the user is starting a brand new slate
 		self.master.unsavedStoryMessages = [] 
-		self.master.msgboxes = [] 
+		self.master.autosave.discard(self.master.loggedInUser.id)
 		self.master.currentStory = None 
 		self.master.isSavedStory = False 
 		self.master.isRemixedStory = False 
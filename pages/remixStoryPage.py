@@ -1,7 +1,6 @@
 import customtkinter as ctk
 import sys
 sys.path.append("..")
-from classes.models import Message
 from tkinter import messagebox
 
 '''
@@ -85,12 +84,12 @@ class remixStoryPage(ctk.CTkFrame):
 		# They are also starting a new chat, so we should remove all old unsaved story messages
 		# Also clear AI of any past knowledge, they should only know about the inputted story and its twist
 		self.master.unsavedStoryMessages = [] 
+		self.master.autosave.discard(self.master.loggedInUser.id)
 		self.master.storyGPT.clear() 
 		messagebox.showinfo('Remix Loading', f'Please wait your story is currently being remixed...') 
-		# Concatenate that messages of the story into one string, that represents the content of the selected story
-		storyText = ""
-		for messageObj in self.story.messages:
-			storyText += messageObj.text
+		# Concatenate that messages of the story into one string, that represents the content of the selected story.
+		# Only the text of the messages is loaded.
+		storyText = self.master.dataAccess.loadStoryText(self.story.id)
 
 		# Get AI's response, which will be our generator object, set it storyGenObj
 		AIResponse = self.master.storyGPT.sendRemixPrompt(storyText, self.remixInput.get("1.0", "end-1c").strip()) 
@@ -1,9 +1,8 @@
 import customtkinter as ctk
+import queue
 import sys, os
 sys.path.append("..")
-from classes.models import Story
 from classes.utilities import isEmptyEntryWidgets, clearEntryWidgets
-from PIL import Image 
 
 '''
 + saveStoryPage: Page where the user will save a a story. If we load the frame, that means the we're loading 
@@ -23,42 +22,55 @@ Attributes/Variables:
 - clearFormBtn (CTkButton): Button that clears the form
 - saveNewStoryBtn (CTkButton): Button that saves a new story
 - updateSavedStoryBtn (CTkButton): Button that updates a saved story
+- saveBtn (CTkButton): Whichever of saveNewStoryBtn and updateSavedStoryBtn is on the page. It's disabled while the story is saved.
+- saveResults (Queue): Where the autosave thread puts the (storyID, error) of the save, for pollSave to pick up
 
 Methods:
 - updateExistingStory(self): Saves new changes to an existing saved story 
 - saveNewStory(self): Saves a new story to the database
+- pollSave(self): Checks whether the story has been saved, until it has
+- finishSave(self, storyID, isNewStory, savedMessageCount): Updates the app's story state once the story is saved, and 
+	redirects the user to the library
+- getStorySummary(self, messageCount): Returns the story columns that store the AI's rolling summary of the story
+
+NOTE: The unsaved messages are already written to the user's draft story by App.autosave, so saving only turns the draft into
+	a story or moves its messages into the saved story, instead of writing every message. The save is written on the 
+	autosave thread, and the page polls for it with after() the way AIChatPage polls for the AI's response.
 '''
 class saveStoryPage(ctk.CTkFrame):
 	def __init__(self, master):
 		self.master = master
 
 		super().__init__(self.master, fg_color=self.master.theme["main_clr"], corner_radius=0)
+		self.saveResults = queue.Queue()
+		self.pollInterval = 50
 		form = ctk.CTkFrame(self, fg_color=self.master.theme["sub_clr"])
 
 		# Create and structure form widgets that are guaranteed to be on the page 
 		formHeader = ctk.CTkFrame(form, fg_color="transparent")
 		formHeading = ctk.CTkLabel(formHeader, text="Save Story", font=("Helvetica", 32), text_color=self.master.theme["label_clr"])
-		storyStateMessage = ctk.CTkLabel(formHeader, text="", text_color=self.master.theme["label_clr"])
+		self.storyStateMessage = ctk.CTkLabel(formHeader, text="", text_color=self.master.theme["label_clr"])
 		formBtnsSection = ctk.CTkFrame(form, fg_color="transparent")
 		form.pack(expand=True)
 		formHeader.grid(row=0, column=0, pady=10, padx=80)
 		formHeading.grid(row=0, column=0)
-		storyStateMessage.grid(row=1, column=0)
+		self.storyStateMessage.grid(row=1, column=0)
 
 		# If they're making changes to an existing story
 		if self.master.isSavedStory: 
-			storyStateMessage.configure(text=f"Currently updating '{self.master.currentStory.storyTitle}'!")
+			self.storyStateMessage.configure(text=f"Currently updating '{self.master.currentStory.storyTitle}'!")
 			formBtnsSection.grid(row=1, column=0, pady=10)
 			updateSavedStoryBtn = ctk.CTkButton(formBtnsSection,  text="Update Story", text_color=self.master.theme["btn_text_clr"], fg_color=self.master.theme["btn_clr"], hover_color=self.master.theme["hover_clr"], command=self.updateExistingStory)
 			updateSavedStoryBtn.grid(row=0, column=0)
+			self.saveBtn = updateSavedStoryBtn
 		else:
 		# Else the user is saving a new story to the database
 			# If the new story they're saving is a remix
 			if self.master.isRemixedStory:
-				storyStateMessage.configure(text=f"Currently saving a new story remixed from {self.master.currentStory.storyTitle}!")
+				self.storyStateMessage.configure(text=f"Currently saving a new story remixed from {self.master.currentStory.storyTitle}!")
 			else:
 			# Else the new story they're saving isn't a remix
-				storyStateMessage.configure(text="Currently saving a new story!")
+				self.storyStateMessage.configure(text="Currently saving a new story!")
 
 			# Create widgets and structure them accrodingly
 			self.formErrorMessage = ctk.CTkLabel(formHeader, text="", text_color=self.master.theme["label_clr"])
@@ -66,8 +78,7 @@ class saveStoryPage(ctk.CTkFrame):
 			storyTitleLabel = ctk.CTkLabel(formFieldsSection, text="Story Title", text_color=self.master.theme["label_clr"])
 			self.storyTitleEntry = ctk.CTkEntry(formFieldsSection, fg_color=self.master.theme["entry_clr"], text_color=self.master.theme["entry_text_clr"])
 			clearFormBtn = ctk.CTkButton(formBtnsSection,  text="Clear", text_color=self.master.theme["btn_text_clr"], fg_color=self.master.theme["btn_clr"], hover_color=self.master.theme["hover_clr"], command=lambda: clearEntryWidgets([self.storyTitleEntry]))
-			saveNewStoryBtn_image = ctk.CTkImage(Image.open(os.path.join(self.master.image_path, 'glass_save_btn.png')),
-				size=(50, 50))
+			saveNewStoryBtn_image = self.master.assets.getCTkImage('glass_save_btn.png', (50, 50))
 			saveNewStoryBtn = ctk.CTkButton(formBtnsSection, image=saveNewStoryBtn_image, height=10, width=5, text="Save Story", text_color=self.master.theme["btn_text_clr"], fg_color='transparent', hover_color=self.master.theme["hover_clr"], command=self.saveNewStory)
 
 			# Structure the widgets
@@ -78,22 +89,21 @@ class saveStoryPage(ctk.CTkFrame):
 			formBtnsSection.grid(row=2, column=0, pady=10)
 			clearFormBtn.grid(row=0, column=0, padx=10)
 			saveNewStoryBtn.grid(row=0, column=1, padx=10)	
+			self.saveBtn = saveNewStoryBtn
 
 	
 	def updateExistingStory(self):
 		'''
 		- Updates or saves changes to an existing story and redirects user to the library page
 		'''
-		# Put all of those unsaved messages into the saved story and save it to the database
-		for unsavedMessage in self.master.unsavedStoryMessages:  
-			self.master.currentStory.messages.append(unsavedMessage) 
-		self.master.session.commit() 
-
-		# Reset unsavedStoryMessages since all of the previous messages have been saved
-		self.master.unsavedStoryMessages = [] 
-		
-		# Redirect user to the story library page
-		self.master.openPage("storyLibraryPage") 
+		# Move all of those unsaved messages from the draft to the end of the saved story, and save the story's summary.
+		# finishSave runs once the autosave thread has written it.
+		storyID = self.master.currentStory.id
+		savedMessageCount = len(self.master.unsavedStoryMessages)
+		messageCount = self.master.dataAccess.countMessages(storyID) + savedMessageCount
+		self.saveBtn.configure(state="disabled")
+		self.master.autosave.saveIntoStory(self.master.loggedInUser.id, storyID, lambda savedID, error: self.saveResults.put((savedID, error, False, savedMessageCount)), **self.getStorySummary(messageCount))
+		self.pollSave()
 	
 
 	
@@ -106,24 +116,51 @@ class saveStoryPage(ctk.CTkFrame):
 			self.formErrorMessage.configure(text="Some fields are empty!")
 			return
 
-		# Create story object with the user's inputted title and the current messages
-		newStory = Story(
-			storyTitle=self.storyTitleEntry.get(),
-			messages = self.master.unsavedStoryMessages, 
-		)
+		# Turn the user's draft, which has the current messages, into a story with the user's inputted title.
+		# finishSave runs once the autosave thread has written it.
+		savedMessageCount = len(self.master.unsavedStoryMessages)
+		summaryColumns = self.getStorySummary(savedMessageCount)
+		self.saveBtn.configure(state="disabled")
+		self.master.autosave.saveAsStory(self.master.loggedInUser.id, self.storyTitleEntry.get(), lambda savedID, error: self.saveResults.put((savedID, error, True, savedMessageCount)), **summaryColumns)
+		self.pollSave()
 
-		# Reset unsavedStoryMessages since all of the previous messages have been saved
-		self.master.unsavedStoryMessages = [] 
+	def pollSave(self):
+		'''
+		- Checks whether the autosave thread has written the save yet. If it hasn't, checks again after pollInterval ms, so the 
+			window keeps responding while the story is being saved.
+		'''
+		try:
+			storyID, error, isNewStory, savedMessageCount = self.saveResults.get_nowait()
+		except queue.Empty:
+			self.after(self.pollInterval, self.pollSave)
+			return
+
+		# NOTE: The user may have left the page while the story was being saved
+		if error is not None:
+			if self.winfo_exists():
+				self.storyStateMessage.configure(text="Your story couldn't be saved, please try again!")
+				self.saveBtn.configure(state="normal")
+			return
+		self.finishSave(storyID, isNewStory, savedMessageCount)
+
+	def finishSave(self, storyID, isNewStory, savedMessageCount):
+		'''
+		- Updates the app once the story has been saved, and redirects the user to the story library page
+		'''
+		# Take the saved messages out of unsavedStoryMessages. Any that were sent while the story was being saved stay in it.
+		self.master.unsavedStoryMessages = self.master.unsavedStoryMessages[savedMessageCount:]
 
-		# Add the story to the current user and save the database
-		self.master.loggedInUser.stories.append(newStory) 
-		self.master.session.commit() 
+		if not isNewStory:
+			# Redirect user to the story library page
+			if self.master.currentPage is self:
+				self.master.openPage("storyLibraryPage") 
+			return
 
 		# Make the story that the user just saved to be the saved story that they're continuing
-		self.master.currentStory = newStory 
+		self.master.currentStory = self.master.dataAccess.loadStory(storyID)
 
 		# After they save their new story, we want the user to be able to immediately continue it if needed
-		# So set isSavedStory to True, so that AIChatPage knows to render the messages of 'newStory'
+		# So set isSavedStory to True, so that AIChatPage knows to render the messages of 'currentStory'
 		self.master.isSavedStory = True 
 
 		# If the user was saving a remix, make to indicate that they aren't remixing anymore since 
@@ -133,4 +170,18 @@ class saveStoryPage(ctk.CTkFrame):
 			self.master.isRemixedStory = False  
 
 		# Redirect the user to the storyLibraryPage, which is where their new story should be
-		self.master.openPage("storyLibraryPage") 
\ No newline at end of file
+		if self.master.currentPage is self:
+			self.master.openPage("storyLibraryPage")
+
+	def getStorySummary(self, messageCount):
+		'''
+		- Returns the AI's rolling summary as story columns, so the summary doesn't have to be generated again when the story is continued.
+		- messageCount: How many messages the story has once it's saved
+		NOTE: The summary is only stored if the AI's chat history lines up one to one with the story's messages. For example, a remix's 
+			chat history starts with the remix prompt, which isn't one of the story's messages.
+		'''
+		chatHistory = self.master.storyGPT.chatHistory
+		storyMessageCount = len(chatHistory.messages) - len(chatHistory.startingChat)
+		if chatHistory.summary and storyMessageCount == messageCount:
+			return {"summary": chatHistory.summary, "summarizedCount": chatHistory.summarizedCount}
+		return {}
@@ -1,10 +1,8 @@
 from classes.utilities import convertStoryObjToJSON
 import customtkinter as ctk
 import sys, os
-from classes.export import StoryPDF
+from classes.storyPager import StoryPager
 from tkinter.filedialog import asksaveasfilename
-import zipfile
-from PIL import Image 
 from tkinter import messagebox
 
 sys.path.append("..")
@@ -12,16 +10,20 @@ sys.path.append("..")
 '''
 + storyLibraryPage: Frame that represents the page wherre the user can see all of their saved stories.
 	From here, the user will be able to select a story that they want to continue, remix a story, or delete a story.
+	Stories are shown a page at a time, so the library opens just as fast for a user with hundreds of stories.
 
 Constructor:
 - master: 'App' class instance from 'Main.py'
 
 Attributes/Variables:
 - master: 'App' class instance from 'Main.py'
+- cardsPerPage (int): Most story cards shown at the same time
+- cardColumns (int): Number of story cards in each row of the grid
+- pager (StoryPager): Loads the stories of the current page from the database
+- pageIndex (int): Index of the page that's shown
 - innerPageFrame: (CTKFrame): Frame that contains all widgets
 - storiesContainer (CTkFrame): Frame that contains all of the story cards 
-- rowIndex (int): Indexes for structuring the grid of story cards
-- columnIndex (int): Indexes for structuring the grid of story cards
+- storyCards (list): Widgets of the story cards. They're created once and reused for every page.
 - storyCard (CTkFrame): A container that displays the story's information and the buttons that the user is able to use
 	to interact wtih that saved story
 - cardHeader (CTkFrame): Header of the card
@@ -30,80 +32,143 @@ Attributes/Variables:
 - continueSavedStoryBtn (CTkButton): Button that lets user to continue a saved story and opens AIChatPage
 - openRemixStoryBtn (CTkButton): Button that lets user remix a saved story, and opens remixStoryPage
 - deleteSavedStoryBtn (CTkButton): Button that deletes a story
+- previousPageBtn, nextPageBtn (CTkButton): Buttons that switch between pages
+- pageLabel (CTkLabel): Shows which page the user is on
 
 - Methods:
+- createStoryCard(self): Creates the widgets of one story card
+- showPage(self, pageIndex): Fills the story cards with the stories on that page
+- refresh(self, state): Called when the kept page is opened again. Reloads the page of stories the user was on, since 
+	stories may have been saved or deleted in the meantime.
 - continueSavedStory(self, story): Lets a user continue a story and redirects them to the AIChatPage
 - deleteSavedStory(self, story): Deletes a saved story from the database.
 '''
 
 
 class storyLibraryPage(ctk.CTkFrame):
+    cardsPerPage = 12
+    cardColumns = 3
+
     def __init__(self, master):
         self.master = master
         super().__init__(self.master, fg_color=self.master.theme["main_clr"], corner_radius=0)
 
-        innerPageFrame = ctk.CTkFrame(self, fg_color="transparent")
-        innerPageFrame.pack(expand=True)
+        self.innerPageFrame = ctk.CTkFrame(self, fg_color="transparent")
+        self.innerPageFrame.pack(expand=True)
+
+        # Only the number of stories is queried here, the stories themselves are loaded a page at a time
+        self.pager = StoryPager(self.master.dataAccess.readSession, self.master.loggedInUser.id, self.cardsPerPage)
+        self.pageIndex = 0
 
         '''
         1. If there aren't any stories saved for this user, then just show a message, and stop it early
         2. Else, the user has stories to save, so render appropriate markup and GUI components 
         '''
-        if not self.master.loggedInUser.stories:
+        self.hasStories = bool(self.pager.countStories())
+        if not self.hasStories:
             label = ctk.CTkLabel(
-                innerPageFrame, text="No stories have been saved yet!", font=("Helvetica", 24), text_color=self.master.theme["label_clr"])
+                self.innerPageFrame, text="No stories have been saved yet!", font=("Helvetica", 24), text_color=self.master.theme["label_clr"])
             label.grid(row=0, column=0)
             return
         
         # Render section for exporting all stories in the library
-        bulkExportBtnFrame = ctk.CTkFrame(innerPageFrame, fg_color="transparent", width=500, height=500)
-        bulkExportStoryBtn_image = ctk.CTkImage(Image.open(os.path.join(self.master.image_path, 'glass_bulk_export_btn.png')),
-				size=(75, 75))
+        bulkExportBtnFrame = ctk.CTkFrame(self.innerPageFrame, fg_color="transparent", width=500, height=500)
+        bulkExportStoryBtn_image = self.master.assets.getCTkImage('glass_bulk_export_btn.png', (75, 75))
         bulkExportStoryBtn = ctk.CTkButton(bulkExportBtnFrame, image=bulkExportStoryBtn_image, text="Export all to .zip ", height=10, width=5, command=self.exportAllStories, text_color=self.master.theme["btn_text_clr"], fg_color='transparent', hover_color=self.master.theme["hover_clr"])
         bulkExportStoryBtn.pack(expand=True)
         bulkExportBtnFrame.grid(row=0, column=0)
 
         # Container/section where all story cards appear.
-        storiesContainer = ctk.CTkScrollableFrame(innerPageFrame, fg_color="transparent", width=625, height=500)
-        storiesContainer.grid(row=1, column=0)
-
-        # Iteratively create 'cards' or containers that display their information
-        rowIndex = 0
-        columnIndex = 0
-        for story in self.master.loggedInUser.stories:
-            storyCard = ctk.CTkFrame(
-                storiesContainer, fg_color=self.master.theme["sub_clr"])
-
-            # if true, then columnIndex story cards have already been placed, so reset
-            # the column index, and move on to a new row
-            if (columnIndex == 3):
-                columnIndex = 0
-                rowIndex += 1
-
-            cardHeader = ctk.CTkFrame(storyCard, fg_color="transparent")
-            cardTitle = ctk.CTkLabel(cardHeader, text_color=self.master.theme["label_clr"],
-                                     text=f"Title: {story.storyTitle}", wraplength=200)
-            cardBody = ctk.CTkFrame(storyCard, fg_color="transparent")
-            continueSavedStoryBtn = ctk.CTkButton(cardBody, text="Continue", text_color=self.master.theme["btn_text_clr"], fg_color=self.master.theme["btn_clr"],
-                                                  hover_color=self.master.theme["hover_clr"], command=lambda story=story: self.continueSavedStory(story))
-            openRemixStoryBtn = ctk.CTkButton(cardBody,  text="Remix", text_color=self.master.theme["btn_text_clr"], fg_color=self.master.theme["btn_clr"], hover_color=self.master.theme["hover_clr"],
-                                              command=lambda story=story: self.openRemixStoryPage(story))  # type: ignore
-            deleteSavedStoryBtn = ctk.CTkButton(cardBody,  text="Delete", text_color=self.master.theme["btn_text_clr"], fg_color=self.master.theme["btn_clr"],
-                                                hover_color=self.master.theme["hover_clr"], command=lambda story=story: self.deleteSavedStory(story))
-            exportStoryBtn_image = ctk.CTkImage(Image.open(os.path.join(self.master.image_path, 'glass_single_export_btn.png')),
-				size=(50, 50))
-            exportStoryBtn = ctk.CTkButton(cardBody, image=exportStoryBtn_image, text="Export", height=10, width=5, command=lambda story=story: self.exportSavedStory(story), text_color=self.master.theme["btn_text_clr"], fg_color='transparent', hover_color=self.master.theme["hover_clr"])
-
-            # Structure the storyCard and its widgets
-            storyCard.grid(row=rowIndex, column=columnIndex, padx=10, pady=10)
-            cardHeader.grid(row=0, column=0, pady=10)
-            cardTitle.grid(row=0, column=0)
-            cardBody.grid(row=1, column=0)
-            continueSavedStoryBtn.grid(row=0, column=0, pady=5)
-            openRemixStoryBtn.grid(row=1, column=0, pady=5)
-            exportStoryBtn.grid(row=2, column=0, pady=5)
-            deleteSavedStoryBtn.grid(row=3, column=0, pady=5)
-            columnIndex += 1
+        self.storiesContainer = ctk.CTkScrollableFrame(self.innerPageFrame, fg_color="transparent", width=625, height=500)
+        self.storiesContainer.grid(row=1, column=0)
+
+        # Buttons for switching between pages of stories
+        pageNavFrame = ctk.CTkFrame(self.innerPageFrame, fg_color="transparent")
+        self.previousPageBtn = ctk.CTkButton(pageNavFrame, text="Previous", width=80, text_color=self.master.theme["btn_text_clr"], fg_color=self.master.theme["btn_clr"],
+                                             hover_color=self.master.theme["hover_clr"], command=lambda: self.showPage(self.pageIndex - 1))
+        self.pageLabel = ctk.CTkLabel(pageNavFrame, text="", text_color=self.master.theme["label_clr"])
+        self.nextPageBtn = ctk.CTkButton(pageNavFrame, text="Next", width=80, text_color=self.master.theme["btn_text_clr"], fg_color=self.master.theme["btn_clr"],
+                                         hover_color=self.master.theme["hover_clr"], command=lambda: self.showPage(self.pageIndex + 1))
+        pageNavFrame.grid(row=2, column=0, pady=10)
+        self.previousPageBtn.grid(row=0, column=0, padx=10)
+        self.pageLabel.grid(row=0, column=1, padx=10)
+        self.nextPageBtn.grid(row=0, column=2, padx=10)
+
+        # Story cards are only created for the stories on the first page, and then reused
+        self.storyCards = []
+        self.showPage(0)
+
+    def createStoryCard(self):
+        '''
+        - Creates the widgets of a story card. Which story the card shows is set by showPage.
+        '''
+        storyCard = ctk.CTkFrame(self.storiesContainer, fg_color=self.master.theme["sub_clr"])
+        cardHeader = ctk.CTkFrame(storyCard, fg_color="transparent")
+        storyCard.cardTitle = ctk.CTkLabel(cardHeader, text_color=self.master.theme["label_clr"], text="", wraplength=200)
+        cardBody = ctk.CTkFrame(storyCard, fg_color="transparent")
+        storyCard.continueSavedStoryBtn = ctk.CTkButton(cardBody, text="Continue", text_color=self.master.theme["btn_text_clr"], fg_color=self.master.theme["btn_clr"],
+                                                        hover_color=self.master.theme["hover_clr"])
+        storyCard.openRemixStoryBtn = ctk.CTkButton(cardBody,  text="Remix", text_color=self.master.theme["btn_text_clr"], fg_color=self.master.theme["btn_clr"], hover_color=self.master.theme["hover_clr"])
+        storyCard.deleteSavedStoryBtn = ctk.CTkButton(cardBody,  text="Delete", text_color=self.master.theme["btn_text_clr"], fg_color=self.master.theme["btn_clr"],
+                                                      hover_color=self.master.theme["hover_clr"])
+        exportStoryBtn_image = self.master.assets.getCTkImage('glass_single_export_btn.png', (50, 50))
+        storyCard.exportStoryBtn = ctk.CTkButton(cardBody, image=exportStoryBtn_image, text="Export", height=10, width=5, text_color=self.master.theme["btn_text_clr"], fg_color='transparent', hover_color=self.master.theme["hover_clr"])
+
+        # Structure the storyCard's widgets. The card itself is placed by showPage.
+        cardHeader.grid(row=0, column=0, pady=10)
+        storyCard.cardTitle.grid(row=0, column=0)
+        cardBody.grid(row=1, column=0)
+        storyCard.continueSavedStoryBtn.grid(row=0, column=0, pady=5)
+        storyCard.openRemixStoryBtn.grid(row=1, column=0, pady=5)
+        storyCard.exportStoryBtn.grid(row=2, column=0, pady=5)
+        storyCard.deleteSavedStoryBtn.grid(row=3, column=0, pady=5)
+        return storyCard
+
+    def showPage(self, pageIndex):
+        '''
+        + Shows a page of stories
+        1. Load only the stories on that page from the database
+        2. Point a story card at each story, creating a card only if there aren't enough yet, and hide the cards that 
+            aren't needed on this page
+        3. Update the page navigation and scroll back to the top
+        '''
+        # 1
+        self.pageIndex = min(max(0, pageIndex), self.pager.pageCount() - 1)
+        stories = self.pager.getPage(self.pageIndex)
+
+        # 2
+        while len(self.storyCards) < len(stories):
+            self.storyCards.append(self.createStoryCard())
+        for cardIndex, storyCard in enumerate(self.storyCards):
+            if cardIndex >= len(stories):
+                storyCard.grid_remove()
+                continue
+            story = stories[cardIndex]
+            storyCard.cardTitle.configure(text=f"Title: {story.storyTitle}")
+            storyCard.continueSavedStoryBtn.configure(command=lambda story=story: self.continueSavedStory(story))
+            storyCard.openRemixStoryBtn.configure(command=lambda story=story: self.openRemixStoryPage(story))  # type: ignore
+            storyCard.exportStoryBtn.configure(command=lambda story=story: self.exportSavedStory(story))
+            storyCard.deleteSavedStoryBtn.configure(command=lambda story=story: self.deleteSavedStory(story))
+            storyCard.grid(row=cardIndex // self.cardColumns, column=cardIndex % self.cardColumns, padx=10, pady=10)
+
+        # 3
+        pageCount = self.pager.pageCount()
+        self.pageLabel.configure(text=f"Page {self.pageIndex + 1} of {pageCount}")
+        self.previousPageBtn.configure(state="normal" if self.pageIndex > 0 else "disabled")
+        self.nextPageBtn.configure(state="normal" if self.pageIndex < pageCount - 1 else "disabled")
+        self.storiesContainer._parent_canvas.yview_moveto(0)
+
+    def refresh(self, state):
+        '''
+        - Shows the stories on the current page again. The page has to be built again if the library went from empty to 
+            having stories or the other way around, since those look completely different.
+        '''
+        self.pager.refresh()
+        if bool(self.pager.countStories()) != self.hasStories:
+            return False
+        if self.hasStories:
+            self.showPage(self.pageIndex)
+        return True
 
     def openRemixStoryPage(self, story):
         '''
@@ -127,23 +192,27 @@ class storyLibraryPage(ctk.CTkFrame):
     def continueSavedStory(self, story):
         '''
         + Let the user continue a saved story and takes them to the AIChatPage
+        NOTE: The story cards only have the story's title, so the whole story is loaded along with its messages first
         1.
         - Update the currentStory that we are currently continuing
         - And set booleans to indicate that currentStory is a saved story, rather than a story we're remixing from 
         2.
         - Convert story into openai json format
-        - Set AI's knowledge to the selected story's messages and info
+        - Set AI's knowledge to the selected story's messages and info, along with the story's cached summary so older 
+            messages don't have to be summarized again
         - Reset unsaved messages since we are continuing a story (starting a new chat), and we don't want old messages
         - Redirect user to the ai chat page
         '''
+        story = self.master.dataAccess.loadStory(story.id)  # type: ignore
         # 1
         self.master.currentStory = story  # type: ignore
         self.master.isSavedStory = True  # type: ignore
         self.master.isRemixedStory = False  # type: ignore
         # 2        
         storyJSON = convertStoryObjToJSON(story)
-        self.master.storyGPT.populate(storyJSON)  # type: ignore
+        self.master.storyGPT.chatHistory.populate(storyJSON, story.summary, story.summarizedCount)  # type: ignore
         self.master.unsavedStoryMessages = []  # type: ignore
+        self.master.autosave.discard(self.master.loggedInUser.id)  # type: ignore
         self.master.openPage("AIChatPage")  # type: ignore
 
 
@@ -158,7 +227,7 @@ class storyLibraryPage(ctk.CTkFrame):
         - Else, currentStory != story, so they're deleting a story that's unrelated
         to the story that they're current writing/continuing
         '''
-        if self.master.currentStory == story:  # type: ignore
+        if self.master.currentStory is not None and self.master.currentStory.id == story.id:  # type: ignore
             # Reset currentStory since it's being deleted from database
             self.master.currentStory = None  # type: ignore
 
@@ -167,6 +236,7 @@ class storyLibraryPage(ctk.CTkFrame):
 
             # Reset unsaved messages since they're apart of the story that's being deleted
             self.master.unsavedStoryMessages = []  # type: ignore
+            self.master.autosave.discard(self.master.loggedInUser.id)  # type: ignore
 
             # 1
             if self.master.isSavedStory:  # type: ignore
@@ -176,17 +246,23 @@ class storyLibraryPage(ctk.CTkFrame):
                 self.master.isRemixedStory = False  # type: ignore
 
         # Delete story from database
-        self.master.session.delete(story)  # type: ignore
-        self.master.session.commit()  # type: ignore
+        self.master.dataAccess.deleteStory(story.id)  # type: ignore
 
-        # Open/reload the storyLibraryPage for changes to take effect
-        self.master.openPage("storyLibraryPage")  # type: ignore
+        # Reload the current page for changes to take effect. Only if that was the last story, open/reload the 
+        # storyLibraryPage so that the empty library message is shown.
+        self.pager.refresh()
+        if not self.pager.countStories():
+            self.master.openPage("storyLibraryPage")  # type: ignore
+            return
+        self.showPage(self.pageIndex)
 
 
     def getStoryPDF(self, story):
         '''
         + Converts a story object into a pdf
+        NOTE: fpdf is only imported the first time a story is exported, so opening the library stays fast
         '''
+        from classes.export import StoryPDF
         pdf = StoryPDF(story_name=story.storyTitle)
         pdf.alias_nb_pages()
         pdf.add_page()
@@ -203,11 +279,11 @@ class storyLibraryPage(ctk.CTkFrame):
     def exportSavedStory(self, story):
         '''
         + Prompts user to save a singular story as a pdf. 
-        1. Convert story into a pdf object
+        1. Load the story's messages and convert the story into a pdf object
         2. Prompt the user for the path where they want to save their file, and prompt for the name of the file.
         3. If filePath exists/is valid, then download pdf to that file path.
         '''
-        pdf = self.getStoryPDF(story)
+        pdf = self.getStoryPDF(self.master.dataAccess.loadStory(story.id))
         savePath = asksaveasfilename(
             defaultextension=".pdf",
             initialfile=f"{pdf.story_name}",
@@ -220,16 +296,18 @@ class storyLibraryPage(ctk.CTkFrame):
     def exportAllStories(self):
         '''
         + Prompts user to save all of the pdfs in their library into a single zip file.
-        1. If user doesn't have any stories, then abort function early
+        1. Load all of the user's stories along with their messages, in 2 queries. If user doesn't have any stories, then 
+            abort function early
         2. Convert all saved story objects into pdf objects.
         3. Prompt for a file path and file name for where they want the zip file to be.
         4. If path for zip file is valid, create zip file and write all pdf data into that file.
             Finally, download the file to the user's entered path.
         '''
-        if not self.master.loggedInUser.stories:
+        stories = self.master.dataAccess.loadStoriesWithMessages(self.master.loggedInUser.id)
+        if not stories:
             return
         all_stories_pdfs = []
-        for story in self.master.loggedInUser.stories:
+        for story in stories:
             pdf = self.getStoryPDF(story)
             all_stories_pdfs.append(pdf)
         # Msgbox pop-up to reassure our user that their story is exporting
@@ -240,6 +318,7 @@ class storyLibraryPage(ctk.CTkFrame):
             filetypes=[("Zip files", "*.zip"), ("All files", "*.*")]
         )
         if zipPath:
+            import zipfile
             with zipfile.ZipFile(zipPath, mode="w") as bulk_export:
                 for pdf_story_file in all_stories_pdfs:
                     bulk_export.writestr(
@@ -1,6 +1,5 @@
 import customtkinter as ctk
 import tkinter as tk
-from PIL import Image, ImageTk
 
 '''
 + userAccountPage: Frame that represents the user's profile or account page. A page where the user can see all of 
@@ -13,9 +12,8 @@ Attributes/Variables:
 - master: 'App' class instance from 'Main.py'
 - innerPageFrame (CTkFrame): Container for all of the page's widgets
 - userImageSection (CTkFrame): Section that contains the user's image
-- avatarSourcePath (string): Path to the image folder from script's directory.
-- image: PIL image object
-- imageWidget (ImageTk): Tkinter widget that holds the image
+- avatarSourcePath (string): Path of the avatar, relative to the images folder unless it's a custom profile picture
+- imageWidget (ImageTk): Tkinter widget that holds the image. It comes from the app's asset cache, already resized.
 - ImageLabel (tk.Label): Label that displays the widget
 - userBtnsSection (CTkFrame): Container that holds all of the buttons for the page
 - openEditAvatarBtn (CTkButton): Button that redirects the user to the editAvatarPage
@@ -23,6 +21,13 @@ Attributes/Variables:
 - confirmLogOutBtn (CTkButton): Button that logs out the user
 - userInfoSection (CTkFrame): Section that contains the labels that show the user's public information.
 - userInfoFields (array): Array that's used to create the labels that show the user's information.
+- userInfoLabels (array): Labels that show the user's information
+
+Methods:
+- getAvatarImage(self, user): Returns the user's avatar, resized to 300x300
+- renderUserInfo(self, user): Shows the user's avatar and information
+- refresh(self, state): Called when the kept page is opened again. Shows the user's information again, since they may have 
+	changed their avatar or account details in the meantime.
 '''
 class userAccountPage(ctk.CTkFrame):
 	def __init__(self, master):
@@ -35,19 +40,8 @@ class userAccountPage(ctk.CTkFrame):
 		# Create section to store the user's profile picture
 		userImageSection = tk.Canvas(innerPageFrame)
 
-		avatarSourcePath = f"./assets/images/profile_pics/{self.master.loggedInUser.avatar}"		
-  
-		try:
-			image = Image.open(avatarSourcePath).resize((300, 300))
-		except (FileNotFoundError, OSError): # if the user has a custom profile picture...
-			avatarSourcePath = self.master.loggedInUser.avatar
-			# avatarSourcePath = f"./assets/images/profile_pics/default_user.jpg"
-			image = Image.open(avatarSourcePath).resize((300, 300))
-   		
-		imageWidget = ImageTk.PhotoImage(image=image)
-		imageLabel = tk.Label(userImageSection, image=imageWidget)
-		imageLabel.image = imageWidget 
-		imageLabel.grid(row=0, column=0)
+		self.imageLabel = tk.Label(userImageSection)
+		self.imageLabel.grid(row=0, column=0)
 
 		# Create section to store buttons on the user page
 		userBtnsSection = ctk.CTkFrame(innerPageFrame, fg_color="transparent")
@@ -61,25 +55,51 @@ class userAccountPage(ctk.CTkFrame):
 		# Create section to display user information
 		# Get user information, and iteratively create labels to show that user information
 		userInfoSection = ctk.CTkFrame(innerPageFrame, fg_color=self.master.theme["sub_clr"])
+		self.userInfoLabels = []
+		for x in range(3):
+			label = ctk.CTkLabel(userInfoSection, text_color=self.master.theme["label_clr"], text="", font=("Helvetica", 24))
+			label.grid(row=x, column=0, sticky="W", pady=10)
+			self.userInfoLabels.append(label)
+		self.renderUserInfo(self.master.loggedInUser)
+
+		# Structure the 3 main sections of the user account page
+		userImageSection.grid(row=0, column=0, padx=30, pady=10)
+		userBtnsSection.grid(row=1, padx=30, column=0)
+		userInfoSection.grid(row=0, column=1, padx=30)
+
+	def getAvatarImage(self, user):
+		avatarSourcePath = f"profile_pics/{user.avatar}"		
+  
+		try:
+			return self.master.assets.getPhotoImage(avatarSourcePath, (300, 300))
+		except (FileNotFoundError, OSError): # if the user has a custom profile picture...
+			avatarSourcePath = user.avatar
+			# avatarSourcePath = f"profile_pics/default_user.jpg"
+			return self.master.assets.getPhotoImage(avatarSourcePath, (300, 300))
+
+	def renderUserInfo(self, user):
+		imageWidget = self.getAvatarImage(user)
+		self.imageLabel.configure(image=imageWidget)
+		self.imageLabel.image = imageWidget 
+
+		# Get user information, and show it in the labels
 		userInfoFields = [
 			{
 				"text": "Username",
-				"value": self.master.loggedInUser.username
+				"value": user.username
 			},
 			{
 				"text": "Email",
-				"value": self.master.loggedInUser.email
+				"value": user.email
 			},
 			{
 				"text": "Name",
-				"value": f"{self.master.loggedInUser.firstName} {self.master.loggedInUser.lastName}"
+				"value": f"{user.firstName} {user.lastName}"
 			}
 		]
 		for x in range(len(userInfoFields)):
-			label = ctk.CTkLabel(userInfoSection, text_color=self.master.theme["label_clr"], text=f"{userInfoFields[x].get('text')}: {userInfoFields[x].get('value')}", font=("Helvetica", 24))
-			label.grid(row=x, column=0, sticky="W", pady=10)
+			self.userInfoLabels[x].configure(text=f"{userInfoFields[x].get('text')}: {userInfoFields[x].get('value')}")
 
-		# Structure the 3 main sections of the user account page
-		userImageSection.grid(row=0, column=0, padx=30, pady=10)
-		userBtnsSection.grid(row=1, padx=30, column=0)
-		userInfoSection.grid(row=0, column=1, padx=30)
\ No newline at end of file
+	def refresh(self, state):
+		self.renderUserInfo(state["loggedInUser"])
+		return True
\ No newline at end of file
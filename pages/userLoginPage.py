@@ -3,7 +3,6 @@ import hashlib
 import sys
 sys.path.append("..")
 from classes.utilities import clearEntryWidgets, isEmptyEntryWidgets, toggleHidden
-from classes.models import User
 import pickle
 '''
 + userLoginPage: Tkinter frame that represents the login page of the application. This is where users would 
@@ -110,7 +109,7 @@ class userLoginPage(ctk.CTkFrame):
 		passwordHash = hashlib.md5(password.encode("utf-8")).hexdigest()
 
 		# Now check if the inputted username and password hash matches a record from the User table 
-		retrievedUser = self.master.session.query(User).filter_by(username=username, passwordHash=passwordHash).first() 
+		retrievedUser = self.master.dataAccess.findUser(username, passwordHash)
 		if not retrievedUser:
 			self.formErrorMessage.configure(text="Username or password is incorrect!")
 			return
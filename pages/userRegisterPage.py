@@ -150,7 +150,7 @@ class userRegisterPage(ctk.CTkFrame):
 			return
 		
 		# Check if there are any users with the inputted username
-		retrievedUser = self.master.session.query(User).filter_by(username=username).first() 
+		retrievedUser = self.master.dataAccess.findUser(username)
 		if retrievedUser:
 			self.formErrorMessage.configure(text="Usename already taken!")
 			return
@@ -166,9 +166,7 @@ class userRegisterPage(ctk.CTkFrame):
 		)
 
 		# Add new user to the database
-		self.master.session.add(newUser) 
-		self.master.session.commit() 
-		self.master.session.close() 
+		self.master.dataAccess.addUser(newUser)
 
 		# Redirect user to login screen after they've successfully registered
 		self.master.openPage("userLoginPage") 
\ No newline at end of file
@@ -0,0 +1,294 @@
+import argparse
+import datetime
+import gc
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+import types
+
+# Let the tool be run from anywhere, e.g. 'python tools/benchmark.py'
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+'''
++ benchmark: Benchmarks for the story generation pipeline. Every benchmark runs on synthetic stories of several
+    sizes, and the results are printed (or saved) as JSON so they can be compared between releases.
+
+Usage:
+- python tools/benchmark.py --output results.json
+- python tools/benchmark.py --sizes 10,1000 --repeat 3 --only chatHistory
+- python tools/benchmark.py --compare results.json --tolerance 0.25
+    Exits with status 1 if any benchmark got more than 25% slower than in results.json.
+
+Benchmarks:
+- chatHistory.*: ChatHistoryManager operations on a chat that already has `size` story messages
+- buildPrompt: StoryGPT.buildPrompt
+- convertStoryObjToJSON: Converting a Story with `size` messages to the openai format
+- complete: ModelBase.complete() streaming a 200 chunk response from an in-process fake client
+- chunkToRender: Chunks from ModelBase.complete(), through a GenerationWorker, rendered by AIChatPage's ChunkRenderer
+'''
+
+RESPONSE_CHUNKS = 200
+
+def makeStoryJSON(size):
+    '''
+    - Returns `size` alternating user and assistant messages of story-like length
+    '''
+    messages = []
+    for i in range(size):
+        if i % 2 == 0:
+            messages.append({"role": "user", "content": f"Continue the story, part {i}: the dragon finds the pendant in the misty forest."})
+        else:
+            messages.append({"role": "assistant", "content": f"Part {i}. " + "The young adventurer followed the glow of the ancient pendant through the forest. " * 6})
+    return messages
+
+class FakeDelta:
+    def __init__(self, content):
+        self.content = content
+
+class FakeChoice:
+    def __init__(self, content):
+        self.delta = FakeDelta(content)
+
+class FakeChunk:
+    def __init__(self, content):
+        self.choices = [FakeChoice(content)]
+
+class FakeCompletions:
+    '''
+    - Mimics client.chat.completions of the openai client, without any network or latency
+    '''
+    def create(self, **request):
+        return iter([FakeChunk(" word" if i else "Once") for i in range(RESPONSE_CHUNKS)] + [FakeChunk(None)])
+
+class FakeClient:
+    def __init__(self):
+        self.chat = types.SimpleNamespace(completions=FakeCompletions())
+
+class TextBuffer:
+    '''
+    - Stand-in for a CTkTextbox when no display is available. Supports the calls that the chunk renderer makes.
+    '''
+    def __init__(self):
+        self.text = ""
+
+    def insert(self, index, text):
+        self.text += text
+
+    def get(self, start, end):
+        return self.text + "\n"
+
+    def configure(self, **options):
+        pass
+
+def measure(name, size, run, setup=None, repeat=5):
+    '''
+    - Times run(state) `repeat` times, where state is what setup() returns. setup isn't part of the timing.
+    - Like timeit, the garbage collector is turned off while timing, so a collection of setup()'s garbage isn't timed
+    '''
+    timings = []
+    for _ in range(repeat):
+        state = setup() if setup else None
+        gc.collect()
+        gc.disable()
+        try:
+            start = time.perf_counter()
+            run(state)
+            timings.append(time.perf_counter() - start)
+        finally:
+            gc.enable()
+    return {
+        "name": name,
+        "size": size,
+        "repeat": repeat,
+        "meanSeconds": statistics.fmean(timings),
+        "minSeconds": min(timings),
+        "maxSeconds": max(timings),
+    }
+
+def benchmarkChatHistory(size, repeat):
+    from ai import ChatHistoryManager
+    storyJSON = makeStoryJSON(size)
+
+    def makeHistory():
+        chatHistory = ChatHistoryManager("intro", "system prompt")
+        chatHistory.populate(storyJSON)
+        return chatHistory
+
+    def appendMessages(chatHistory):
+        for i in range(100):
+            chatHistory.appendMessage({"role": "user", "content": f"New message {i}"})
+
+    def removeMiddleMessage(chatHistory):
+        chatHistory.removeMessageAt(storyJSON[size // 2])
+
+    # Every 100th story message, so removals are spread through the whole chat
+    removedMessages = storyJSON[::max(1, size // 100)][:100]
+
+    def removeMessages(chatHistory):
+        for message in removedMessages:
+            chatHistory.removeMessageAt(message)
+
+    def makeHistoryWithIds():
+        chatHistory = makeHistory()
+        return chatHistory, [chatHistory.messages.idAt(position) for position in range(3, len(chatHistory.messages), max(1, size // 100))][:100]
+
+    def removeMessagesById(state):
+        chatHistory, messageIds = state
+        for messageId in messageIds:
+            chatHistory.removeMessageById(messageId)
+
+    def removeMessagesFromList(chat):
+        # How ChatHistoryManager removed messages before it used a MessageStore, for comparison
+        for message in removedMessages:
+            chat.pop(chat.index(message))
+
+    def removeByPosition(chatHistory):
+        chatHistory.removeMessageAt(size // 2 + 1)
+
+    def insertMessage(chatHistory):
+        chatHistory.addMessageAt("A new twist", size // 2 + 1, "user")
+
+    return [
+        measure("chatHistory.populate", size, lambda _: makeHistory(), repeat=repeat),
+        measure("chatHistory.append100", size, appendMessages, makeHistory, repeat),
+        measure("chatHistory.removeByMessage", size, removeMiddleMessage, makeHistory, repeat),
+        measure("chatHistory.remove100ByMessage", size, removeMessages, makeHistory, repeat),
+        measure("chatHistory.remove100ById", size, removeMessagesById, makeHistoryWithIds, repeat),
+        measure("chatHistory.remove100ByMessage.listBaseline", size, removeMessagesFromList, lambda: [dict(message) for message in storyJSON], repeat),
+        measure("chatHistory.removeByPosition", size, removeByPosition, makeHistory, repeat),
+        measure("chatHistory.insert", size, insertMessage, makeHistory, repeat),
+        measure("chatHistory.getContextWindow", size, lambda chatHistory: chatHistory.getContextWindow(3584), makeHistory, repeat),
+    ]
+
+def benchmarkBuildPrompt(size, repeat):
+    from ai import StoryGPT
+    storyGPT = StoryGPT(FakeClient())
+    def buildPrompts(_):
+        for _ in range(size):
+            storyGPT.buildPrompt("a dragon who finds a pendant")
+    return [measure("buildPrompt", size, buildPrompts, repeat=repeat)]
+
+def benchmarkConvertStory(size, repeat):
+    from classes.models import Story, Message
+    from classes.utilities import convertStoryObjToJSON
+    def makeStory():
+        return Story(storyTitle="Benchmark", messages=[Message(text=message["content"], isAISender=message["role"] == "assistant") for message in makeStoryJSON(size)])
+    return [measure("convertStoryObjToJSON", size, convertStoryObjToJSON, makeStory, repeat)]
+
+def makeStoryGPT(size):
+    from ai import StoryGPT
+    storyGPT = StoryGPT(FakeClient())
+    storyGPT.chatHistory.populate(makeStoryJSON(size))
+    # Measure our own overhead, not the summarization request
+    storyGPT.compaction_threshold = None
+    return storyGPT
+
+def benchmarkComplete(size, repeat):
+    def completeStory(storyGPT):
+        for _ in storyGPT.sendStoryPrompt("a dragon"):
+            pass
+    return [measure("complete", size, completeStory, lambda: makeStoryGPT(size), repeat)]
+
+def makeRenderer():
+    '''
+    - Returns the ChunkRenderer that AIChatPage renders a response with, and the name of the widget it renders into
+    '''
+    from classes.chunkRenderer import ChunkRenderer
+    from classes.models import Message
+    try:
+        import tkinter
+        root = tkinter.Tk()
+        root.withdraw()
+        msgbox = tkinter.Text(root)
+        rendererName = "tkinter.Text"
+    except Exception:
+        msgbox = TextBuffer()
+        rendererName = "TextBuffer"
+    return ChunkRenderer(msgbox, Message(text="", isAISender=True), "Story Bot: "), rendererName
+
+def benchmarkChunkToRender(size, repeat):
+    from classes.generationWorker import GenerationWorker
+    renderer, rendererName = makeRenderer()
+
+    def renderStory(storyGPT):
+        # Like AIChatPage.pollAIChat, every batch of chunks that's ready is rendered as one frame
+        worker = GenerationWorker(storyGPT.sendStoryPrompt("a dragon")).start()
+        isRunning = True
+        while isRunning:
+            for eventType, value in worker.drain():
+                if eventType == GenerationWorker.CHUNK:
+                    renderer.add(value)
+                else:
+                    isRunning = False
+            renderer.flush()
+
+    result = measure("chunkToRender", size, renderStory, lambda: makeStoryGPT(size), repeat)
+    result["chunksPerSecond"] = RESPONSE_CHUNKS / result["meanSeconds"]
+    result["renderer"] = rendererName
+    return [result]
+
+BENCHMARKS = {
+    "chatHistory": benchmarkChatHistory,
+    "buildPrompt": benchmarkBuildPrompt,
+    "convertStoryObjToJSON": benchmarkConvertStory,
+    "complete": benchmarkComplete,
+    "chunkToRender": benchmarkChunkToRender,
+}
+
+def runBenchmarks(sizes, repeat, only=None):
+    results = []
+    for benchmarkName, benchmark in BENCHMARKS.items():
+        if only and benchmarkName not in only:
+            continue
+        for size in sizes:
+            for result in benchmark(size, repeat):
+                results.append(result)
+                print(f"{result['name']:<32} size={size:<6} mean={result['meanSeconds'] * 1000:10.3f}ms", file=sys.stderr)
+    return {
+        "createdAt": datetime.datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": results,
+    }
+
+def compareResults(baseline, current, tolerance):
+    '''
+    - Returns the benchmarks that got more than `tolerance` (a fraction) slower than in the baseline
+    '''
+    baselineTimes = {(result["name"], result["size"]): result["minSeconds"] for result in baseline["results"]}
+    regressions = []
+    for result in current["results"]:
+        baselineTime = baselineTimes.get((result["name"], result["size"]))
+        if baselineTime and result["minSeconds"] > baselineTime * (1 + tolerance):
+            regressions.append({"name": result["name"], "size": result["size"], "baselineSeconds": baselineTime, "currentSeconds": result["minSeconds"], "ratio": result["minSeconds"] / baselineTime})
+    return regressions
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmarks for the story generation pipeline")
+    parser.add_argument("--sizes", default="10,100,1000,10000", help="Comma separated story sizes (number of messages)")
+    parser.add_argument("--repeat", type=int, default=5, help="Times every benchmark is run")
+    parser.add_argument("--only", default=None, help=f"Comma separated benchmarks to run, out of: {', '.join(BENCHMARKS)}")
+    parser.add_argument("--output", default=None, help="File to write the JSON results to, instead of printing them")
+    parser.add_argument("--compare", default=None, help="JSON results of an earlier run to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Fraction a benchmark may slow down before it counts as a regression")
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(",")]
+    only = args.only.split(",") if args.only else None
+    results = runBenchmarks(sizes, args.repeat, only)
+
+    exitCode = 0
+    if args.compare:
+        with open(args.compare, "r") as f:
+            results["regressions"] = compareResults(json.load(f), results, args.tolerance)
+        exitCode = 1 if results["regressions"] else 0
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    else:
+        print(json.dumps(results, indent=2))
+    sys.exit(exitCode)
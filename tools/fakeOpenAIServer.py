@@ -0,0 +1,221 @@
+import argparse
+import itertools
+import json
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+'''
++ fakeOpenAIServer: Local stand-in for the OpenAI chat completions API, used to develop and load-test StoryGPT and
+    AIChatPage without network access. It supports streaming (server-sent events) and non-streaming responses, and can
+    simulate a slow or unreliable API.
+
+Usage:
+- python tools/fakeOpenAIServer.py --port 8000 --ttft 0.5 --token-delay 0.03 --error-rate 0.05
+- Then point the app at it: set BOOKSMART_API_BASE_URL=http://127.0.0.1:8000/v1 (or put that URL in
+    assets/api_base_url.txt) and run Main.py as usual.
+
+Configuration (FakeServerConfig):
+- ttft (float): Seconds before the first token is sent (time to first token)
+- tokenDelay (float): Seconds between tokens
+- errorRate (float): Chance (0 to 1) that a request fails with errorStatus before anything is sent
+- errorStatus (int): HTTP status of simulated failures, e.g. 429 or 500
+- retryAfter (float): Value of the Retry-After header sent with simulated failures, if any
+- streamErrorRate (float): Chance that a streamed response is cut off part way through
+- responseTokens (int): Number of tokens in each response. It's capped by the request's max_tokens.
+- seed (int): Seed for the random number generator, so runs are repeatable
+
+Unit tests:
+- startTestModel(testCase, modelClass, config, clientClass, **kwargs): Starts a server for the test and returns a model
+    (e.g. StoryGPT or AsyncStoryGPT) whose client sends its requests there. The server is shut down when the test ends.
+- prepareTestModel(model): Turns off the model's metrics and gives it a circuit breaker of its own, so tests don't trip or
+    depend on the breaker that's shared by the whole process. startTestModel already does this.
+'''
+
+STORY_WORDS = (
+    "the dragon wandered through the misty forest while a young adventurer named Alex followed the "
+    "glow of an ancient pendant that whispered forgotten songs of a distant kingdom beneath the silver moon"
+).split()
+
+class FakeServerConfig:
+    def __init__(self, ttft=0.2, tokenDelay=0.02, errorRate=0.0, errorStatus=500, retryAfter=None, streamErrorRate=0.0, responseTokens=200, seed=None):
+        self.ttft = ttft
+        self.tokenDelay = tokenDelay
+        self.errorRate = errorRate
+        self.errorStatus = errorStatus
+        self.retryAfter = retryAfter
+        self.streamErrorRate = streamErrorRate
+        self.responseTokens = responseTokens
+        self.random = random.Random(seed)
+        self.randomLock = threading.Lock()
+
+    def roll(self, chance):
+        with self.randomLock:
+            return self.random.random() < chance
+
+def makeTokens(count):
+    '''
+    - Returns count story-like tokens. Every token after the first starts with a space, like openai's deltas.
+    '''
+    words = itertools.islice(itertools.cycle(STORY_WORDS), count)
+    return [word if i == 0 else f" {word}" for i, word in enumerate(words)]
+
+class FakeOpenAIHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    @property
+    def config(self):
+        return self.server.config
+
+    def log_message(self, format, *args):
+        # Keep load tests quiet
+        pass
+
+    def do_POST(self):
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self.sendJSON(404, {"error": {"message": f"Unknown path {self.path}", "type": "invalid_request_error"}})
+            return
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+
+        if self.config.roll(self.config.errorRate):
+            headers = {"Retry-After": str(self.config.retryAfter)} if self.config.retryAfter is not None else {}
+            self.sendJSON(self.config.errorStatus, {"error": {"message": "Simulated failure", "type": "server_error"}}, headers)
+            return
+
+        tokenCount = self.config.responseTokens
+        if request.get("max_tokens"):
+            tokenCount = min(tokenCount, request["max_tokens"])
+        tokens = makeTokens(tokenCount)
+        completionId = f"chatcmpl-{uuid.uuid4().hex}"
+        model = request.get("model", "gpt-3.5-turbo")
+
+        if request.get("stream"):
+            self.streamCompletion(completionId, model, tokens)
+        else:
+            time.sleep(self.config.ttft + self.config.tokenDelay * len(tokens))
+            promptTokens = sum(len(str(message.get("content") or "")) // 4 for message in request.get("messages", []))
+            self.sendJSON(200, {
+                "id": completionId,
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": "".join(tokens)}, "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": promptTokens, "completion_tokens": len(tokens), "total_tokens": promptTokens + len(tokens)},
+            })
+
+    def streamCompletion(self, completionId, model, tokens):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        # NOTE: No Content-Length, so the connection is closed when the stream ends
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+
+        cutOffAt = None
+        if self.config.roll(self.config.streamErrorRate):
+            with self.config.randomLock:
+                cutOffAt = self.config.random.randint(1, max(1, len(tokens) - 1))
+
+        def sendEvent(delta, finishReason=None):
+            chunk = {
+                "id": completionId,
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finishReason}],
+            }
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+
+        try:
+            time.sleep(self.config.ttft)
+            sendEvent({"role": "assistant", "content": ""})
+            for i, token in enumerate(tokens):
+                if i == cutOffAt:
+                    # Simulate the connection dropping in the middle of a response
+                    self.wfile.write(b'data: {"error": {"message": "Simulated stream failure", "type": "server_error"}}\n\n')
+                    self.wfile.flush()
+                    return
+                if i:
+                    time.sleep(self.config.tokenDelay)
+                sendEvent({"content": token})
+            sendEvent({}, finishReason="stop")
+            self.wfile.write(b"data: [DONE]\n\n")
+            self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            # The client cancelled the response
+            pass
+
+    def sendJSON(self, status, body, headers=None):
+        payload = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+def startServer(config=None, host="127.0.0.1", port=0):
+    '''
+    - Starts the server on a background thread and returns it. Use port 0 to pick a free port; the base URL to give
+        the openai client is then f"http://{host}:{server.server_port}/v1". Call server.shutdown() to stop it.
+    '''
+    server = ThreadingHTTPServer((host, port), FakeOpenAIHandler)
+    server.daemon_threads = True
+    server.config = config or FakeServerConfig()
+    threading.Thread(target=server.serve_forever, name="FakeOpenAIServer", daemon=True).start()
+    return server
+
+def prepareTestModel(model):
+    from classes.resilience import CircuitBreaker
+    model.metricsSink = None
+    model.circuitBreaker = CircuitBreaker()
+    return model
+
+def startTestModel(testCase, modelClass, config=None, clientClass=None, **kwargs):
+    import openai
+    server = startServer(config)
+    testCase.addCleanup(server.shutdown)
+    client = (clientClass or openai.Client)(api_key="local", base_url=f"http://127.0.0.1:{server.server_port}/v1", max_retries=0)
+    return prepareTestModel(modelClass(client=client, **kwargs))
+
+def addConfigArguments(parser):
+    parser.add_argument("--ttft", type=float, default=0.2, help="Seconds before the first token")
+    parser.add_argument("--token-delay", type=float, default=0.02, help="Seconds between tokens")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Chance that a request fails")
+    parser.add_argument("--error-status", type=int, default=500, help="HTTP status of simulated failures")
+    parser.add_argument("--retry-after", type=float, default=None, help="Retry-After header sent with simulated failures")
+    parser.add_argument("--stream-error-rate", type=float, default=0.0, help="Chance that a stream is cut off part way")
+    parser.add_argument("--response-tokens", type=int, default=200, help="Tokens per response")
+    parser.add_argument("--seed", type=int, default=None)
+
+def configFromArguments(args):
+    return FakeServerConfig(
+        ttft=args.ttft,
+        tokenDelay=args.token_delay,
+        errorRate=args.error_rate,
+        errorStatus=args.error_status,
+        retryAfter=args.retry_after,
+        streamErrorRate=args.stream_error_rate,
+        responseTokens=args.response_tokens,
+        seed=args.seed,
+    )
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local OpenAI compatible chat completions server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    addConfigArguments(parser)
+    args = parser.parse_args()
+
+    server = startServer(configFromArguments(args), args.host, args.port)
+    print(f"Fake OpenAI server listening on http://{args.host}:{server.server_port}/v1 (Ctrl+C to stop)")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,142 @@
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+
+# Let the tool be run from anywhere, e.g. 'python tools/loadTest.py'
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from tools.fakeOpenAIServer import startServer, addConfigArguments, configFromArguments
+
+'''
++ loadTest: Offline load test for StoryGPT. Many simulated users write stories at the same time against
+	tools/fakeOpenAIServer.py (started automatically unless --base-url is given), and the latency of every
+	response is reported as JSON.
+
+Modes:
+- threads: Every user has their own StoryGPT, and every response is generated by a GenerationWorker and drained
+	every 30ms, exactly like AIChatPage does.
+- async: Every user has their own AsyncStoryGPT, and all of them share one event loop and one GenerationLimiter.
+
+Usage:
+- python tools/loadTest.py --users 20 --turns 3 --mode threads --ttft 0.3 --token-delay 0.01 --error-rate 0.05
+'''
+
+class ResponseTiming:
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.firstChunk = None
+        self.end = None
+        self.characters = 0
+        self.isError = False
+
+    def addChunk(self, chunk):
+        if self.firstChunk is None:
+            self.firstChunk = time.perf_counter()
+        self.characters += len(chunk)
+
+    def finish(self):
+        self.end = time.perf_counter()
+
+def runThreadedUser(timings, turns, pollInterval):
+    from ai import StoryGPT
+    from classes.generationWorker import GenerationWorker
+    storyGPT = StoryGPT()
+    for turn in range(turns):
+        timing = ResponseTiming()
+        worker = GenerationWorker(storyGPT.sendStoryPrompt(f"a dragon, part {turn + 1}"), onCancel=storyGPT.abort).start()
+        isRunning = True
+        while isRunning:
+            time.sleep(pollInterval)
+            for eventType, value in worker.drain():
+                if eventType == GenerationWorker.CHUNK:
+                    timing.addChunk(value)
+                else:
+                    timing.isError = timing.isError or eventType == GenerationWorker.ERROR
+                    isRunning = False
+        timing.finish()
+        timings.append(timing)
+
+def runThreads(users, turns, pollInterval):
+    timings = []
+    threads = [threading.Thread(target=runThreadedUser, args=(timings, turns, pollInterval)) for _ in range(users)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return timings
+
+async def runAsyncUser(timings, turns, limiter):
+    from ai import AsyncStoryGPT
+    storyGPT = AsyncStoryGPT(limiter=limiter)
+    for turn in range(turns):
+        timing = ResponseTiming()
+        try:
+            async for chunk in storyGPT.sendStoryPrompt(f"a dragon, part {turn + 1}"):
+                timing.addChunk(chunk)
+        except Exception:
+            timing.isError = True
+        timing.finish()
+        timings.append(timing)
+
+def runAsync(users, turns, concurrency):
+    from ai import GenerationLimiter
+    timings = []
+    async def main():
+        limiter = GenerationLimiter(concurrency)
+        await asyncio.gather(*(runAsyncUser(timings, turns, limiter) for _ in range(users)))
+    asyncio.run(main())
+    return timings
+
+def percentile(values, fraction):
+    if not values:
+        return None
+    orderedValues = sorted(values)
+    return orderedValues[min(len(orderedValues) - 1, int(fraction * len(orderedValues)))]
+
+def summarize(timings, wallTime):
+    successful = [timing for timing in timings if not timing.isError and timing.firstChunk is not None]
+    ttfts = [timing.firstChunk - timing.start for timing in successful]
+    durations = [timing.end - timing.start for timing in successful]
+    return {
+        "requests": len(timings),
+        "errors": len(timings) - len(successful),
+        "wallTimeSeconds": round(wallTime, 3),
+        "requestsPerSecond": round(len(timings) / wallTime, 2) if wallTime else None,
+        "ttftSeconds": {"p50": percentile(ttfts, 0.5), "p95": percentile(ttfts, 0.95), "max": max(ttfts, default=None)},
+        "durationSeconds": {"p50": percentile(durations, 0.5), "p95": percentile(durations, 0.95), "mean": statistics.fmean(durations) if durations else None},
+        "charactersPerSecond": round(sum(timing.characters for timing in successful) / sum(durations), 1) if durations else None,
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline load test for StoryGPT")
+    parser.add_argument("--users", type=int, default=10, help="Number of simulated users writing at the same time")
+    parser.add_argument("--turns", type=int, default=3, help="Story prompts sent by every user")
+    parser.add_argument("--mode", choices=("threads", "async"), default="threads")
+    parser.add_argument("--concurrency", type=int, default=8, help="GenerationLimiter size in async mode")
+    parser.add_argument("--poll-interval", type=float, default=0.03, help="Seconds between queue drains in threads mode")
+    parser.add_argument("--base-url", default=None, help="Use a server that's already running instead of starting one")
+    addConfigArguments(parser)
+    args = parser.parse_args()
+
+    server = None
+    if args.base_url:
+        os.environ["BOOKSMART_API_BASE_URL"] = args.base_url
+    else:
+        server = startServer(configFromArguments(args))
+        os.environ["BOOKSMART_API_BASE_URL"] = f"http://127.0.0.1:{server.server_port}/v1"
+
+    startTime = time.perf_counter()
+    if args.mode == "threads":
+        timings = runThreads(args.users, args.turns, args.poll_interval)
+    else:
+        timings = runAsync(args.users, args.turns, args.concurrency)
+    results = summarize(timings, time.perf_counter() - startTime)
+    results["mode"] = args.mode
+    print(json.dumps(results, indent=2))
+
+    if server:
+        server.shutdown()
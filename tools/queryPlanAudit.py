@@ -0,0 +1,163 @@
+import argparse
+import contextlib
+import json
+import os
+import sys
+import tempfile
+
+# Let the tool be run from anywhere, e.g. 'python tools/queryPlanAudit.py'
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import event, insert
+from sqlalchemy.orm import Session
+from classes.models import User, Story, Message
+from classes.migrations import upgradeSchema
+from classes.Database import createEngine
+from classes.storyPager import StoryPager
+from classes.queries import loadStoriesWithMessages, loadStoryText
+
+'''
++ queryPlanAudit: Runs the application's database queries against a large synthetic database, and checks SQLite's
+    EXPLAIN QUERY PLAN for every statement they send. A statement fails the audit if SQLite has to scan a whole table
+    (or a whole index) or sort its rows in a temporary b-tree, since those get slower as the database grows.
+    The statements are the ones the ORM really sends, captured while the queries run, including lazy loads such as
+    User.stories and Story.messages.
+
+Usage:
+- python tools/queryPlanAudit.py
+- python tools/queryPlanAudit.py --users 1000 --stories 20 --messages 50 --output plans.json
+    Exits with status 1 if any statement fails the audit.
+
+Functions:
+- buildDatabase(engine, userCount, storiesPerUser, messagesPerStory): Fills an empty database with synthetic users,
+    stories and messages
+- runAppQueries(session, recorder): Runs the application's queries, labelling the statements that each one sends
+- auditQueries(engine): Returns the query plan of every statement the application's queries send, and whether it passes
+'''
+
+class StatementRecorder:
+    '''
+    - Records the SELECT statements sent through an engine, with the label of the query that sent them
+    '''
+    def __init__(self, engine):
+        self.statements = []
+        self.label = None
+        event.listen(engine, "before_cursor_execute", self.record)
+
+    def record(self, connection, cursor, statement, parameters, context, executemany):
+        if self.label and statement.lstrip().upper().startswith("SELECT"):
+            self.statements.append((self.label, statement, parameters))
+
+    @contextlib.contextmanager
+    def query(self, label):
+        self.label = label
+        try:
+            yield
+        finally:
+            self.label = None
+
+def buildDatabase(engine, userCount=500, storiesPerUser=10, messagesPerStory=40):
+    upgradeSchema(engine)
+    with engine.begin() as connection:
+        connection.execute(insert(User), [
+            {"id": userID, "username": f"user{userID}", "email": f"user{userID}@gmail.com", "firstName": "Test", "lastName": f"User{userID}",
+             "passwordHash": f"hash{userID}", "avatar": "default_user.jpg"}
+            for userID in range(1, userCount + 1)
+        ])
+        connection.execute(insert(Story), [
+            {"id": storyID, "userID": (storyID - 1) // storiesPerUser + 1, "storyTitle": f"Story {storyID}"}
+            for storyID in range(1, userCount * storiesPerUser + 1)
+        ])
+        messageRows = []
+        for storyID in range(1, userCount * storiesPerUser + 1):
+            for position in range(messagesPerStory):
+                messageRows.append({"storyID": storyID, "position": position, "isAISender": position % 2 == 1, "text": f"Message {position} of story {storyID}."})
+            if len(messageRows) >= 50000:
+                connection.execute(insert(Message), messageRows)
+                messageRows = []
+        if messageRows:
+            connection.execute(insert(Message), messageRows)
+    # Let SQLite's planner know how the data is distributed, like it would after the app has been used for a while
+    with engine.begin() as connection:
+        connection.exec_driver_sql("ANALYZE")
+
+def runAppQueries(session, recorder):
+    '''
+    - Runs the same queries as the pages that use the database. Lazy loads are triggered the way the pages trigger them.
+    '''
+    userCount = session.query(User).count()
+    username = f"user{userCount // 2}"
+    # userLoginPage
+    with recorder.query("log in (username and password)"):
+        user = session.query(User).filter_by(username=username, passwordHash=f"hash{userCount // 2}").first()
+    # userRegisterPage, editAccountPage and UserSessionManager.checkForPrevUser
+    with recorder.query("find user by username"):
+        session.query(User).filter_by(username=username).first()
+    # storyLibraryPage
+    pager = StoryPager(lambda: contextlib.nullcontext(session), user.id)
+    with recorder.query("count a user's stories"):
+        pager.countStories()
+    with recorder.query("load a page of the library"):
+        story = pager.getPage(pager.pageCount() - 1)[-1]
+    # storyLibraryPage.continueSavedStory and exporting a story
+    with recorder.query("load Story.messages"):
+        messages = story.messages
+    # remixStoryPage
+    with recorder.query("load a story's text"):
+        loadStoryText(session, story.id)
+    # storyLibraryPage.exportAllStories
+    with recorder.query("load stories with their messages"):
+        loadStoriesWithMessages(session, user.id)
+    # Deleting a user
+    with recorder.query("load User.stories"):
+        user.stories
+    # AIChatPage.loadOlderMessages
+    with recorder.query("load the newest messages of a story"):
+        session.query(Message).filter(Message.storyID == story.id).order_by(Message.position.desc()).limit(20).all()
+    with recorder.query("load older messages of a story"):
+        session.query(Message).filter(Message.storyID == story.id, Message.position < messages[len(messages) // 2].position).order_by(Message.position.desc()).limit(20).all()
+
+def isProblem(detail):
+    '''
+    - Whether a line of a query plan is a scan of a whole table or index, or a sort in a temporary b-tree
+    '''
+    return detail.startswith("SCAN ") or "TEMP B-TREE" in detail
+
+def auditQueries(engine):
+    recorder = StatementRecorder(engine)
+    with Session(engine) as session:
+        runAppQueries(session, recorder)
+    results = []
+    with engine.connect() as connection:
+        for label, statement, parameters in recorder.statements:
+            plan = [row[3] for row in connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters)]
+            results.append({
+                "query": label,
+                "statement": " ".join(statement.split()),
+                "plan": plan,
+                "passed": not any(isProblem(detail) for detail in plan),
+            })
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Checks that the application's queries don't scan whole tables")
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--stories", type=int, default=10, help="Stories per user")
+    parser.add_argument("--messages", type=int, default=40, help="Messages per story")
+    parser.add_argument("--output", help="Also write the query plans to this JSON file")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as folder:
+        engine = createEngine(f"sqlite:///{os.path.join(folder, 'audit.db')}")
+        buildDatabase(engine, args.users, args.stories, args.messages)
+        results = auditQueries(engine)
+        engine.dispose()
+
+    for result in results:
+        print(f"{'PASS' if result['passed'] else 'FAIL'}  {result['query']}")
+        for detail in result["plan"]:
+            print(f"        {detail}")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    sys.exit(0 if all(result["passed"] for result in results) else 1)